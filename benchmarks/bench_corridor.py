@@ -0,0 +1,70 @@
+"""
+Corridor construction and query time: "buffer" vs "dwithin" corridor modes.
+
+    python -m benchmarks.bench_corridor
+
+Construction (buffering vs simplifying) always runs. Query times are
+only reported when the configured database is reachable.
+"""
+
+from benchmarks.common import database_available, setup_django, synthetic_route, timeit
+
+setup_django()
+
+from django.test import override_settings  # noqa: E402
+
+from optimizer.models import FuelStation  # noqa: E402
+from services.spatial_service import (  # noqa: E402
+    PROJECTED_CRS,
+    build_corridor,
+    build_route_line,
+    corridor_filter,
+    simplified_route_pieces,
+)
+
+CASES = [
+    # (label, start, end, route vertices)
+    ("short", (34.05, -118.24), (34.42, -119.70), 2_000),
+    ("medium", (34.05, -118.24), (37.77, -122.42), 10_000),
+    ("cross-country", (34.05, -118.24), (40.71, -74.0), 40_000),
+]
+
+
+def query(route_line, mode):
+    with override_settings(CORRIDOR_MODE=mode):
+        return len(FuelStation.objects.filter(corridor_filter(route_line)).values_list("id"))
+
+
+def main():
+    with_db = database_available()
+    if not with_db:
+        print("database unavailable: reporting construction time only\n")
+
+    header = f"{'case':<15}{'vertices':>10}{'buffer s':>10}{'buf verts':>11}{'dwithin s':>11}{'pieces':>8}{'piece verts':>13}"
+    if with_db:
+        header += f"{'q buffer s':>12}{'q dwithin s':>13}{'rows':>12}"
+    print(header)
+
+    for label, start, end, n_vertices in CASES:
+        route_line = build_route_line(synthetic_route(start, end, n_vertices))
+
+        buffer_s, corridor = timeit(lambda: build_corridor(route_line), repeat=1)
+        dwithin_s, pieces = timeit(
+            lambda: simplified_route_pieces(route_line.transform(PROJECTED_CRS, clone=True))
+        )
+
+        line = (
+            f"{label:<15}{n_vertices:>10}{buffer_s:>10.3f}{corridor.num_coords:>11}"
+            f"{dwithin_s:>11.4f}{len(pieces):>8}{sum(len(p) for p in pieces):>13}"
+        )
+
+        if with_db:
+            q_buffer_s, buffer_rows = timeit(lambda: query(route_line, "buffer"), repeat=3)
+            q_dwithin_s, dwithin_rows = timeit(lambda: query(route_line, "dwithin"), repeat=3)
+            line += f"{q_buffer_s:>12.3f}{q_dwithin_s:>13.3f}{f'{buffer_rows}/{dwithin_rows}':>12}"
+
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Greedy look-ahead engine vs the linear next-cheaper engine on synthetic
+10k-station routes, fed either StationDTO lists or StationColumns.
+
+    python -m benchmarks.bench_optimizer
+"""
+
+import numpy as np
+
+from benchmarks.common import timeit
+from services.optimization_service import ALGORITHMS, StationColumns, StationDTO, optimize_fuel
+
+N_STATIONS = 10_000
+TOTAL_MILES = 2_800.0
+MPG = 6.5
+TANK_CAPACITY = 150.0
+
+
+def synthetic_stations(n, prices="random", seed=0):
+    rng = np.random.default_rng(seed)
+    mile_markers = np.sort(rng.uniform(0, TOTAL_MILES, n))
+
+    if prices == "rising":
+        # Worst case for the look-ahead scan: nothing cheaper ahead.
+        values = np.linspace(3.0, 5.0, n)
+    else:
+        values = rng.uniform(3.0, 5.0, n).round(3)
+
+    return [
+        StationDTO(id=i + 1, mile_marker=float(m), price=float(p))
+        for i, (m, p) in enumerate(zip(mile_markers, values))
+    ]
+
+
+def main():
+    runs = [(name, "dtos") for name in ALGORITHMS] + [("optimal", "columns")]
+    labels = [f"{name}/{kind} s" for name, kind in runs]
+
+    print(f"{'prices':<10}{'stations':>10}" + "".join(f"{label:>20}" for label in labels) + f"{'same plan':>11}")
+
+    for prices in ("random", "rising"):
+        dtos = synthetic_stations(N_STATIONS, prices)
+        inputs = {"dtos": dtos, "columns": StationColumns.from_dtos(dtos)}
+        timings = []
+        plans = set()
+
+        for name, kind in runs:
+            elapsed, plan = timeit(
+                lambda: optimize_fuel(
+                    inputs[kind],
+                    total_distance=TOTAL_MILES,
+                    mpg=MPG,
+                    tank_capacity=TANK_CAPACITY,
+                    start_fuel=TANK_CAPACITY / 2,
+                    algorithm=name,
+                ),
+                repeat=3,
+            )
+            timings.append(elapsed)
+            plans.add(repr(plan))
+
+        print(f"{prices:<10}{N_STATIONS:>10}" + "".join(f"{t:>20.4f}" for t in timings) + f"{str(len(plans) == 1):>11}")
+
+
+if __name__ == "__main__":
+    main()
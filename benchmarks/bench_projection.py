@@ -0,0 +1,53 @@
+"""
+Per-station GEOS projection loop vs the batched NumPy projection.
+
+    python -m benchmarks.bench_projection
+"""
+
+from benchmarks.common import setup_django, synthetic_route, synthetic_stations, timeit
+
+setup_django()
+
+import numpy as np  # noqa: E402
+from django.contrib.gis.geos import Point  # noqa: E402
+
+from services.projection_service import compute_mile_marker, compute_mile_markers  # noqa: E402
+from services.spatial_service import build_route_line  # noqa: E402
+
+CASES = [
+    # (label, route vertices, stations)
+    ("regional", 2_000, 50),
+    ("interstate", 10_000, 300),
+    ("cross-country", 40_000, 800),
+]
+
+TOTAL_MILES = 2800.0
+
+
+def run_loop(route_line, stations):
+    return np.array([
+        compute_mile_marker(route_line, Point(lon, lat, srid=4326), TOTAL_MILES)
+        for lon, lat in stations
+    ])
+
+
+def main():
+    print(f"{'case':<14}{'vertices':>10}{'stations':>10}{'loop s':>10}{'batch s':>10}{'speedup':>9}{'max diff mi':>13}")
+
+    for label, n_vertices, n_stations in CASES:
+        coords = synthetic_route((34.05, -118.24), (40.71, -74.0), n_vertices)
+        stations = synthetic_stations(coords, n_stations)
+        route_line = build_route_line(coords)
+
+        loop_s, loop = timeit(lambda: run_loop(route_line, stations), repeat=1)
+        batch_s, batch = timeit(lambda: compute_mile_markers(coords, stations, TOTAL_MILES))
+
+        print(
+            f"{label:<14}{n_vertices:>10}{n_stations:>10}"
+            f"{loop_s:>10.3f}{batch_s:>10.3f}{loop_s / batch_s:>8.1f}x"
+            f"{np.abs(loop - batch).max():>13.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks are run as modules from the project root, e.g.:
+
+    python -m benchmarks.bench_projection
+"""
+
+import os
+import time
+
+import numpy as np
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+    import django
+    django.setup()
+
+
+def database_available() -> bool:
+    from django.db import OperationalError, connection
+
+    try:
+        connection.ensure_connection()
+    except OperationalError:
+        return False
+    return True
+
+
+def synthetic_route(start, end, n_vertices, seed=0):
+    """
+    Deterministic wiggly route between two (lat, lon) points.
+    Returns [(lat, lon), ...] like polyline.decode.
+    """
+    rng = np.random.default_rng(seed)
+
+    t = np.linspace(0.0, 1.0, n_vertices)
+    lat = start[0] + (end[0] - start[0]) * t
+    lon = start[1] + (end[1] - start[1]) * t
+
+    wiggle = np.cumsum(rng.normal(0.0, 0.002, size=(n_vertices, 2)), axis=0)
+    wiggle -= np.outer(t, wiggle[-1])  # pin both endpoints
+
+    return list(zip((lat + wiggle[:, 0]).tolist(), (lon + wiggle[:, 1]).tolist()))
+
+
+def synthetic_stations(route_coords, n_stations, max_offset_deg=0.25, seed=0):
+    """
+    Deterministic (lon, lat) station positions scattered around a route.
+    """
+    rng = np.random.default_rng(seed)
+
+    coords = np.asarray(route_coords)
+    picks = coords[rng.integers(0, len(coords), size=n_stations)]
+    jitter = rng.uniform(-max_offset_deg, max_offset_deg, size=(n_stations, 2))
+
+    return (picks + jitter)[:, ::-1]
+
+
+def timeit(fn, repeat=5):
+    """
+    Best-of-N wall time in seconds, plus the last result.
+    """
+    best = float("inf")
+    result = None
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+
+    return best, result
+
+
+def sample(fn, samples=30, warmup=1):
+    """
+    Wall time in seconds of each of `samples` calls, after `warmup` calls.
+    """
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+
+    return latencies
+
+
+def summarize(latencies, wall_seconds=None) -> dict:
+    """
+    p50/p95/p99/mean latency in milliseconds and throughput per second.
+    Throughput is over wall_seconds when given (concurrent runs), else
+    over the summed latencies.
+    """
+    ms = np.asarray(latencies, dtype=np.float64) * 1000
+    elapsed = wall_seconds if wall_seconds is not None else ms.sum() / 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+
+    return {
+        "count": len(ms),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "throughput_per_s": round(len(ms) / elapsed, 1) if elapsed else None,
+    }
+
+
+def format_summary(name, summary) -> str:
+    return (
+        f"{name:<34}{summary['count']:>7}{summary['p50_ms']:>11.2f}{summary['p95_ms']:>11.2f}"
+        f"{summary['p99_ms']:>11.2f}{summary['throughput_per_s'] or 0:>12.1f}"
+    )
+
+
+SUMMARY_HEADER = f"{'benchmark':<34}{'n':>7}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'per s':>12}"
@@ -0,0 +1,220 @@
+"""
+Replay a request log against the optimize endpoints, in process.
+
+    python -m benchmarks.replay [LOG] [--concurrency 4] [--repeat 3] [--cold] [--db]
+
+LOG is JSONL: one optimize payload per line, or {"path": ..., "body": {...}}
+to target another endpoint such as /api/optimize/batch/. It defaults to
+benchmarks/fixtures/requests.jsonl.
+
+Requests go through the full middleware stack via django.test.Client, and
+ORS is replaced by benchmarks.stub_ors. Without --db, settings default to
+benchmarks.settings and corridors come from synthetic stations in the
+in-process station index; with --db the configured database (and its
+fuel stations) is used. Reports p50/p95/p99 latency, throughput and the
+mean time per pipeline stage.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.common import SUMMARY_HEADER, format_summary, setup_django, summarize
+from benchmarks.stub_ors import StubORS, load_routes
+
+DEFAULT_LOG = Path(__file__).parent / "fixtures" / "requests.jsonl"
+DEFAULT_PATH = "/api/optimize/"
+
+SYNTHETIC_STATIONS = 8_000
+# Continental US, (lon, lat) corners.
+CONUS = ((-124.5, 25.0), (-67.0, 49.0))
+
+
+def read_log(path) -> list[tuple[str, dict]]:
+    """
+    (path, body) for every request in a JSONL request log.
+    """
+    entries = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "body" in record:
+                entries.append((record.get("path", DEFAULT_PATH), record["body"]))
+            else:
+                entries.append((DEFAULT_PATH, record))
+    return entries
+
+
+def lane_coordinates(body) -> list[list[float]]:
+    """
+    [lon, lat] of start, waypoints and end, as sent to ORS.
+    """
+    return [
+        [body["start_lon"], body["start_lat"]],
+        *([waypoint["lon"], waypoint["lat"]] for waypoint in body.get("waypoints", ())),
+        [body["end_lon"], body["end_lat"]],
+    ]
+
+
+def synthetic_station_loader(n_stations: int, seed: int = 0):
+    """
+    StationIndex loader returning n_stations uniformly spread over CONUS.
+    """
+    from services.station_index import StationSnapshot
+
+    rng = np.random.default_rng(seed)
+    lonlat = rng.uniform(CONUS[0], CONUS[1], size=(n_stations, 2))
+    prices = rng.uniform(3.0, 5.0, n_stations).round(3)
+    ids = np.arange(1, n_stations + 1)
+
+    return lambda version: StationSnapshot.build(ids, prices, lonlat, version)
+
+
+def prepare(db: bool = False, stations: int = SYNTHETIC_STATIONS, routes=None, latency: float = 0.0) -> StubORS:
+    """
+    Set up Django for a replay and start the stub ORS it routes against.
+    """
+    if not db:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    setup_django()
+
+    from django.conf import settings
+
+    stub = StubORS(load_routes(routes), latency=latency).start()
+    settings.ORS_URL = stub.url
+    settings.ORS_API_KEY = settings.ORS_API_KEY or "stub"
+
+    if not db:
+        import optimizer.views
+        from services.station_index import StationIndex
+
+        settings.STATION_INDEX_ENABLED = True
+        optimizer.views.station_index = StationIndex(
+            loader=synthetic_station_loader(stations),
+            check_interval=settings.STATION_INDEX_CHECK_SECONDS,
+        )
+
+    return stub
+
+
+def clear_caches():
+    from django.core.cache import cache
+
+    from services.route_artifacts import artifact_cache
+    from services.route_cache import route_cache
+
+    route_cache.local.clear()
+    artifact_cache.local.clear()
+    cache.clear()
+
+
+def replay(entries, concurrency: int = 1, cold: bool = False) -> dict:
+    """
+    Send every entry and time it. With cold, route and artifact caches are
+    cleared before each request (meaningful with concurrency 1).
+    Returns {"latencies", "wall_seconds", "statuses"}.
+    """
+    from django.test import Client
+
+    local = threading.local()
+
+    def send(entry):
+        path, body = entry
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = Client(HTTP_HOST="localhost", HTTP_ACCEPT_ENCODING="gzip")
+
+        if cold:
+            clear_caches()
+
+        started = time.perf_counter()
+        response = client.post(path, data=json.dumps(body), content_type="application/json")
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, entries))
+    wall_seconds = time.perf_counter() - started
+
+    statuses = {}
+    for _, status in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    return {
+        "latencies": [elapsed for elapsed, _ in results],
+        "wall_seconds": wall_seconds,
+        "statuses": statuses,
+    }
+
+
+def stage_breakdown(requests: int) -> dict:
+    """
+    Mean milliseconds per request spent in each pipeline stage.
+    """
+    from services.metrics import STAGE_SECONDS
+
+    return {
+        labels["stage"]: round(STAGE_SECONDS.sum(**labels) * 1000 / requests, 3)
+        for labels in STAGE_SECONDS.label_values()
+    }
+
+
+def run(log=DEFAULT_LOG, concurrency=1, repeat=1, cold=False) -> dict:
+    """
+    Replay a log after `prepare`: summary, statuses and stage breakdown.
+    """
+    from services.metrics import registry
+
+    entries = read_log(log) * repeat
+    registry.clear()
+
+    result = replay(entries, concurrency=concurrency, cold=cold)
+
+    return {
+        "summary": summarize(result["latencies"], result["wall_seconds"]),
+        "statuses": result["statuses"],
+        "stages_ms": stage_breakdown(len(entries)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", nargs="?", default=str(DEFAULT_LOG))
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the log this many times.")
+    parser.add_argument("--cold", action="store_true", help="Clear route caches before every request.")
+    parser.add_argument("--db", action="store_true", help="Use the configured database for stations.")
+    parser.add_argument("--stations", type=int, default=SYNTHETIC_STATIONS)
+    parser.add_argument("--routes", help="Recorded routes (JSONL) for the stub ORS to serve.")
+    parser.add_argument("--ors-latency", type=float, default=0.0, help="Seconds the stub ORS sleeps per request.")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON.")
+    args = parser.parse_args()
+
+    stub = prepare(db=args.db, stations=args.stations, routes=args.routes, latency=args.ors_latency)
+    try:
+        result = run(args.log, concurrency=args.concurrency, repeat=args.repeat, cold=args.cold)
+    finally:
+        stub.stop()
+
+    if args.json:
+        print(json.dumps({**result, "ors_requests": stub.requests}, indent=2))
+        return
+
+    print(SUMMARY_HEADER)
+    print(format_summary("replay", result["summary"]))
+    print(f"\nstatuses: {result['statuses']}  ORS requests: {stub.requests}")
+    print("\nmean ms per request by stage:")
+    for name, ms in sorted(result["stages_ms"].items(), key=lambda item: -item[1]):
+        print(f"  {name:<14}{ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+Settings for database-free benchmark runs.
+
+The cache is in memory and corridors come from the in-process station
+index, which benchmarks.replay fills with synthetic stations. Only the
+request pipeline is measured, with no Redis or PostGIS in the loop.
+"""
+
+from core.settings import *  # noqa: F401,F403
+
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+STATION_INDEX_ENABLED = True
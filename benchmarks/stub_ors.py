@@ -0,0 +1,242 @@
+"""
+Local stand-in for the OpenRouteService directions endpoint.
+
+Serves canned routes so replays and benchmarks never touch the network or
+spend ORS quota. Lanes found in a recorded routes file get their recorded
+geometry; any other lane gets a deterministic synthetic route through its
+coordinates.
+
+    python -m benchmarks.stub_ors --port 8765
+    python -m benchmarks.stub_ors --record LOG --routes benchmarks/fixtures/routes.jsonl
+
+--record fetches every distinct lane in a request log from the real ORS
+(ORS_API_KEY must be set) and appends it to the routes file.
+"""
+
+import argparse
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import polyline
+
+from benchmarks.common import synthetic_route
+
+METERS_PER_MILE = 1609.34
+EARTH_RADIUS_M = 6371008.8
+
+# One synthetic vertex every 250 m, roughly ORS's density on highways.
+VERTICES_PER_KM = 4
+MAX_LEG_VERTICES = 20_000
+
+
+def lane_key(coordinates) -> tuple:
+    return tuple((round(lon, 5), round(lat, 5)) for lon, lat in coordinates)
+
+
+def load_routes(path) -> dict:
+    """
+    Recorded routes by lane key, from a JSONL file of
+    {"coordinates": [[lon, lat], ...], "distance_miles", "leg_miles", "geometry"}.
+    """
+    routes = {}
+    if path is None:
+        return routes
+
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                route = json.loads(line)
+                routes[lane_key(route["coordinates"])] = route
+    return routes
+
+
+def synthetic_lane(coordinates) -> dict:
+    """
+    Deterministic route through [lon, lat] coordinates, in the parsed
+    get_route shape.
+    """
+    coords = []
+    leg_miles = []
+
+    for (lon0, lat0), (lon1, lat1) in zip(coordinates, coordinates[1:]):
+        km = _haversine_m(np.array([[lat0, lon0], [lat1, lon1]])) / 1000
+        n_vertices = int(min(max(km * VERTICES_PER_KM, 2), MAX_LEG_VERTICES))
+        seed = zlib.crc32(repr(lane_key([(lon0, lat0), (lon1, lat1)])).encode())
+
+        leg = synthetic_route((lat0, lon0), (lat1, lon1), n_vertices, seed=seed)
+        leg_miles.append(_haversine_m(np.array(leg)) / METERS_PER_MILE)
+        coords.extend(leg if not coords else leg[1:])
+
+    return {
+        "coordinates": [list(point) for point in coordinates],
+        "distance_miles": sum(leg_miles),
+        "leg_miles": leg_miles,
+        "geometry": polyline.encode(coords),
+    }
+
+
+def ors_response(route: dict) -> dict:
+    """
+    A directions response in the ORS JSON format for a parsed route.
+    """
+    return {
+        "routes": [{
+            "summary": {"distance": route["distance_miles"] * METERS_PER_MILE},
+            "segments": [{"distance": miles * METERS_PER_MILE} for miles in route["leg_miles"]],
+            "geometry": route["geometry"],
+        }],
+    }
+
+
+class StubORS:
+    """
+    Threaded HTTP server answering ORS directions requests. Use as a
+    context manager; `url` is the endpoint to put in settings.ORS_URL.
+    `latency` seconds are slept per request to mimic the upstream round trip;
+    a non-200 `status` answers every request with that error, to simulate
+    an outage.
+    """
+
+    def __init__(self, routes: dict | None = None, host="127.0.0.1", port=0, latency=0.0, status=200):
+        self.routes = routes or {}
+        self.latency = latency
+        self.status = status
+        self.requests = 0
+        self._responses = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v2/directions/driving-car"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def response_for(self, coordinates) -> dict:
+        """
+        ORS response for a lane: recorded if available, else synthetic.
+        """
+        key = lane_key(coordinates)
+
+        with self._lock:
+            if key not in self._responses:
+                route = self.routes.get(key) or synthetic_lane(coordinates)
+                self._responses[key] = ors_response(route)
+            return self._responses[key]
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+                with stub._lock:
+                    stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                if stub.status != 200:
+                    payload = json.dumps({"error": {"code": stub.status, "message": "stub outage"}}).encode()
+                else:
+                    payload = json.dumps(stub.response_for(body["coordinates"])).encode()
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def record_routes(log_path, routes_path):
+    """
+    Fetch each distinct lane of a request log from the configured ORS and
+    append the routes not yet recorded to routes_path.
+    """
+    from benchmarks.common import setup_django
+    from benchmarks.replay import lane_coordinates, read_log
+
+    setup_django()
+    from services.routing_service import get_route
+
+    try:
+        recorded = load_routes(routes_path)
+    except FileNotFoundError:
+        recorded = {}
+
+    added = 0
+    with open(routes_path, "a", encoding="utf-8") as file:
+        for _, body in read_log(log_path):
+            coordinates = lane_coordinates(body)
+            key = lane_key(coordinates)
+            if key in recorded:
+                continue
+
+            route = get_route(coordinates[0], coordinates[-1], coordinates[1:-1])
+            recorded[key] = route
+            file.write(json.dumps({"coordinates": coordinates, **route}) + "\n")
+            added += 1
+
+    print(f"recorded {added} routes into {routes_path}")
+
+
+def _haversine_m(latlon: np.ndarray) -> float:
+    lat = np.radians(latlon[:, 0])
+    lon = np.radians(latlon[:, 1])
+    a = (
+        np.sin(np.diff(lat) / 2) ** 2
+        + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    )
+    return float((2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--routes", help="JSONL file of recorded routes to serve (or to record into).")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to sleep per request.")
+    parser.add_argument("--status", type=int, default=200, help="Answer every request with this HTTP status.")
+    parser.add_argument("--record", metavar="LOG", help="Record the lanes of this request log instead of serving.")
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.routes:
+            parser.error("--record needs --routes")
+        record_routes(args.record, args.routes)
+        return
+
+    stub = StubORS(load_routes(args.routes), port=args.port, latency=args.latency, status=args.status)
+    print(f"serving {len(stub.routes)} recorded routes at {stub.url}")
+    stub.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Hot-path benchmark suite with stored baselines.
+
+    python -m benchmarks.suite                  # run and compare with baselines
+    python -m benchmarks.suite --check          # exit 1 on a regression
+    python -m benchmarks.suite --save           # overwrite the baselines
+
+Each benchmark is sampled repeatedly and reported as p50/p95/p99 latency
+and throughput. The replay benchmark runs benchmarks/fixtures/requests.jsonl
+through OptimizeRouteView against the stub ORS (see benchmarks.replay).
+Benchmarks that need the database are skipped when it is unreachable.
+
+A benchmark regresses when its p50 or p95 exceeds the baseline by more
+than --tolerance. Baselines are machine-specific: regenerate them with
+--save on the machine that runs --check.
+"""
+
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import polyline
+
+from benchmarks import replay
+from benchmarks.common import (
+    SUMMARY_HEADER,
+    database_available,
+    format_summary,
+    sample,
+    summarize,
+    synthetic_route,
+    synthetic_stations,
+)
+from benchmarks.stub_ors import load_routes
+
+BASELINES = Path(__file__).parent / "baselines.json"
+COMPARED = ("p50_ms", "p95_ms")
+
+MEDIUM_ROUTE = ((34.05, -118.24), (37.77, -122.42), 10_000)
+CROSS_COUNTRY_ROUTE = ((34.05, -118.24), (40.71, -74.0), 40_000)
+
+
+def route_geometries(routes_path=None) -> dict:
+    """
+    {"medium", "cross-country"}: [(lat, lon), ...] routes. Recorded routes
+    are used when given, the shortest as medium and the longest as
+    cross-country; otherwise synthetic ones.
+    """
+    recorded = sorted(load_routes(routes_path).values(), key=lambda route: route["distance_miles"])
+    if recorded:
+        return {
+            "medium": polyline.decode(recorded[0]["geometry"]),
+            "cross-country": polyline.decode(recorded[-1]["geometry"]),
+        }
+
+    return {
+        "medium": synthetic_route(*MEDIUM_ROUTE),
+        "cross-country": synthetic_route(*CROSS_COUNTRY_ROUTE),
+    }
+
+
+def benchmarks(routes, samples: int, with_db: bool) -> dict:
+    """
+    Name -> (fn to sample, samples). Inputs are built up front, so only
+    the call itself is timed.
+    """
+    from django.contrib.gis.geos import Point
+
+    from benchmarks.bench_optimizer import MPG, TANK_CAPACITY, TOTAL_MILES, synthetic_stations as optimizer_stations
+    from services.optimization_service import StationColumns, optimize_fuel
+    from services.projection_service import compute_mile_marker, compute_mile_markers
+    from services.spatial_service import build_route_line, get_stations_along_route
+
+    def optimize(n, algorithm):
+        stations = StationColumns.from_dtos(optimizer_stations(n))
+        return lambda: optimize_fuel(
+            stations,
+            total_distance=TOTAL_MILES,
+            mpg=MPG,
+            tank_capacity=TANK_CAPACITY,
+            start_fuel=TANK_CAPACITY / 2,
+            algorithm=algorithm,
+        )
+
+    medium = routes["medium"]
+    medium_stations = synthetic_stations(medium, 2_000)
+    medium_line = build_route_line(medium)
+    geos_points = [Point(lon, lat, srid=4326) for lon, lat in medium_stations[:50].tolist()]
+    snapshot = replay.synthetic_station_loader(replay.SYNTHETIC_STATIONS)(0)
+
+    cases = {
+        "optimize_fuel/greedy/1k": (optimize(1_000, "greedy"), samples),
+        "optimize_fuel/optimal/10k": (optimize(10_000, "optimal"), samples),
+        "compute_mile_markers/medium/2k": (
+            lambda: compute_mile_markers(medium, medium_stations, 500.0), samples,
+        ),
+        "compute_mile_marker/medium/50": (
+            lambda: [compute_mile_marker(medium_line, point, 500.0) for point in geos_points],
+            max(samples // 5, 3),
+        ),
+        "station_index.corridor/cross-country": (
+            lambda: snapshot.corridor(routes["cross-country"], 2_800.0), samples,
+        ),
+    }
+
+    if with_db:
+        cases["get_stations_along_route/medium"] = (
+            lambda: list(get_stations_along_route(medium_line)), max(samples // 5, 3),
+        )
+
+    return cases
+
+
+def run(samples: int, replay_repeat: int, routes_path=None) -> dict:
+    stub = replay.prepare(routes=routes_path)
+    try:
+        with_db = database_available()
+        results = {}
+
+        for name, (fn, n) in benchmarks(route_geometries(routes_path), samples, with_db).items():
+            results[name] = summarize(sample(fn, samples=n))
+            print(format_summary(name, results[name]), flush=True)
+
+        replayed = replay.run(repeat=replay_repeat)
+        results["replay/fixtures"] = replayed["summary"]
+        print(format_summary("replay/fixtures", replayed["summary"]), flush=True)
+    finally:
+        stub.stop()
+
+    return results
+
+
+def regressions(results: dict, baselines: dict, tolerance: float) -> list[str]:
+    """
+    Human-readable regressions of results against baselines.
+    """
+    found = []
+    for name, summary in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        for field in COMPARED:
+            limit = baseline[field] * (1 + tolerance)
+            if summary[field] > limit:
+                found.append(
+                    f"{name}: {field} {summary[field]:.2f} > {baseline[field]:.2f} (+{tolerance:.0%})"
+                )
+    return found
+
+
+def load_baselines(path=BASELINES) -> dict:
+    try:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)["results"]
+    except FileNotFoundError:
+        return {}
+
+
+def save_baselines(results: dict, path=BASELINES):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({
+            "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "machine": f"{platform.system()} {platform.machine()}, Python {platform.python_version()}",
+            "results": results,
+        }, file, indent=2)
+        file.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=30)
+    parser.add_argument("--replay-repeat", type=int, default=3, help="Times the fixture log is replayed.")
+    parser.add_argument("--routes", help="Recorded routes (JSONL) to benchmark and replay against.")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--baselines", default=str(BASELINES))
+    parser.add_argument("--check", action="store_true", help="Exit 1 if any benchmark regressed.")
+    parser.add_argument("--save", action="store_true", help="Store these results as the baselines.")
+    args = parser.parse_args()
+
+    print(SUMMARY_HEADER)
+    results = run(args.samples, args.replay_repeat, args.routes)
+
+    if args.save:
+        save_baselines(results, args.baselines)
+        print(f"\nbaselines saved to {args.baselines}")
+        return
+
+    found = regressions(results, load_baselines(args.baselines), args.tolerance)
+    print()
+    for line in found:
+        print(f"REGRESSION {line}")
+    if not found:
+        print("no regressions against baselines")
+
+    if found and args.check:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
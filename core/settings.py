@@ -44,6 +44,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'optimizer.middleware.CompressionMiddleware',
+    'optimizer.middleware.ServerTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -87,6 +89,59 @@ DATABASES = {
 }
 
 ORS_API_KEY = os.getenv("ORS_API_KEY")
+# Directions endpoint; point it at a local stub for benchmarks and replays.
+ORS_URL = os.getenv("ORS_URL", "https://api.openrouteservice.org/v2/directions/driving-car")
+ORS_MAX_CONNECTIONS = int(os.getenv("ORS_MAX_CONNECTIONS", "20"))
+# Routing backends tried in order on a route cache miss: "local" (the road
+# graph built by `build_road_graph`) and "ors", e.g. "local,ors".
+ROUTING_BACKENDS = [
+    name.strip() for name in os.getenv("ROUTING_BACKENDS", "ors").split(",") if name.strip()
+]
+# Decimal places coordinates are rounded to in route cache keys (3 is about
+# 110 m), so nearby requests share a cached route; see services.route_snapping.
+ROUTE_KEY_PRECISION = int(os.getenv("ROUTE_KEY_PRECISION", "3"))
+ROAD_GRAPH_PATH = os.getenv("ROAD_GRAPH_PATH", str(BASE_DIR / "data" / "road_graph"))
+# Request coordinates further than this from any graph node go to the next backend.
+ROAD_GRAPH_MAX_SNAP_METERS = float(os.getenv("ROAD_GRAPH_MAX_SNAP_METERS", "2000"))
+# Local route searches settling more nodes than this per leg (about half a
+# second of A*) give up and go to the next backend.
+ROAD_GRAPH_MAX_EXPANSIONS = int(os.getenv("ROAD_GRAPH_MAX_EXPANSIONS", "50000"))
+# Intermediate waypoints per optimize request (ORS allows 50 coordinates).
+ROUTE_MAX_WAYPOINTS = int(os.getenv("ROUTE_MAX_WAYPOINTS", "25"))
+
+# Corridor test: "buffer" intersects a buffered route polygon, "dwithin"
+# runs ST_DWithin against a simplified route (see services.spatial_service).
+CORRIDOR_MODE = os.getenv("CORRIDOR_MODE", "buffer")
+
+# Compute station positions along the route in PostGIS instead of in Python.
+LOCATE_STATIONS_IN_DB = os.getenv("LOCATE_STATIONS_IN_DB", "false").lower() == "true"
+
+# Answer corridor lookups from an in-process station index that reloads
+# when the station data version in Redis changes.
+STATION_INDEX_ENABLED = os.getenv("STATION_INDEX_ENABLED", "false").lower() == "true"
+STATION_INDEX_CHECK_SECONDS = float(os.getenv("STATION_INDEX_CHECK_SECONDS", "5"))
+
+# Default Douglas-Peucker tolerance for include_geometry="simplified".
+ROUTE_GEOMETRY_TOLERANCE_METERS = float(os.getenv("ROUTE_GEOMETRY_TOLERANCE_METERS", "50"))
+
+# Response compression (optimizer.middleware): brotli when installed and
+# accepted, otherwise gzip; small responses are sent as is.
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "200"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "5"))
+# Only JSON responses under these path prefixes are compressed. Pages with
+# CSRF tokens or other secrets (admin, browsable API) are left alone, as
+# compressing them alongside reflected input exposes them to BREACH.
+RESPONSE_COMPRESSION_PATHS = [
+    prefix for prefix in os.getenv("RESPONSE_COMPRESSION_PATHS", "/api/optimize/").split(",") if prefix
+]
+
+# Send per-stage pipeline timings back in a Server-Timing header.
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+
+# /api/optimize/batch/ limits.
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_ROUTE_WORKERS = int(os.getenv("BATCH_ROUTE_WORKERS", "8"))
 
 CACHES = {
     "default": {
@@ -97,6 +152,25 @@ CACHES = {
         }
     }
 }
+
+# In-process LRU tier in front of Redis for route payloads, and the
+# compression used for payloads stored in Redis ("zlib", "lz4", "none").
+ROUTE_CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("ROUTE_CACHE_LOCAL_MAX_ENTRIES", "1024"))
+ROUTE_CACHE_LOCAL_TTL = float(os.getenv("ROUTE_CACHE_LOCAL_TTL", "300"))
+ROUTE_CACHE_COMPRESSION = os.getenv("ROUTE_CACHE_COMPRESSION", "zlib")
+
+# Routes older than the soft TTL are still served, while a background
+# refresh fetches a new one; Redis drops them at the hard TTL.
+ROUTE_CACHE_SOFT_TTL = int(os.getenv("ROUTE_CACHE_SOFT_TTL", "86400"))
+ROUTE_CACHE_HARD_TTL = int(os.getenv("ROUTE_CACHE_HARD_TTL", "604800"))
+ROUTE_REFRESH_WORKERS = int(os.getenv("ROUTE_REFRESH_WORKERS", "2"))
+
+# ORS circuit breaker: open after this many consecutive upstream failures
+# (timeouts, connection errors, 5xx, 429), then let one probe through
+# every ORS_BREAKER_RESET_SECONDS.
+ORS_BREAKER_FAILURES = int(os.getenv("ORS_BREAKER_FAILURES", "5"))
+ORS_BREAKER_RESET_SECONDS = float(os.getenv("ORS_BREAKER_RESET_SECONDS", "30"))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
+from optimizer.views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("api/", include("optimizer.urls")),
+    path("metrics", MetricsView.as_view()),
 ]
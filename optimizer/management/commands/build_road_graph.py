@@ -0,0 +1,121 @@
+import json
+import re
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from services.road_graph import graph_from_lines
+
+# Speeds for roads without a maxspeed, by OSM highway class.
+HIGHWAY_SPEEDS_MPH = {
+    "motorway": 65,
+    "motorway_link": 40,
+    "trunk": 55,
+    "trunk_link": 35,
+    "primary": 45,
+    "primary_link": 30,
+    "secondary": 40,
+    "secondary_link": 30,
+    "tertiary": 35,
+    "tertiary_link": 25,
+    "unclassified": 30,
+    "residential": 25,
+    "service": 15,
+}
+KMH_PER_MPH = 1.609344
+
+
+class Command(BaseCommand):
+    help = "Build the local routing backend's road graph from road centerlines (GeoJSON)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "file",
+            help=(
+                "GeoJSON FeatureCollection, or one feature per line (GeoJSONSeq), of "
+                "LineString/MultiLineString roads. Uses the OSM oneway, maxspeed and highway properties."
+            ),
+        )
+        parser.add_argument("--output", default=None, help="Graph directory (default: ROAD_GRAPH_PATH).")
+
+    def handle(self, *args, **options):
+
+        started = time.perf_counter()
+        output = options["output"] or settings.ROAD_GRAPH_PATH
+
+        try:
+            lines = list(_road_lines(_features(options["file"])))
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Could not read {options['file']}: {e}")
+
+        if not lines:
+            raise CommandError("No LineString roads found.")
+
+        graph = graph_from_lines(lines)
+        graph.save(output)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Built road graph from {len(lines)} lines: {graph.node_count} nodes, "
+            f"{graph.edge_count} edges in {time.perf_counter() - started:.1f}s -> {output}"
+        ))
+
+
+def _features(path):
+    with open(path, encoding="utf-8") as file:
+        text = file.read()
+
+    try:
+        document = json.loads(text)
+    except json.JSONDecodeError:
+        # GeoJSONSeq, optionally with RS separators.
+        return [json.loads(line.strip("\x1e")) for line in text.splitlines() if line.strip("\x1e").strip()]
+
+    if document.get("type") == "FeatureCollection":
+        return document["features"]
+    return [document]
+
+
+def _road_lines(features):
+    """
+    (coordinates, oneway, speed_mph) for every line of every road feature.
+    """
+    for feature in features:
+        geometry = feature.get("geometry") or {}
+        properties = feature.get("properties") or {}
+
+        if geometry.get("type") == "LineString":
+            parts = [geometry["coordinates"]]
+        elif geometry.get("type") == "MultiLineString":
+            parts = geometry["coordinates"]
+        else:
+            continue
+
+        oneway = _oneway(properties)
+        speed = _speed_mph(properties)
+        for coordinates in parts:
+            if len(coordinates) >= 2:
+                yield [point[:2] for point in coordinates], oneway, speed
+
+
+def _oneway(properties) -> int:
+    value = str(properties.get("oneway", "")).lower()
+    if value in ("yes", "true", "1"):
+        return 1
+    if value in ("-1", "reverse"):
+        return -1
+    # Motorways are one-way unless tagged otherwise.
+    if properties.get("highway") == "motorway" and value != "no":
+        return 1
+    return 0
+
+
+def _speed_mph(properties):
+    """
+    OSM maxspeed ("65 mph", or km/h when unitless), else the highway class default.
+    """
+    match = re.match(r"\s*(\d+(?:\.\d+)?)\s*(mph)?", str(properties.get("maxspeed") or ""))
+    if match and float(match.group(1)) > 0:
+        speed = float(match.group(1))
+        return speed if match.group(2) else speed / KMH_PER_MPH
+    return HIGHWAY_SPEEDS_MPH.get(properties.get("highway"))
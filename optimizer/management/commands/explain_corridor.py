@@ -0,0 +1,74 @@
+import numpy as np
+import polyline
+from django.core.management.base import BaseCommand, CommandError
+
+from optimizer.models import FuelStation
+from services.routing_service import get_route
+from services.spatial_service import (
+    CORRIDOR_MODES,
+    build_route_line,
+    get_stations_along_route,
+    station_positions_queryset,
+)
+
+
+class Command(BaseCommand):
+    help = "Print EXPLAIN ANALYZE for the corridor queries on a sample route."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", default="-118.2437,34.0522", help="Route start as lon,lat.")
+        parser.add_argument("--end", default="-74.0060,40.7128", help="Route end as lon,lat.")
+        parser.add_argument(
+            "--ors",
+            action="store_true",
+            help="Use the OpenRouteService route instead of a straight line.",
+        )
+        parser.add_argument(
+            "--points",
+            type=int,
+            default=2000,
+            help="Vertices of the straight-line sample route.",
+        )
+        parser.add_argument("--mode", choices=CORRIDOR_MODES, help="Override CORRIDOR_MODE.")
+
+    def handle(self, *args, **options):
+        start = _lon_lat(options["start"])
+        end = _lon_lat(options["end"])
+
+        if options["ors"]:
+            coords = polyline.decode(get_route(list(start), list(end))["geometry"])
+        else:
+            t = np.linspace(0.0, 1.0, max(2, options["points"]))
+            coords = list(zip(
+                (start[1] + (end[1] - start[1]) * t).tolist(),
+                (start[0] + (end[0] - start[0]) * t).tolist(),
+            ))
+
+        route_line = build_route_line(coords)
+        mode = options["mode"]
+
+        stations = get_stations_along_route(route_line, mode=mode)
+        ids = list(stations.values_list("id", flat=True))
+
+        self._explain("Corridor stations", stations)
+        self._explain(
+            "Corridor stations located in PostGIS",
+            station_positions_queryset(route_line, mode=mode),
+        )
+        self._explain(
+            f"Price refresh for {len(ids)} stations",
+            FuelStation.objects.filter(id__in=ids).values_list("id", "price"),
+        )
+
+    def _explain(self, title, queryset):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        self.stdout.write(queryset.explain(analyze=True, buffers=True))
+        self.stdout.write("")
+
+
+def _lon_lat(value):
+    try:
+        lon, lat = (float(part) for part in value.split(","))
+    except ValueError:
+        raise CommandError(f"Expected lon,lat, got {value!r}.")
+    return lon, lat
@@ -1,60 +1,96 @@
 import os
 import csv
+import io
+import time
 from django.core.management.base import BaseCommand
 from django.contrib.gis.geos import Point
-from django.db import transaction
+from django.db import connection, transaction
 from optimizer.models import FuelStation
 from django.conf import settings
+from services.data_version import bump_station_data_version
+from services.price_history import record_price_snapshot
+
+STAGING_TABLE = "fuel_station_staging"
+
+STAGING_COLUMNS = ("row_no", "opis_id", "name", "city", "state", "price", "lon", "lat")
 
 
 class Command(BaseCommand):
     help = "Load fuel station data from enriched CSV file."
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            help="CSV to load. Defaults to data/fuel-prices-enriched.csv.",
+        )
+        parser.add_argument(
+            "--stream",
+            action="store_true",
+            help="Parse in chunks and COPY them into a staging table, "
+                 "so memory stays flat regardless of file size.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help="Rows per COPY chunk with --stream.",
+        )
+
+    def handle(self, *args, **options):
 
-        file_path = os.path.join(
+        self.verbosity = options["verbosity"]
+
+        file_path = options["file"] or os.path.join(
             settings.BASE_DIR,
             "data",
             "fuel-prices-enriched.csv"
         )
 
+        started = time.perf_counter()
+
+        if options["stream"]:
+            loaded, parsed, skipped = self._load_streaming(file_path, options["chunk_size"])
+        else:
+            loaded, parsed, skipped = self._load_in_memory(file_path)
+
+        record_price_snapshot()
+        bump_station_data_version()
+
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Loaded {loaded} fuel stations. "
+                f"Skipped {skipped} invalid rows. "
+                f"Read {parsed} rows in {elapsed:.2f}s "
+                f"({parsed / elapsed if elapsed else 0:.0f} rows/s)."
+            )
+        )
+
+    def _load_in_memory(self, file_path):
         stations_dict = {}
+        parsed = 0
         skipped = 0
 
-        with open(file_path, newline="", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
+        for row in _read_rows(file_path):
+            parsed += 1
+            values = _parse_row(row)
 
-            for row in reader:
-                lat = row.get("Latitude")
-                lon = row.get("Longitude")
+            if values is None:
+                skipped += 1
+                continue
 
-                # Skip rows with missing coordinates
-                if not lat or not lon:
-                    skipped += 1
-                    continue
+            opis_id, name, city, state, price, lon, lat = values
 
-                try:
-                    opis_id = int(row["OPIS Truckstop ID"])
-
-                    location = Point(
-                        float(lon),
-                        float(lat),
-                        srid=4326
-                    )
-
-                    # Deduplicate by opis_id
-                    stations_dict[opis_id] = FuelStation(
-                        opis_id=opis_id,
-                        name=row["Truckstop Name"],
-                        city=row["City"],
-                        state=row["State"],
-                        price=float(row["Retail Price"]),
-                        location=location,
-                    )
-
-                except (ValueError, KeyError):
-                    skipped += 1
-                    continue
+            # Deduplicate by opis_id
+            stations_dict[opis_id] = FuelStation(
+                opis_id=opis_id,
+                name=name,
+                city=city,
+                state=state,
+                price=price,
+                location=Point(lon, lat, srid=4326),
+            )
 
         stations = list(stations_dict.values())
 
@@ -67,9 +103,117 @@ class Command(BaseCommand):
                 batch_size=1000,
             )
 
-        self.stdout.write(
-            self.style.SUCCESS(
-                f"Loaded {len(stations)} fuel stations. "
-                f"Skipped {skipped} invalid rows."
+        return len(stations), parsed, skipped
+
+    def _load_streaming(self, file_path, chunk_size):
+        """
+        COPY parsed rows into a temporary staging table chunk by chunk,
+        then merge into FuelStation with one INSERT ... ON CONFLICT.
+        The last valid row per opis_id wins, as in the in-memory loader.
+        """
+        parsed = 0
+        skipped = 0
+        chunk = io.StringIO()
+        writer = csv.writer(chunk)
+        pending = 0
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                CREATE TEMPORARY TABLE {STAGING_TABLE} (
+                    row_no bigint,
+                    opis_id integer,
+                    name text,
+                    city text,
+                    state text,
+                    price double precision,
+                    lon double precision,
+                    lat double precision
+                ) ON COMMIT DROP
+                """
+            )
+
+            for row in _read_rows(file_path):
+                parsed += 1
+                values = _parse_row(row)
+
+                if values is None:
+                    skipped += 1
+                    continue
+
+                writer.writerow((parsed, *values))
+                pending += 1
+
+                if pending >= chunk_size:
+                    self._copy_chunk(cursor, chunk)
+                    pending = 0
+
+            if pending:
+                self._copy_chunk(cursor, chunk)
+
+            table = FuelStation._meta.db_table
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (opis_id, name, city, state, price, location)
+                SELECT DISTINCT ON (opis_id)
+                    opis_id, name, city, state, price,
+                    ST_SetSRID(ST_MakePoint(lon, lat), 4326)::geography
+                FROM {STAGING_TABLE}
+                ORDER BY opis_id, row_no DESC
+                ON CONFLICT (opis_id) DO UPDATE SET
+                    name = EXCLUDED.name,
+                    city = EXCLUDED.city,
+                    state = EXCLUDED.state,
+                    price = EXCLUDED.price,
+                    location = EXCLUDED.location
+                """
             )
+            loaded = cursor.rowcount
+
+        return loaded, parsed, skipped
+
+    def _copy_chunk(self, cursor, chunk):
+        chunk.seek(0)
+        # csv.writer leaves empty strings unquoted, which COPY would read
+        # as NULL; the in-memory loader keeps them as "".
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) FROM STDIN "
+            "WITH (FORMAT csv, FORCE_NOT_NULL (name, city, state))",
+            chunk,
+        )
+        chunk.seek(0)
+        chunk.truncate()
+
+        if self.verbosity > 1:
+            self.stdout.write(f"Copied chunk ({cursor.rowcount} rows).")
+
+
+def _read_rows(file_path):
+    with open(file_path, newline="", encoding="utf-8") as file:
+        yield from csv.DictReader(file)
+
+
+def _parse_row(row):
+    """
+    (opis_id, name, city, state, price, lon, lat), or None for rows with
+    missing coordinates or unparseable values.
+    """
+    lat = row.get("Latitude")
+    lon = row.get("Longitude")
+
+    # Skip rows with missing coordinates
+    if not lat or not lon:
+        return None
+
+    try:
+        return (
+            int(row["OPIS Truckstop ID"]),
+            row["Truckstop Name"],
+            row["City"],
+            row["State"],
+            float(row["Retail Price"]),
+            float(lon),
+            float(lat),
         )
+    except (ValueError, KeyError):
+        return None
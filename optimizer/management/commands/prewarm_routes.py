@@ -0,0 +1,102 @@
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from services.circuit_breaker import CircuitOpen
+from services.route_cache import route_cache
+from services.routing_service import RoutingError, get_route, route_cache_key
+
+
+class Command(BaseCommand):
+    help = "Fetch routes for the most frequent lanes of a request log into the route cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "log",
+            help=(
+                "JSONL request log: one optimize payload per line, or {\"path\": ..., \"body\": {...}}; "
+                "batch bodies count each of their items."
+            ),
+        )
+        parser.add_argument("--top", type=int, default=100, help="Number of lanes to warm.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.BATCH_ROUTE_WORKERS,
+            help="Concurrent route fetches.",
+        )
+
+    def handle(self, *args, **options):
+
+        started = time.perf_counter()
+
+        try:
+            lanes, requests = _lanes(options["log"])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {options['log']}: {e}")
+
+        top = lanes.most_common(options["top"])
+        cached = {lane for lane, _ in top if route_cache.get(_key(lane))}
+        missing = [lane for lane, _ in top if lane not in cached]
+
+        def warm(lane):
+            try:
+                get_route(list(lane[0]), list(lane[-1]), [list(point) for point in lane[1:-1]])
+                return True
+            except (httpx.HTTPError, RoutingError, CircuitOpen) as e:
+                self.stderr.write(f"Failed to route {lane}: {e}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=max(options["workers"], 1)) as pool:
+            warmed = sum(pool.map(warm, missing))
+
+        covered = sum(count for _, count in top)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(lanes)} distinct lanes in {requests} requests; the top {len(top)} cover "
+            f"{covered / max(requests, 1):.0%}. Warmed {warmed}, already cached {len(cached)}, "
+            f"failed {len(missing) - warmed} in {time.perf_counter() - started:.1f}s"
+        ))
+
+
+def _lanes(path) -> tuple[Counter, int]:
+    """
+    Requests per lane, counting lanes that share a route cache key as one
+    (the first one seen stands for them), and the number of requests read.
+    """
+    lanes = Counter()
+    first_seen = {}
+    requests = 0
+
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            body = record["body"] if "body" in record else record
+
+            for payload in body.get("items", [body]):
+                try:
+                    lane = _lane(payload)
+                except (KeyError, TypeError):
+                    continue
+                requests += 1
+                lanes[first_seen.setdefault(_key(lane), lane)] += 1
+
+    return lanes, requests
+
+
+def _lane(payload) -> tuple:
+    return (
+        (float(payload["start_lon"]), float(payload["start_lat"])),
+        *((float(waypoint["lon"]), float(waypoint["lat"])) for waypoint in payload.get("waypoints", ())),
+        (float(payload["end_lon"]), float(payload["end_lat"])),
+    )
+
+
+def _key(lane) -> str:
+    return route_cache_key(lane[0], lane[-1], lane[1:-1])
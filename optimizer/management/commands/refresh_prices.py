@@ -0,0 +1,116 @@
+import csv
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from optimizer.models import FuelPriceHistory, FuelStation
+from services.data_version import bump_station_price_version
+
+# Accepted column names for the station id and price, in order of preference.
+OPIS_ID_COLUMNS = ("opis_id", "OPIS Truckstop ID")
+PRICE_COLUMNS = ("price", "Retail Price")
+
+
+class Command(BaseCommand):
+    help = "Apply (opis_id, price) deltas, touching only stations whose price changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="CSV with opis_id and price columns (or the OPIS feed columns).")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Deltas applied per transaction.",
+        )
+        parser.add_argument(
+            "--lock-timeout",
+            default="2s",
+            help="Give up on a chunk instead of queueing behind locks longer than this.",
+        )
+
+    def handle(self, *args, **options):
+
+        started = time.perf_counter()
+        read = 0
+        skipped = 0
+        applied = 0
+        updated = 0
+        chunk = {}
+
+        try:
+            with open(options["file"], newline="", encoding="utf-8") as file:
+                reader = csv.DictReader(file)
+                opis_column = _column(reader.fieldnames, OPIS_ID_COLUMNS)
+                price_column = _column(reader.fieldnames, PRICE_COLUMNS)
+
+                for row in reader:
+                    read += 1
+
+                    try:
+                        # Later rows for the same station win.
+                        chunk[int(row[opis_column])] = float(row[price_column])
+                    except (TypeError, ValueError):
+                        skipped += 1
+                        continue
+
+                    if len(chunk) >= options["chunk_size"]:
+                        applied += len(chunk)
+                        updated += _apply(chunk, options["lock_timeout"])
+                        chunk = {}
+
+            if chunk:
+                applied += len(chunk)
+                updated += _apply(chunk, options["lock_timeout"])
+        finally:
+            # Chunks commit separately, so bump even when a later chunk
+            # fails (say, on lock_timeout): the committed prices are live.
+            if updated:
+                bump_station_price_version()
+
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Updated {updated} prices. "
+                f"{applied - updated} unchanged or unknown stations. "
+                f"Skipped {skipped} of {read} rows as invalid. "
+                f"Took {elapsed:.2f}s."
+            )
+        )
+
+
+def _apply(deltas: dict, lock_timeout: str) -> int:
+    """
+    Update prices for one chunk of deltas in a short transaction and
+    append the changes to the price history. Only rows whose price
+    differs are written, so unchanged stations take no row locks and
+    produce no dead tuples.
+    """
+
+    table = FuelStation._meta.db_table
+    history = FuelPriceHistory._meta.db_table
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('lock_timeout', %s, true)", [lock_timeout])
+        cursor.execute(
+            f"""
+            WITH changed AS (
+                UPDATE {table} AS station
+                SET price = delta.price
+                FROM unnest(%s::integer[], %s::double precision[]) AS delta(opis_id, price)
+                WHERE station.opis_id = delta.opis_id
+                  AND station.price IS DISTINCT FROM delta.price
+                RETURNING station.id, station.price
+            )
+            INSERT INTO {history} (station_id, effective_from, price)
+            SELECT id, statement_timestamp(), price FROM changed
+            """,
+            [list(deltas), list(deltas.values())],
+        )
+        return cursor.rowcount
+
+
+def _column(fieldnames, candidates) -> str:
+    for name in candidates:
+        if name in (fieldnames or ()):
+            return name
+    raise CommandError(f"Missing column, expected one of: {', '.join(candidates)}.")
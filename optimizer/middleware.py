@@ -0,0 +1,161 @@
+"""
+Response middleware: compression and Server-Timing.
+
+CompressionMiddleware is like django.middleware.gzip.GZipMiddleware, but
+prefers brotli when the client accepts it and the optional brotli package
+is installed. Encoded polylines and JSON number arrays compress
+several-fold either way. Only JSON responses under
+settings.RESPONSE_COMPRESSION_PATHS (the optimize endpoints) are
+compressed: they carry no secrets, unlike HTML pages with CSRF tokens.
+
+Both middleware classes are sync- and async-capable, so under ASGI the
+async optimize view is awaited directly rather than run on a thread.
+"""
+
+import gzip
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from services.metrics import collect_timings, server_timing
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+_Q_ZERO = re.compile(r"^\s*q\s*=\s*0(\.0*)?\s*$")
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    """
+    Whether an Accept-Encoding header allows a coding (q=0 refuses it).
+    """
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        if name.strip().lower() == coding:
+            return not _Q_ZERO.match(params)
+    return False
+
+
+def _compress(content: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(content, quality=settings.RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=settings.RESPONSE_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    Compress non-streaming responses of at least RESPONSE_COMPRESSION_MIN_BYTES
+    with brotli or gzip, whichever the client prefers and we support.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header("Content-Encoding") or not _compressible(request, response):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        if len(response.content) < settings.RESPONSE_COMPRESSION_MIN_BYTES:
+            return response
+
+        coding = _coding_for(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if coding is None:
+            return response
+
+        compressed = _compress(response.content, coding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = coding
+
+        # The representation changed, so a strong ETag no longer holds.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+
+        return response
+
+
+class ServerTimingMiddleware:
+    """
+    Report the request's pipeline stage timings (services.metrics.stage)
+    in a Server-Timing header, plus the total time spent in the view.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.SERVER_TIMING_ENABLED:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with collect_timings() as timings:
+            response = self.get_response(request)
+
+        return _with_server_timing(response, timings, started)
+
+    async def __acall__(self, request):
+        if not settings.SERVER_TIMING_ENABLED:
+            return await self.get_response(request)
+
+        # The timings ContextVar is copied into tasks and sync_to_async
+        # threads the view starts, so their stages land here too.
+        started = time.perf_counter()
+        with collect_timings() as timings:
+            response = await self.get_response(request)
+
+        return _with_server_timing(response, timings, started)
+
+
+def _with_server_timing(response, timings: dict, started: float):
+    if timings:
+        timings["total"] = time.perf_counter() - started
+        response["Server-Timing"] = server_timing(timings)
+    return response
+
+
+def _compressible(request, response) -> bool:
+    content_type = response.get("Content-Type", "").partition(";")[0].strip()
+    return content_type == "application/json" and request.path.startswith(
+        tuple(settings.RESPONSE_COMPRESSION_PATHS)
+    )
+
+
+def _coding_for(accept_encoding: str) -> str | None:
+    if brotli is not None and _accepts(accept_encoding, "br"):
+        return "br"
+    if _accepts(accept_encoding, "gzip"):
+        return "gzip"
+    return None
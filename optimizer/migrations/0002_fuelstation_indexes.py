@@ -0,0 +1,34 @@
+# Generated by Django 5.2.11 on 2026-10-18 06:38
+
+import django.contrib.gis.db.models.fields
+import django.contrib.gis.db.models.functions
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optimizer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fuelstation',
+            name='location',
+            field=django.contrib.gis.db.models.fields.PointField(geography=True, spatial_index=False, srid=4326),
+        ),
+        migrations.AddIndex(
+            model_name='fuelstation',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['location'], name='fuelstation_location_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='fuelstation',
+            index=django.contrib.postgres.indexes.GistIndex(django.contrib.gis.db.models.functions.Transform(django.db.models.functions.comparison.Cast('location', django.contrib.gis.db.models.fields.GeometryField(srid=4326)), 3857), name='fuelstation_location_3857_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='fuelstation',
+            index=models.Index(fields=['id'], include=('price',), name='fuelstation_id_price'),
+        ),
+    ]
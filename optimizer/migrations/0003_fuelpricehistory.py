@@ -0,0 +1,28 @@
+# Generated by Django 5.2.11 on 2026-10-18 06:42
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optimizer', '0002_fuelstation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FuelPriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('effective_from', models.DateTimeField()),
+                ('price', models.FloatField()),
+                ('station', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='optimizer.fuelstation')),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.BrinIndex(fields=['effective_from'], name='fuelpricehistory_time_brin')],
+                'constraints': [models.UniqueConstraint(fields=('station', 'effective_from'), include=('price',), name='fuelpricehistory_station_time')],
+            },
+        ),
+    ]
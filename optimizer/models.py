@@ -1,4 +1,8 @@
 from django.contrib.gis.db import models
+from django.contrib.gis.db.models.functions import Transform
+from django.contrib.postgres.indexes import BrinIndex, GistIndex
+from django.db.models.functions import Cast
+
 
 class FuelStation(models.Model):
     opis_id = models.IntegerField(unique=True)
@@ -7,7 +11,58 @@ class FuelStation(models.Model):
     state = models.CharField(max_length=10)
     price = models.FloatField()
 
-    location = models.PointField(geography=True)
+    # Indexed explicitly in Meta.indexes.
+    location = models.PointField(geography=True, spatial_index=False)
+
+    class Meta:
+        indexes = [
+            # Geography GiST for the ST_DWithin corridor mode.
+            GistIndex(fields=["location"], name="fuelstation_location_gist"),
+            # Planar EPSG:3857 GiST for the buffer corridor mode. The
+            # expression must stay identical to
+            # services.spatial_service.projected_location().
+            GistIndex(
+                Transform(Cast("location", models.GeometryField(srid=4326)), 3857),
+                name="fuelstation_location_3857_gist",
+            ),
+            # Lets price refreshes by id (cached route artifacts) run as
+            # index-only scans.
+            models.Index(fields=["id"], include=["price"], name="fuelstation_id_price"),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.city}, {self.state})"
+
+
+class FuelPriceHistory(models.Model):
+    """
+    Append-only price history: one row per station per price change.
+    """
+    # Covered by the unique (station, effective_from) index below.
+    station = models.ForeignKey(
+        FuelStation,
+        on_delete=models.CASCADE,
+        related_name="price_history",
+        db_index=False,
+    )
+    effective_from = models.DateTimeField()
+    price = models.FloatField()
+
+    class Meta:
+        constraints = [
+            # Also answers "price as of a time" with one backward index
+            # probe per station, without touching the heap.
+            models.UniqueConstraint(
+                fields=["station", "effective_from"],
+                include=["price"],
+                name="fuelpricehistory_station_time",
+            ),
+        ]
+        indexes = [
+            # Rows are appended in time order, so a BRIN index keeps time
+            # range scans (retention, per-day snapshots) tiny.
+            BrinIndex(fields=["effective_from"], name="fuelpricehistory_time_brin"),
+        ]
+
+    def __str__(self):
+        return f"{self.station_id} @ {self.effective_from:%Y-%m-%d %H:%M}: {self.price}"
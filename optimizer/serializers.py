@@ -1,5 +1,20 @@
+from django.conf import settings
 from rest_framework import serializers
 
+from services.optimization_service import ALGORITHMS
+from services.spatial_service import CORRIDOR_MILES
+
+# Optional response expansions: "station" adds each stop's station details.
+EXPANSIONS = ["station"]
+
+# How route_geometry is returned: as received from ORS, simplified, or not at all.
+GEOMETRY_CHOICES = ["full", "simplified", "omit"]
+
+
+class WaypointSerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+
 
 class OptimizeRouteSerializer(serializers.Serializer):
     start_lat = serializers.FloatField()
@@ -7,10 +22,30 @@ class OptimizeRouteSerializer(serializers.Serializer):
     end_lat = serializers.FloatField()
     end_lon = serializers.FloatField()
 
+    # Intermediate stops visited in order between start and end.
+    waypoints = WaypointSerializer(many=True, required=False, max_length=settings.ROUTE_MAX_WAYPOINTS)
+
     tank_capacity = serializers.FloatField(min_value=0)
     mpg = serializers.FloatField(min_value=0)
     start_fuel = serializers.FloatField(min_value=0)
 
+    algorithm = serializers.ChoiceField(choices=list(ALGORITHMS), default="greedy")
+
+    # Only consider stations within this many ground miles of the route.
+    corridor_miles = serializers.FloatField(min_value=0, max_value=CORRIDOR_MILES, required=False)
+    # Dollar value of an hour spent driving off the route to a station.
+    time_cost_per_hour = serializers.FloatField(min_value=0, default=0)
+
+    # Plan against prices as of this time instead of current prices.
+    departure_time = serializers.DateTimeField(required=False)
+
+    expand = serializers.MultipleChoiceField(choices=EXPANSIONS, required=False)
+
+    include_geometry = serializers.ChoiceField(choices=GEOMETRY_CHOICES, default="full")
+    geometry_tolerance_meters = serializers.FloatField(
+        min_value=0, default=settings.ROUTE_GEOMETRY_TOLERANCE_METERS
+    )
+
     def validate(self, data):
         for field in ["start_lat", "end_lat"]:
             if not -90 <= data[field] <= 90:
@@ -26,3 +61,15 @@ class OptimizeRouteSerializer(serializers.Serializer):
             )
 
         return data
+
+
+class OptimizeBatchSerializer(serializers.Serializer):
+    """
+    Envelope for a batch of optimize payloads. Each item is validated
+    separately by the view so one bad item does not fail the batch.
+    """
+    items = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_ITEMS,
+    )
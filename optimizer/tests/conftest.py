@@ -0,0 +1,22 @@
+import pytest
+from django.core.cache.backends.locmem import LocMemCache
+from services.route_artifacts import artifact_cache
+from services.route_cache import route_cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_route_caches(mocker):
+    """
+    Give every test empty route and artifact caches, so routes and
+    artifacts computed against one test's stations never reach another
+    (or a later run against the same Redis).
+    """
+    for cache in (route_cache, artifact_cache):
+        # LocMemCache instances of the same name share storage.
+        remote = LocMemCache(f"test-{cache.name}", {})
+        remote.clear()
+        mocker.patch.object(cache, "remote", remote)
+        cache.local.clear()
+    yield
+    for cache in (route_cache, artifact_cache):
+        cache.local.clear()
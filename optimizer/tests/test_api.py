@@ -1,6 +1,8 @@
 import pytest
 import polyline
+from django.contrib.gis.geos import Point
 from rest_framework.test import APIClient
+from optimizer.models import FuelStation
 
 @pytest.mark.django_db
 def test_optimize_route_endpoint(mocker):
@@ -30,4 +32,298 @@ def test_optimize_route_endpoint(mocker):
     }, format="json")
 
     assert response.status_code == 200
-    assert response.data["total_cost"] == 0
\ No newline at end of file
+    assert response.data["total_cost"] == 0
+
+@pytest.mark.django_db
+def test_optimize_batch_endpoint(mocker):
+
+    encoded_geometry = polyline.encode([
+        (40.0, -75.0),
+        (41.0, -76.0),
+    ])
+
+    get_route = mocker.patch("optimizer.views.get_route")
+    get_route.return_value = {
+        "distance_miles": 100,
+        "geometry": encoded_geometry,
+    }
+
+    mocker.patch("optimizer.views.get_station_coordinates_along_routes").return_value = []
+
+    payload = {
+        "start_lat": 40,
+        "start_lon": -75,
+        "end_lat": 41,
+        "end_lon": -76,
+        "tank_capacity": 20,
+        "mpg": 10,
+        "start_fuel": 20,
+    }
+
+    client = APIClient()
+
+    response = client.post("/api/optimize/batch/", {
+        "items": [
+            payload,
+            payload,
+            {**payload, "start_fuel": 1},
+            {**payload, "start_lat": 200},
+        ],
+    }, format="json")
+
+    assert response.status_code == 200
+    assert get_route.call_count == 1
+
+    results = response.data["results"]
+    assert results[0]["total_cost"] == 0
+    assert results[1]["total_cost"] == 0
+    assert "error" in results[2]
+    assert "errors" in results[3]
+
+
+def test_unexpected_lane_error_fails_only_that_lane(mocker):
+    from optimizer.views import _fetch_routes
+
+    good, bad = ((-75.0, 40.0), (-76.0, 41.0)), ((-75.0, 40.0), (-77.0, 42.0))
+    route = {"distance_miles": 100, "geometry": "_p~iF~ps|U"}
+
+    def get_route(start, end, waypoints):
+        if end == [-77.0, 42.0]:
+            raise KeyError("routes")
+        return route
+
+    mocker.patch("optimizer.views.get_route", side_effect=get_route)
+
+    routes = _fetch_routes([good, bad])
+
+    assert routes[good] == route
+    assert isinstance(routes[bad], KeyError)
+
+
+def test_refreshed_route_gets_its_own_artifacts():
+    from optimizer.views import _route_key
+
+    lane = ((-75.0, 40.0), (-76.0, 41.0))
+    cached = {"distance_miles": 100, "geometry": "_p~iF~ps|U", "fetched_at": 1000.0}
+    refreshed = {**cached, "distance_miles": 104, "fetched_at": 90000.0}
+
+    assert _route_key(lane, cached) == _route_key(lane, dict(cached))
+    assert _route_key(lane, refreshed) != _route_key(lane, cached)
+
+
+@pytest.mark.django_db
+def test_repeat_route_reuses_artifacts_with_fresh_prices(mocker):
+
+    encoded_geometry = polyline.encode([
+        (35.0, -90.0),
+        (35.0, -91.0),
+    ])
+
+    mocker.patch("optimizer.views.get_route").return_value = {
+        "distance_miles": 60,
+        "geometry": encoded_geometry,
+    }
+
+    station = FuelStation.objects.create(
+        opis_id=99,
+        name="Test",
+        city="Test",
+        state="AR",
+        price=4.0,
+        location=Point(-90.5, 35.0, srid=4326),
+    )
+
+    corridor_lookup = mocker.patch("optimizer.views.get_stations_along_route")
+    corridor_lookup.return_value = [station]
+
+    payload = {
+        "start_lat": 35,
+        "start_lon": -90,
+        "end_lat": 35,
+        "end_lon": -91,
+        "tank_capacity": 10,
+        "mpg": 10,
+        "start_fuel": 4,
+    }
+
+    client = APIClient()
+
+    first = client.post("/api/optimize/", payload, format="json")
+
+    FuelStation.objects.filter(id=station.id).update(price=3.0)
+
+    second = client.post("/api/optimize/", payload, format="json")
+
+    assert corridor_lookup.call_count == 1
+    assert first.data["fuel_stops"][0]["price"] == 4.0
+    assert second.data["fuel_stops"][0]["price"] == 3.0
+
+
+@pytest.mark.django_db
+def test_optimize_route_with_waypoints_uses_one_route(mocker):
+
+    encoded_geometry = polyline.encode([
+        (40.0, -75.0),
+        (40.5, -75.5),
+        (41.0, -76.0),
+    ])
+
+    get_route = mocker.patch("optimizer.views.get_route")
+    get_route.return_value = {
+        "distance_miles": 100,
+        "leg_miles": [30, 45, 25],
+        "geometry": encoded_geometry,
+    }
+    corridor_lookup = mocker.patch("optimizer.views.get_stations_along_route")
+    corridor_lookup.return_value = []
+
+    response = APIClient().post("/api/optimize/", {
+        "start_lat": 40,
+        "start_lon": -75,
+        "end_lat": 41,
+        "end_lon": -76,
+        "waypoints": [{"lat": 40.3, "lon": -75.2}, {"lat": 40.7, "lon": -75.7}],
+        "tank_capacity": 20,
+        "mpg": 10,
+        "start_fuel": 20,
+    }, format="json")
+
+    assert response.status_code == 200
+    get_route.assert_called_once_with([-75, 40], [-76, 41], [[-75.2, 40.3], [-75.7, 40.7]])
+    assert corridor_lookup.call_count == 1
+    assert response.data["waypoint_mile_markers"] == [30, 75]
+
+
+@pytest.mark.django_db
+def test_expand_station_adds_stop_details(mocker):
+
+    station = FuelStation.objects.create(
+        opis_id=1,
+        name="Stop",
+        city="Town",
+        state="PA",
+        price=3.0,
+        location=Point(-74.9, 40.5, srid=4326),
+    )
+
+    mocker.patch("optimizer.views.get_route").return_value = {
+        "distance_miles": 300,
+        "geometry": polyline.encode([(40.0, -75.0), (41.0, -75.0)]),
+    }
+    mocker.patch("optimizer.views.get_stations_along_route").return_value = [station]
+
+    payload = {
+        "start_lat": 40,
+        "start_lon": -75.0,
+        "end_lat": 41,
+        "end_lon": -75.0,
+        "tank_capacity": 20,
+        "mpg": 10,
+        "start_fuel": 20,
+    }
+
+    lean = APIClient().post("/api/optimize/", payload, format="json")
+    assert "station" not in lean.data["fuel_stops"][0]
+
+    response = APIClient().post("/api/optimize/", {**payload, "expand": ["station"]}, format="json")
+
+    stop = response.data["fuel_stops"][0]
+    details = stop["station"]
+    assert (details["name"], details["city"], details["state"]) == ("Stop", "Town", "PA")
+    assert (details["lon"], details["lat"]) == (pytest.approx(-74.9), pytest.approx(40.5))
+    assert "detour_miles" not in details
+    assert stop["detour_miles"] == pytest.approx(5.26, abs=0.05)
+
+
+@pytest.mark.django_db
+def test_stops_carry_detours_and_corridor_miles_narrows(mocker):
+
+    station = FuelStation.objects.create(
+        opis_id=1,
+        name="Stop",
+        city="Town",
+        state="PA",
+        price=3.0,
+        location=Point(-74.9, 40.5, srid=4326),
+    )
+
+    mocker.patch("optimizer.views.get_route").return_value = {
+        "distance_miles": 300,
+        "geometry": polyline.encode([(40.0, -75.0), (41.0, -75.0)]),
+    }
+    mocker.patch("optimizer.views.get_stations_along_route").return_value = [station]
+
+    payload = {
+        "start_lat": 40,
+        "start_lon": -75.0,
+        "end_lat": 41,
+        "end_lon": -75.0,
+        "tank_capacity": 20,
+        "mpg": 10,
+        "start_fuel": 20,
+    }
+
+    response = APIClient().post("/api/optimize/", payload, format="json")
+
+    [stop] = response.data["fuel_stops"]
+    assert stop["detour_miles"] == pytest.approx(5.26, abs=0.05)
+    assert stop["gallons"] == pytest.approx(10 + 2 * stop["detour_miles"] / 10, abs=0.01)
+
+    narrow = APIClient().post("/api/optimize/", {**payload, "corridor_miles": 5}, format="json")
+
+    assert narrow.status_code == 400
+
+
+@pytest.mark.django_db
+def test_include_geometry_modes(mocker):
+
+    coords = [(40.0 + i * 0.01, -75.0 + (i % 2) * 1e-5) for i in range(100)]
+    encoded_geometry = polyline.encode(coords)
+
+    mocker.patch("optimizer.views.get_route").return_value = {
+        "distance_miles": 70,
+        "geometry": encoded_geometry,
+    }
+    mocker.patch("optimizer.views.get_stations_along_route").return_value = []
+
+    payload = {
+        "start_lat": 40,
+        "start_lon": -75,
+        "end_lat": 41,
+        "end_lon": -75,
+        "tank_capacity": 20,
+        "mpg": 10,
+        "start_fuel": 20,
+    }
+    client = APIClient()
+
+    full = client.post("/api/optimize/", payload, format="json")
+    simplified = client.post("/api/optimize/", {**payload, "include_geometry": "simplified"}, format="json")
+    omitted = client.post("/api/optimize/", {**payload, "include_geometry": "omit"}, format="json")
+
+    assert full.data["route_geometry"] == encoded_geometry
+    assert len(polyline.decode(simplified.data["route_geometry"])) == 2
+    assert "route_geometry" not in omitted.data
+
+    compressed = client.post("/api/optimize/", payload, format="json", HTTP_ACCEPT_ENCODING="gzip")
+    assert compressed["Content-Encoding"] in ("gzip", "br")
+
+
+@pytest.mark.django_db
+def test_open_ors_circuit_returns_503_with_retry_after(mocker):
+    from services.circuit_breaker import CircuitOpen
+
+    mocker.patch("optimizer.views.get_route").side_effect = CircuitOpen("ors", retry_after=12.4)
+
+    response = APIClient().post("/api/optimize/", {
+        "start_lat": 40,
+        "start_lon": -75,
+        "end_lat": 41,
+        "end_lon": -76,
+        "tank_capacity": 20,
+        "mpg": 10,
+        "start_fuel": 20,
+    }, format="json")
+
+    assert response.status_code == 503
+    assert response["Retry-After"] == "12"
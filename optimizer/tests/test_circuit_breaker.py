@@ -0,0 +1,69 @@
+import pytest
+from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail(breaker):
+    with pytest.raises(RuntimeError):
+        with breaker.guard():
+            raise RuntimeError("upstream down")
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30, clock=Clock())
+    calls = []
+
+    fail(breaker)
+    fail(breaker)
+    with breaker.guard():
+        pass  # a success resets the count
+    fail(breaker)
+    fail(breaker)
+    assert breaker.state == CLOSED
+
+    fail(breaker)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpen) as raised:
+        with breaker.guard():
+            calls.append(1)
+    assert calls == []
+    assert raised.value.retry_after == 30
+
+
+def test_half_open_lets_one_probe_through():
+    clock = Clock()
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30, clock=clock)
+    fail(breaker)
+
+    clock.now = 30
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.now = 60
+    with breaker.guard():
+        pass
+    assert breaker.state == CLOSED
+
+
+def test_errors_that_are_not_failures_keep_it_closed():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30, clock=Clock())
+
+    with pytest.raises(ValueError):
+        with breaker.guard(is_failure=lambda error: not isinstance(error, ValueError)):
+            raise ValueError("bad request")
+
+    assert breaker.state == CLOSED
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import time
+
+from scripts.geocoding import GeocodeCache, OfflineResolver, StubProvider, TokenBucket, geocode_all
+from scripts.geocoding.offline import load_gazetteer
+
+
+def test_geocode_all_caches_results_and_skips_cached(tmp_path):
+    cache = GeocodeCache(tmp_path / "cache.jsonl", flush_every=2)
+    provider = StubProvider(
+        {"a": {"lat": 1.0, "lon": 2.0}, "b": {"lat": 3.0, "lon": 4.0}},
+        transient_failures={"b": 2},
+    )
+
+    stats = asyncio.run(geocode_all(["a", "b", "c", "a"], provider, cache, backoff=0))
+
+    assert (stats.resolved, stats.not_found, stats.failed) == (2, 1, 0)
+    assert provider.calls == 5  # a, c, and b after two transient failures
+
+    reloaded = GeocodeCache(tmp_path / "cache.jsonl")
+    assert reloaded.get("b") == {"lat": 3.0, "lon": 4.0}
+    assert "c" in reloaded and reloaded.get("c") is None
+
+    stats = asyncio.run(geocode_all(["a", "b", "c"], provider, reloaded))
+    assert stats.cached == 3
+    assert provider.calls == 5
+
+
+def test_exhausted_transient_failures_are_not_cached(tmp_path):
+    cache = GeocodeCache(tmp_path / "cache.jsonl")
+    provider = StubProvider({"a": {"lat": 1.0, "lon": 2.0}}, transient_failures={"a": 10})
+
+    stats = asyncio.run(geocode_all(["a"], provider, cache, max_retries=3, backoff=0))
+
+    assert stats.failed == 1
+    assert "a" not in cache
+
+
+def test_cache_imports_legacy_json(tmp_path):
+    legacy = tmp_path / "geocode_cache.json"
+    legacy.write_text(json.dumps({"a": {"lat": 1.0, "lon": 2.0}, "b": None}))
+
+    cache = GeocodeCache(tmp_path / "cache.jsonl", legacy_path=legacy)
+
+    assert cache.get("a") == {"lat": 1.0, "lon": 2.0}
+    assert len(GeocodeCache(tmp_path / "cache.jsonl")) == 2
+
+
+def test_token_bucket_limits_rate():
+
+    async def acquire_many():
+        bucket = TokenBucket(rate=50, capacity=1)
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(6)))
+        return time.monotonic() - started
+
+    assert asyncio.run(acquire_many()) >= 0.09
+
+
+def test_offline_resolver_confidence_levels(tmp_path):
+    known = {
+        "i-44 & us-69, big cabin, ok, usa": {"lat": 36.5, "lon": -95.2},
+        "i-35 & cr-372, jarrell, tx, usa": {"lat": 30.8, "lon": -97.6},
+        "i-40, exit 283, weatherford, ok, usa": {"lat": 35.5, "lon": -98.7},
+        "us-46, columbia, nj, usa": None,
+    }
+    gazetteer = tmp_path / "places.txt"
+    gazetteer.write_text("USPS\tNAME\tINTPTLAT\tINTPTLONG\nTX\tAbilene city\t32.45\t-99.74\n")
+
+    resolver = OfflineResolver(known, load_gazetteer(gazetteer))
+
+    assert resolver.resolve("i-44 & us-69, big cabin, ok, usa") == ({"lat": 36.5, "lon": -95.2}, "exact")
+    assert resolver.resolve("interstate 44 and us 69, big cabin, ok, usa")[1] == "normalized"
+    assert resolver.resolve("i-35, exit 271, jarrell, tx, usa") == ({"lat": 30.8, "lon": -97.6}, "fuzzy")
+    assert resolver.resolve("i-40 exit #283 & sr-54, hydro, ok, usa") == ({"lat": 35.5, "lon": -98.7}, "fuzzy")
+    assert resolver.resolve("us-46, big cabin, ok, usa") == ({"lat": 36.5, "lon": -95.2}, "city")
+    assert resolver.resolve("i-20, exit 288, abilene, tx, usa") == ({"lat": 32.45, "lon": -99.74}, "city")
+    assert resolver.resolve("us-46, columbia, nj, usa") == (None, None)
@@ -1,6 +1,14 @@
+import json
+from io import StringIO
+
 import pytest
+from django.contrib.gis.geos import Point
 from django.core.management import call_command
+from django.db import OperationalError
 from optimizer.models import FuelStation
+from services.circuit_breaker import CircuitOpen
+from services.data_version import get_station_price_version
+from services.road_graph import RoadGraph
 
 
 @pytest.mark.django_db
@@ -20,4 +28,170 @@ def test_load_fuel_data(tmp_path, settings):
 
     call_command("load_fuel_data")
 
-    assert FuelStation.objects.count() == 1
\ No newline at end of file
+    assert FuelStation.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_load_fuel_data_streaming_keeps_last_row_per_opis_id(tmp_path):
+
+    file = tmp_path / "stations.csv"
+
+    file.write_text(
+        "OPIS Truckstop ID,Truckstop Name,City,State,Retail Price,Latitude,Longitude\n"
+        "1,Old Name,City,PA,4.0,40.0,-75.0\n"
+        "2,Other,City,PA,3.5,41.0,-76.0\n"
+        "1,New Name,City,PA,3.9,40.1,-75.1\n"
+        "1,Invalid,City,PA,3.8,,\n"
+    )
+
+    call_command("load_fuel_data", f"--file={file}", "--stream", "--chunk-size=1")
+
+    assert FuelStation.objects.count() == 2
+
+    station = FuelStation.objects.get(opis_id=1)
+    assert (station.name, station.price) == ("New Name", 3.9)
+    assert station.location.x == pytest.approx(-75.1)
+
+
+@pytest.mark.django_db
+def test_load_fuel_data_streaming_keeps_empty_text_fields(tmp_path):
+
+    file = tmp_path / "stations.csv"
+
+    file.write_text(
+        "OPIS Truckstop ID,Truckstop Name,City,State,Retail Price,Latitude,Longitude\n"
+        "1,Roadside,,PA,4.0,40.0,-75.0\n"
+    )
+
+    call_command("load_fuel_data", f"--file={file}", "--stream")
+
+    assert FuelStation.objects.get(opis_id=1).city == ""
+
+
+@pytest.mark.django_db
+def test_explain_corridor_prints_plans():
+    out = StringIO()
+
+    call_command("explain_corridor", "--start=-75,40", "--end=-75,41", "--points=50", stdout=out)
+
+    assert out.getvalue().count("Execution Time") == 3
+
+    out = StringIO()
+    call_command("explain_corridor", "--start=-75,40", "--end=-75,41", "--points=50", "--mode=dwithin", stdout=out)
+
+    assert out.getvalue().count("Execution Time") == 3
+
+
+@pytest.mark.django_db
+def test_refresh_prices_updates_changed_prices_only(tmp_path):
+    unchanged, changed = [
+        FuelStation.objects.create(
+            opis_id=opis_id,
+            name="Test",
+            city="Test",
+            state="PA",
+            price=4.0,
+            location=Point(-75, 40, srid=4326),
+        )
+        for opis_id in (1, 2)
+    ]
+    price_version = get_station_price_version()
+
+    file = tmp_path / "prices.csv"
+    file.write_text("opis_id,price\n1,4.0\n2,3.5\n2,3.25\n3,2.0\nx,1.0\n")
+
+    out = StringIO()
+    call_command("refresh_prices", str(file), stdout=out)
+
+    assert "Updated 1 prices" in out.getvalue()
+    changed.refresh_from_db()
+    unchanged.refresh_from_db()
+    assert (unchanged.price, changed.price) == (4.0, 3.25)
+    assert get_station_price_version() == price_version + 1
+
+
+def test_refresh_prices_bumps_version_when_a_later_chunk_fails(tmp_path, mocker):
+    apply = mocker.patch(
+        "optimizer.management.commands.refresh_prices._apply",
+        side_effect=[2, OperationalError("canceling statement due to lock timeout")],
+    )
+    bump = mocker.patch("optimizer.management.commands.refresh_prices.bump_station_price_version")
+
+    file = tmp_path / "prices.csv"
+    file.write_text("opis_id,price\n1,4.0\n2,3.5\n3,2.0\n")
+
+    with pytest.raises(OperationalError):
+        call_command("refresh_prices", str(file), "--chunk-size=2", stdout=StringIO())
+
+    assert apply.call_count == 2
+    bump.assert_called_once()
+
+
+def test_build_road_graph(tmp_path):
+    roads = tmp_path / "roads.geojson"
+    roads.write_text(json.dumps({
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "properties": {"highway": "motorway", "oneway": "no"},
+                "geometry": {"type": "LineString", "coordinates": [[-75.0, 40.0], [-74.95, 40.05]]},
+            },
+            {
+                "type": "Feature",
+                "properties": {"highway": "primary", "maxspeed": "45 mph", "oneway": "yes"},
+                "geometry": {"type": "MultiLineString", "coordinates": [[[-74.95, 40.05], [-74.9, 40.0]]]},
+            },
+            {
+                "type": "Feature",
+                "properties": {},
+                "geometry": {"type": "Point", "coordinates": [-75.0, 40.0]},
+            },
+        ],
+    }))
+
+    out = StringIO()
+    call_command("build_road_graph", str(roads), output=str(tmp_path / "graph"), stdout=out)
+
+    graph = RoadGraph.load(tmp_path / "graph")
+    assert (graph.node_count, graph.edge_count) == (3, 3)
+    assert "2 lines" in out.getvalue()
+
+
+def test_prewarm_routes_warms_the_most_requested_lanes(tmp_path, mocker, settings):
+    settings.ROUTE_KEY_PRECISION = 3
+    log = tmp_path / "requests.jsonl"
+    trip = {"start_lat": 40.0, "start_lon": -75.0, "end_lat": 41.0, "end_lon": -76.0}
+    nearby = {**trip, "start_lon": -75.00002}
+    rare = {"start_lat": 35.0, "start_lon": -90.0, "end_lat": 36.0, "end_lon": -91.0}
+    log.write_text("\n".join(json.dumps(line) for line in [
+        trip,
+        nearby,
+        {"path": "/api/optimize/batch/", "body": {"items": [trip, rare]}},
+    ]) + "\n")
+
+    mocker.patch("optimizer.management.commands.prewarm_routes.route_cache").get.return_value = None
+    get_route = mocker.patch("optimizer.management.commands.prewarm_routes.get_route")
+
+    out = StringIO()
+    call_command("prewarm_routes", str(log), top=1, stdout=out)
+
+    get_route.assert_called_once_with([-75.0, 40.0], [-76.0, 41.0], [])
+    assert "2 distinct lanes in 4 requests; the top 1 cover 75%" in out.getvalue()
+
+
+def test_prewarm_routes_counts_lanes_failed_by_an_open_breaker(tmp_path, mocker):
+    log = tmp_path / "requests.jsonl"
+    log.write_text("\n".join(json.dumps({
+        "start_lat": 40.0, "start_lon": -75.0 - i, "end_lat": 41.0, "end_lon": -76.0,
+    }) for i in range(3)) + "\n")
+
+    mocker.patch("optimizer.management.commands.prewarm_routes.route_cache").get.return_value = None
+    mocker.patch(
+        "optimizer.management.commands.prewarm_routes.get_route", side_effect=CircuitOpen("ors", 30)
+    )
+
+    out = StringIO()
+    call_command("prewarm_routes", str(log), stdout=out, stderr=StringIO())
+
+    assert "Warmed 0, already cached 0, failed 3" in out.getvalue()
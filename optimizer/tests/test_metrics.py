@@ -0,0 +1,47 @@
+import pytest
+from services.metrics import Registry, collect_timings, server_timing, stage, STAGE_SECONDS
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram("stage_seconds", "Stage time.", (0.1, 1.0), labels=("stage",))
+
+    histogram.observe(0.05, stage="ors")
+    histogram.observe(0.1, stage="ors")
+    histogram.observe(3, stage="ors")
+
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == ["# HELP stage_seconds Stage time.", "# TYPE stage_seconds histogram"]
+    assert 'stage_seconds_bucket{stage="ors",le="0.1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="ors",le="1.0"} 2' in lines
+    assert 'stage_seconds_bucket{stage="ors",le="+Inf"} 3' in lines
+    assert 'stage_seconds_count{stage="ors"} 3' in lines
+    assert histogram.sum(stage="ors") == pytest.approx(3.15)
+
+
+def test_counter_renders_labels():
+    registry = Registry()
+    counter = registry.counter("lookups_total", "Lookups.", labels=("cache", "result"))
+
+    counter.inc(cache="route", result="miss")
+    counter.inc(2, cache="route", result="miss")
+
+    assert 'lookups_total{cache="route",result="miss"} 3' in registry.render().splitlines()
+
+
+def test_stage_feeds_histogram_and_request_timings():
+    before = STAGE_SECONDS.count(stage="test-stage")
+
+    with collect_timings() as timings:
+        with stage("test-stage"):
+            pass
+        with stage("test-stage"):
+            pass
+
+    with stage("test-stage"):
+        pass
+
+    assert STAGE_SECONDS.count(stage="test-stage") == before + 3
+    assert list(timings) == ["test-stage"]
+    assert server_timing({"ors": 0.0123, "optimize": 0.0004}) == "ors;dur=12.3, optimize;dur=0.4"
@@ -0,0 +1,89 @@
+import asyncio
+import gzip
+
+from asgiref.sync import iscoroutinefunction
+from django.http import HttpResponse
+from django.test import RequestFactory
+from optimizer.middleware import CompressionMiddleware, ServerTimingMiddleware
+from services.metrics import stage
+
+BODY = b'{"route_geometry": "' + b"abc" * 500 + b'"}'
+
+
+def _respond(body, accept_encoding, path="/api/optimize/", content_type="application/json"):
+    middleware = CompressionMiddleware(lambda request: HttpResponse(body, content_type=content_type))
+    request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING=accept_encoding)
+    return middleware(request)
+
+
+def test_gzip_when_accepted(mocker):
+    mocker.patch("optimizer.middleware.brotli", None)
+
+    response = _respond(BODY, "gzip, deflate, br")
+
+    assert response["Content-Encoding"] == "gzip"
+    assert response["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(response.content) == BODY
+    assert int(response["Content-Length"]) < len(BODY)
+
+
+def test_brotli_preferred_when_installed(mocker):
+    brotli = mocker.patch("optimizer.middleware.brotli")
+    brotli.compress.return_value = b"tiny"
+
+    response = _respond(BODY, "gzip, br")
+
+    assert response["Content-Encoding"] == "br"
+    assert response.content == b"tiny"
+
+
+def test_uncompressed_when_refused_or_small(mocker):
+    mocker.patch("optimizer.middleware.brotli", None)
+
+    assert not _respond(BODY, "gzip;q=0").has_header("Content-Encoding")
+    assert not _respond(BODY, "").has_header("Content-Encoding")
+    assert not _respond(b"{}", "gzip").has_header("Content-Encoding")
+
+
+def test_only_optimizer_json_is_compressed(mocker):
+    mocker.patch("optimizer.middleware.brotli", None)
+    page = b"<input name='csrfmiddlewaretoken' value='secret'>" * 50
+
+    assert not _respond(page, "gzip", path="/admin/", content_type="text/html").has_header("Content-Encoding")
+    assert not _respond(page, "gzip", content_type="text/html; charset=utf-8").has_header("Content-Encoding")
+    assert not _respond(BODY, "gzip", path="/metrics").has_header("Content-Encoding")
+    assert _respond(BODY, "gzip", path="/api/optimize/batch/")["Content-Encoding"] == "gzip"
+
+
+def test_server_timing_reports_stages():
+    def view(request):
+        with stage("optimize"):
+            return HttpResponse(b"{}")
+
+    response = ServerTimingMiddleware(view)(RequestFactory().get("/"))
+
+    assert response["Server-Timing"].startswith("optimize;dur=")
+    assert ", total;dur=" in response["Server-Timing"]
+
+
+def test_async_compression_is_awaited_without_a_thread():
+    async def view(request):
+        return HttpResponse(BODY, content_type="application/json")
+
+    middleware = CompressionMiddleware(view)
+    response = asyncio.run(middleware(RequestFactory().get("/api/optimize/async/", HTTP_ACCEPT_ENCODING="gzip")))
+
+    assert iscoroutinefunction(middleware)
+    assert response["Content-Encoding"] in ("gzip", "br")
+
+
+def test_async_server_timing_reports_stages():
+    async def view(request):
+        with stage("optimize"):
+            return HttpResponse(b"{}")
+
+    middleware = ServerTimingMiddleware(view)
+    response = asyncio.run(middleware(RequestFactory().get("/")))
+
+    assert iscoroutinefunction(middleware)
+    assert response["Server-Timing"].startswith("optimize;dur=")
@@ -1,5 +1,8 @@
+import random
+
+import numpy as np
 import pytest
-from services.optimization_service import optimize_fuel, StationDTO, RouteUnreachable
+from services.optimization_service import optimize_fuel, StationColumns, StationDTO, RouteUnreachable
 
 
 def test_no_stops_needed():
@@ -44,4 +47,107 @@ def test_unreachable_segment():
             mpg=10,
             tank_capacity=10,
             start_fuel=10,
-        )
\ No newline at end of file
+        )
+
+def test_optimal_engine_matches_greedy():
+    rng = random.Random(7)
+
+    for _ in range(50):
+        stations = [
+            StationDTO(id=i, mile_marker=rng.uniform(0, 1000), price=round(rng.uniform(3, 5), 2))
+            for i in range(1, 60)
+        ]
+        kwargs = dict(total_distance=1000, mpg=6, tank_capacity=50, start_fuel=20)
+
+        try:
+            expected = optimize_fuel(stations, algorithm="greedy", **kwargs)
+        except RouteUnreachable:
+            with pytest.raises(RouteUnreachable):
+                optimize_fuel(stations, algorithm="optimal", **kwargs)
+            continue
+
+        assert optimize_fuel(stations, algorithm="optimal", **kwargs) == expected
+
+
+def test_columns_input_matches_dtos():
+    stations = [
+        StationDTO(id=2, mile_marker=80, price=3.0),
+        StationDTO(id=1, mile_marker=50, price=4.0),
+    ]
+    kwargs = dict(total_distance=100, mpg=10, tank_capacity=10, start_fuel=5)
+
+    assert optimize_fuel(StationColumns.from_dtos(stations), **kwargs) == optimize_fuel(stations, **kwargs)
+
+
+def test_detour_fuel_is_bought_at_the_stop():
+    stations = StationColumns(
+        ids=np.array([1]),
+        mile_markers=np.array([50.0]),
+        prices=np.array([3.0]),
+        detour_miles=np.array([5.0]),
+    )
+
+    stops, cost = optimize_fuel(stations, total_distance=100, mpg=10, tank_capacity=10, start_fuel=6)
+
+    assert stops == [{
+        "station_id": 1,
+        "mile_marker": 50.0,
+        "price": 3.0,
+        "gallons": 5.0,
+        "cost": 15.0,
+        "detour_miles": 5.0,
+    }]
+    assert cost == 15.0
+
+
+def test_detour_time_cost_is_charged_in_the_total():
+    stations = StationColumns(
+        ids=np.array([1]),
+        mile_markers=np.array([50.0]),
+        prices=np.array([3.0]),
+        detour_miles=np.array([3.5]),
+    )
+
+    stops, cost = optimize_fuel(
+        stations, total_distance=100, mpg=10, tank_capacity=10, start_fuel=6, time_cost_per_hour=20
+    )
+
+    # 7 round-trip miles at 35 mph is 12 minutes, $4 at $20/h.
+    assert stops[0]["detour_time_cost"] == 4.0
+    assert cost == pytest.approx(stops[0]["cost"] + 4.0)
+
+
+@pytest.mark.parametrize("algorithm", ["greedy", "optimal"])
+@pytest.mark.parametrize("time_cost_per_hour, expected_stop", [(0, 1), (50, 2)])
+def test_detour_costs_steer_station_choice(algorithm, time_cost_per_hour, expected_stop):
+    stations = StationColumns(
+        ids=np.array([1, 2]),
+        mile_markers=np.array([40.0, 41.0]),
+        prices=np.array([2.9, 3.05]),
+        detour_miles=np.array([1.0, 0.0]),
+    )
+
+    stops, _ = optimize_fuel(
+        stations,
+        total_distance=100,
+        mpg=10,
+        tank_capacity=10,
+        start_fuel=5,
+        algorithm=algorithm,
+        time_cost_per_hour=time_cost_per_hour,
+    )
+
+    assert [stop["station_id"] for stop in stops] == [expected_stop]
+
+
+def test_no_stop_that_only_buys_its_own_detour():
+    stations = StationColumns(
+        ids=np.array([1]),
+        mile_markers=np.array([50.0]),
+        prices=np.array([3.0]),
+        detour_miles=np.array([2.0]),
+    )
+
+    stops, cost = optimize_fuel(stations, total_distance=100, mpg=10, tank_capacity=10, start_fuel=10)
+
+    assert (stops, cost) == ([], 0)
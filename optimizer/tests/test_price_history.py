@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from django.contrib.gis.geos import Point
+from optimizer.models import FuelPriceHistory, FuelStation
+from services.price_history import prices_as_of, record_price_snapshot
+
+
+def _station(opis_id, price):
+    return FuelStation.objects.create(
+        opis_id=opis_id,
+        name="Test",
+        city="Test",
+        state="PA",
+        price=price,
+        location=Point(-75, 40, srid=4326),
+    )
+
+
+@pytest.mark.django_db
+def test_prices_as_of_uses_latest_change_before_time():
+    tracked = _station(1, 4.0)
+    untracked = _station(2, 3.0)
+
+    for day, price in [(1, 3.6), (10, 3.8), (20, 4.0)]:
+        FuelPriceHistory.objects.create(
+            station=tracked,
+            effective_from=datetime(2026, 1, day, tzinfo=timezone.utc),
+            price=price,
+        )
+
+    prices = prices_as_of(
+        np.array([tracked.id, untracked.id, 999]),
+        datetime(2026, 1, 15, tzinfo=timezone.utc),
+    )
+
+    assert prices[:2].tolist() == [3.8, 3.0]
+    assert np.isnan(prices[2])
+
+
+@pytest.mark.django_db
+def test_record_price_snapshot_only_records_changes():
+    station = _station(1, 4.0)
+
+    assert record_price_snapshot() == 1
+    assert record_price_snapshot() == 0
+
+    FuelStation.objects.filter(id=station.id).update(price=3.9)
+
+    assert record_price_snapshot() == 1
+    assert list(
+        station.price_history.order_by("effective_from").values_list("price", flat=True)
+    ) == [4.0, 3.9]
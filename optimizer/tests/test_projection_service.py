@@ -1,5 +1,7 @@
+import numpy as np
+import pytest
 from django.contrib.gis.geos import LineString, Point
-from services.projection_service import compute_mile_marker
+from services.projection_service import compute_mile_marker, compute_mile_markers, distances_from_route
 
 
 def test_projection_midpoint():
@@ -12,4 +14,26 @@ def test_projection_midpoint():
 
     mile = compute_mile_marker(route, station, total_miles=100)
 
-    assert 45 <= mile <= 55
\ No newline at end of file
+    assert 45 <= mile <= 55
+
+def test_batch_projection_matches_single():
+    coords = [(40.0, -75.0), (40.5, -76.0), (41.0, -76.5), (41.0, -78.0)]
+    route = LineString([(lon, lat) for lat, lon in coords], srid=4326)
+
+    stations = [(-75.2, 40.3), (-76.4, 40.6), (-77.0, 41.2), (-78.5, 41.0)]
+
+    batch = compute_mile_markers(coords, stations, total_miles=250)
+
+    for (lon, lat), mile in zip(stations, batch):
+        single = compute_mile_marker(route, Point(lon, lat, srid=4326), total_miles=250)
+        assert abs(single - mile) < 1e-6
+
+
+def test_distances_from_route_are_ground_meters():
+    route = [(40.0, -75.0), (41.0, -75.0)]
+
+    distances = distances_from_route(route, np.array([(-74.9, 40.5), (-75.0, 40.2)]))
+
+    # 0.1 degree of longitude at 40.5N is about 8.47 km.
+    assert distances[0] == pytest.approx(8470, rel=0.01)
+    assert distances[1] == pytest.approx(0, abs=1e-6)
@@ -0,0 +1,17 @@
+import json
+from decimal import Decimal
+
+import numpy as np
+from optimizer.renderers import ORJSONRenderer
+
+
+def test_renders_numpy_values_and_drf_types():
+    data = {
+        "station_id": np.int64(7),
+        "mile_markers": np.array([1.5, 2.0]),
+        "price": Decimal("3.25"),
+    }
+
+    rendered = json.loads(ORJSONRenderer().render(data))
+
+    assert rendered == {"station_id": 7, "mile_markers": [1.5, 2.0], "price": 3.25}
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+import polyline
+import pytest
+from services.road_graph import LocalGraphBackend, NoRoute, RoadGraph, graph_from_lines
+from services.routing_service import RoutingError
+
+# A slow direct road from A to C, and a motorway detour through B.
+A, B, C = [-75.0, 40.0], [-74.95, 40.05], [-74.9, 40.0]
+LINES = [
+    ([A, [-74.95, 40.0], C], 0, 25),
+    ([A, B], 0, 65),
+    ([B, C], 0, 65),
+]
+
+
+@pytest.fixture
+def graph():
+    return graph_from_lines(LINES, landmarks=2)
+
+
+def test_route_takes_the_fastest_path(graph):
+    route = graph.route([A, C], max_snap_meters=500)
+
+    assert polyline.decode(route["geometry"]) == [(40.0, -75.0), (40.05, -74.95), (40.0, -74.9)]
+    # Two ~4.4 mile motorway legs rather than the ~5.3 mile direct road.
+    assert route["distance_miles"] == pytest.approx(8.7, abs=0.1)
+    assert route["leg_miles"] == [route["distance_miles"]]
+
+
+def test_oneway_roads_are_only_driven_forward():
+    graph = graph_from_lines([([A, C], 1, 55), ([C, B, A], 1, 25)], landmarks=2)
+
+    there = graph.route([A, C], max_snap_meters=500)
+    back = graph.route([C, A], max_snap_meters=500)
+
+    assert len(polyline.decode(there["geometry"])) == 2
+    assert len(polyline.decode(back["geometry"])) == 3
+
+
+def test_waypoints_split_legs(graph):
+    route = graph.route([A, B, C], max_snap_meters=500)
+
+    assert len(route["leg_miles"]) == 2
+    assert sum(route["leg_miles"]) == pytest.approx(route["distance_miles"])
+
+
+def test_unroutable_requests_raise_no_route():
+    graph = graph_from_lines([([A, B], 0, 55), ([C, [-74.85, 40.0]], 0, 55)], landmarks=2)
+
+    with pytest.raises(NoRoute):
+        graph.route([A, C], max_snap_meters=500)
+    with pytest.raises(NoRoute):
+        graph.route([A, [-80.0, 35.0]], max_snap_meters=500)
+
+
+def test_saved_graph_loads_memory_mapped(graph, tmp_path):
+    graph.save(tmp_path)
+    loaded = RoadGraph.load(tmp_path)
+
+    assert loaded.node_count == graph.node_count
+    assert loaded.route([A, C], 500) == graph.route([A, C], 500)
+
+
+def test_backend_without_graph_raises_routing_error(tmp_path, settings):
+    settings.ROAD_GRAPH_PATH = str(tmp_path)
+
+    with pytest.raises(RoutingError):
+        LocalGraphBackend().route([A, C])
+
+
+def test_search_over_its_expansion_budget_raises_no_route(graph):
+    with pytest.raises(NoRoute):
+        graph.route([A, C], max_snap_meters=500, max_expansions=1)
+
+    assert graph.route([A, C], max_snap_meters=500, max_expansions=10)
+
+
+def test_async_backend_searches_off_the_event_loop(graph, settings, mocker):
+    settings.ROAD_GRAPH_MAX_SNAP_METERS = 500
+    backend = LocalGraphBackend()
+    backend._graph = graph
+    threads = []
+    search = RoadGraph.shortest_path
+
+    def shortest_path(*args):
+        threads.append(threading.get_ident())
+        return search(*args)
+
+    mocker.patch.object(RoadGraph, "shortest_path", shortest_path)
+
+    async def aroute():
+        return threading.get_ident(), await backend.aroute([A, C])
+
+    loop_thread, route = asyncio.run(aroute())
+
+    assert route == graph.route([A, C], max_snap_meters=500)
+    assert threads[0] != loop_thread
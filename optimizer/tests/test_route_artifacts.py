@@ -0,0 +1,21 @@
+import numpy as np
+from services.route_artifacts import RouteArtifacts, artifact_cache, artifact_key
+
+
+def test_artifacts_round_trip_through_remote_tier():
+    artifacts = RouteArtifacts(
+        station_ids=np.array([3, 1], dtype=np.int64),
+        mile_markers=np.array([12.5, 80.0]),
+        detour_miles=np.array([0.5, 3.25]),
+    )
+    key = artifact_key("route:abc", version=7)
+
+    artifact_cache.set(key, artifacts)
+    artifact_cache.local.clear()
+
+    loaded = artifact_cache.get(key)
+
+    assert loaded.station_ids.tolist() == [3, 1]
+    assert loaded.mile_markers.tolist() == [12.5, 80.0]
+    assert loaded.detour_miles.tolist() == [0.5, 3.25]
+    assert artifact_key("route:abc", version=8) != key
@@ -0,0 +1,48 @@
+from django.core.cache.backends.locmem import LocMemCache
+from services.metrics import CACHE_LOOKUPS
+from services.route_cache import LocalLRU, RouteCache
+
+
+def test_local_lru_evicts_least_recently_used():
+    lru = LocalLRU(max_entries=2, ttl=60)
+
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.stats()["evictions"] == 1
+
+
+def test_remote_hit_is_compressed_and_promoted():
+    remote = LocMemCache("route-cache-test", {})
+    route = {"distance_miles": 12.5, "geometry": "_ocsF~lwhM" * 100}
+
+    RouteCache(LocalLRU(max_entries=10, ttl=60), remote=remote).set("route:x", route)
+
+    stored = remote.get("route:x")
+    assert isinstance(stored, bytes)
+    assert len(stored) < len(route["geometry"])
+
+    cache = RouteCache(LocalLRU(max_entries=10, ttl=60), remote=remote)
+
+    assert cache.get("route:x") == route
+    assert cache.get("route:x") == route
+    assert cache.stats()["redis"] == {"hits": 1, "misses": 0}
+    assert cache.stats()["local"]["hits"] == 1
+
+
+def test_lookups_are_counted_per_cache_and_result():
+    cache = RouteCache(
+        LocalLRU(max_entries=10, ttl=60), remote=LocMemCache("route-cache-metrics", {}), name="test"
+    )
+    before = {result: CACHE_LOOKUPS.value(cache="test", result=result) for result in ("miss", "local_hit")}
+
+    cache.get("route:y")
+    cache.set("route:y", {"distance_miles": 1})
+    cache.get("route:y")
+
+    assert CACHE_LOOKUPS.value(cache="test", result="miss") == before["miss"] + 1
+    assert CACHE_LOOKUPS.value(cache="test", result="local_hit") == before["local_hit"] + 1
@@ -0,0 +1,75 @@
+import polyline
+import pytest
+from services.route_snapping import (
+    METERS_PER_MILE,
+    _attach,
+    correct_endpoints,
+    snapped_route_key,
+    with_endpoints,
+)
+
+
+def straight_route(n_points):
+    """
+    (lat, lon) points due east along the 40th parallel, about 85 m apart.
+    """
+    return [(40.0, round(-75.0 + i * 0.001, 5)) for i in range(n_points)]
+
+
+def test_nearby_coordinates_share_a_key(settings):
+    settings.ROUTE_KEY_PRECISION = 3
+
+    yard = snapped_route_key([[-75.12341, 40.01234], [-76.0, 41.0]])
+
+    assert snapped_route_key([[-75.12338, 40.01229], [-76.0, 41.0]]) == yard
+    assert snapped_route_key([[-75.12641, 40.01234], [-76.0, 41.0]]) != yard
+    assert snapped_route_key([[-75.12338, 40.01229], [-76.0, 41.0]], precision=5) != yard
+
+
+@pytest.mark.parametrize("n_points", [10, 2000])
+def test_corrected_route_starts_and_ends_at_the_exact_points(n_points):
+    coords = straight_route(n_points)
+    route = with_endpoints({
+        "distance_miles": 50.0,
+        "leg_miles": [20.0, 30.0],
+        "geometry": polyline.encode(coords),
+    })
+
+    # ~110 m north of the route start, ~85 m along it; just past its end.
+    start = [-74.999, 40.001]
+    finish = [coords[-1][1] + 0.0005, 40.0]
+
+    corrected = correct_endpoints(route, start, finish)
+    points = polyline.decode(corrected["geometry"])
+
+    assert points[0] == (40.001, -74.999)
+    assert points[1] == (40.0, -74.999)
+    assert points[-1] == (40.0, finish[0])
+    assert points[2:-1] == coords[2:]
+
+    delta_miles = (111.2 - 85.2 + 42.6) / METERS_PER_MILE
+    assert corrected["distance_miles"] == pytest.approx(50.0 + delta_miles, abs=0.001)
+    assert sum(corrected["leg_miles"]) == pytest.approx(corrected["distance_miles"])
+    assert "endpoints" not in corrected
+
+
+def test_spliced_geometry_matches_a_full_reencode():
+    coords = straight_route(5000)
+    route = with_endpoints({"distance_miles": 260.0, "leg_miles": [260.0], "geometry": polyline.encode(coords)})
+    start, finish = [-74.9993, 39.9996], [coords[-1][1] - 0.0121, 40.0004]
+
+    expected, _ = _attach(coords, start)
+    expected, _ = _attach(expected[::-1], finish)
+
+    corrected = correct_endpoints(route, start, finish)
+
+    assert polyline.decode(corrected["geometry"]) == polyline.decode(polyline.encode(expected[::-1]))
+
+
+def test_exact_endpoints_leave_the_route_unchanged():
+    coords = straight_route(10)
+    route = with_endpoints({"distance_miles": 1.0, "leg_miles": [1.0], "geometry": polyline.encode(coords)})
+
+    corrected = correct_endpoints(route, [coords[0][1], coords[0][0]], [coords[-1][1], coords[-1][0]])
+
+    assert corrected == {"distance_miles": 1.0, "leg_miles": [1.0], "geometry": polyline.encode(coords)}
@@ -1,5 +1,24 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import polyline
 import pytest
-from services.routing_service import get_route
+from django.core.cache.backends.locmem import LocMemCache
+from services.route_cache import LocalLRU, RouteCache
+from services.routing_service import (
+    RoutingError,
+    _async_clients,
+    _coordinates,
+    _parse,
+    _route,
+    _single_flight,
+    aget_route,
+    get_async_http_client,
+    get_route,
+    route_cache_key,
+)
 
 
 @pytest.mark.django_db
@@ -8,11 +27,11 @@ def test_get_route_cached(mocker):
     mock_response = {
         "routes": [{
             "summary": {"distance": 1000},
-            "geometry": "abc"
+            "geometry": polyline.encode([(40, -75), (41, -76)])
         }]
     }
 
-    mock_post = mocker.patch("services.routing_service.httpx.post")
+    mock_post = mocker.patch("services.routing_service.get_http_client").return_value.post
 
     mock_post.return_value.raise_for_status.return_value = None
     mock_post.return_value.json.return_value = mock_response
@@ -20,4 +39,177 @@ def test_get_route_cached(mocker):
     route = get_route([-75, 40], [-76, 41])
 
     assert route["distance_miles"] > 0
-    assert route["geometry"] == "abc"
\ No newline at end of file
+    assert polyline.decode(route["geometry"]) == [(40, -75), (41, -76)]
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(timeout=5)
+        return "route"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(_single_flight("route:x", fetch)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)  # let every thread join the in-flight call
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ["route"] * 5
+
+
+def test_async_single_flight_is_per_event_loop(mocker):
+    both_fetching = threading.Barrier(2, timeout=5)
+    calls = []
+
+    async def aroute(coordinates):
+        calls.append(threading.get_ident())
+        await asyncio.to_thread(both_fetching.wait)
+        return {"distance_miles": 1.0, "leg_miles": [], "geometry": polyline.encode([(40, -75), (41, -76)])}
+
+    mocker.patch("services.routing_service._aroute", side_effect=aroute)
+
+    async def burst():
+        return await asyncio.gather(*(aget_route([-75, 40], [-76, 41]) for _ in range(3)))
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(asyncio.run(burst()))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 2 and calls[0] != calls[1]
+    assert [len(routes) for routes in results] == [3, 3]
+
+
+def test_waypoints_are_routed_in_order_and_keyed():
+    assert route_cache_key([-75, 40], [-76, 41]) == route_cache_key([-75, 40], [-76, 41], [])
+    assert route_cache_key([-75, 40], [-76, 41]) != route_cache_key([-75, 40], [-76, 41], [[-75.5, 40.5]])
+
+    assert _coordinates([-75, 40], [-76, 41], [[-75.2, 40.3], [-75.7, 40.7]]) == [
+        [-75, 40], [-75.2, 40.3], [-75.7, 40.7], [-76, 41],
+    ]
+
+
+def test_backends_fall_back_in_order(mocker):
+    from services.metrics import ROUTING_REQUESTS
+    from services.road_graph import NoRoute
+
+    ROUTING_REQUESTS.clear()
+    local, ors = mocker.Mock(), mocker.Mock()
+    local.name, ors.name = "local", "ors"
+    local.route.side_effect = NoRoute("no road nearby")
+    ors.route.return_value = {"distance_miles": 1.0, "leg_miles": [1.0], "geometry": "abc"}
+    mocker.patch("services.routing_service.get_backends", return_value=[local, ors])
+
+    assert _route([[-75, 40], [-76, 41]])["geometry"] == "abc"
+    assert ROUTING_REQUESTS.value(backend="local", result="error") == 1
+    assert ROUTING_REQUESTS.value(backend="ors", result="ok") == 1
+
+    ors.route.side_effect = httpx.ConnectError("down")
+    with pytest.raises(httpx.ConnectError):
+        _route([[-75, 40], [-76, 41]])
+
+
+def test_nearby_requests_share_one_route_with_their_own_ends(mocker, settings):
+    settings.ROUTE_KEY_PRECISION = 3
+    mocker.patch(
+        "services.routing_service.route_cache",
+        RouteCache(LocalLRU(max_entries=10, ttl=60), remote=LocMemCache("routing-snap-test", {})),
+    )
+    backend = mocker.Mock()
+    backend.name = "ors"
+    backend.route.return_value = {
+        "distance_miles": 100.0,
+        "leg_miles": [100.0],
+        "geometry": polyline.encode([(40.0, -75.0), (40.0, -74.0), (40.0, -73.0)]),
+    }
+    mocker.patch("services.routing_service.get_backends", return_value=[backend])
+
+    first = get_route([-75.0, 40.0], [-73.0, 40.0])
+    second = get_route([-75.0002, 40.0001], [-73.0, 40.0])
+
+    assert backend.route.call_count == 1
+    assert first["distance_miles"] == 100.0
+    assert polyline.decode(second["geometry"])[0] == (40.0001, -75.0002)
+    assert second["distance_miles"] > first["distance_miles"]
+
+
+def test_stale_route_is_served_and_refreshed_in_background(mocker, settings):
+    settings.ROUTE_CACHE_SOFT_TTL = 60
+    cache = RouteCache(LocalLRU(max_entries=10, ttl=60), remote=LocMemCache("routing-swr-test", {}))
+    mocker.patch("services.routing_service.route_cache", cache)
+    geometry = polyline.encode([(40.0, -75.0), (41.0, -76.0)])
+    cache.set(route_cache_key([-75.0, 40.0], [-76.0, 41.0]), {
+        "distance_miles": 90.0, "leg_miles": [90.0], "geometry": geometry, "fetched_at": time.time() - 120,
+    })
+
+    refreshed = threading.Event()
+    backend = mocker.Mock()
+    backend.name = "ors"
+
+    def route(coordinates):
+        refreshed.set()
+        return {"distance_miles": 100.0, "leg_miles": [100.0], "geometry": geometry}
+
+    backend.route.side_effect = route
+    mocker.patch("services.routing_service.get_backends", return_value=[backend])
+
+    assert get_route([-75.0, 40.0], [-76.0, 41.0])["distance_miles"] == 90.0
+    assert refreshed.wait(timeout=5)
+
+    for _ in range(50):
+        if get_route([-75.0, 40.0], [-76.0, 41.0])["distance_miles"] == 100.0:
+            break
+        time.sleep(0.02)
+    assert get_route([-75.0, 40.0], [-76.0, 41.0])["distance_miles"] == 100.0
+    assert backend.route.call_count == 1
+
+
+def test_ors_breaker_fails_fast_after_upstream_failures(mocker):
+    from services.circuit_breaker import CircuitBreaker, CircuitOpen
+    from services.routing_service import ORSBackend
+
+    mocker.patch("services.routing_service.ors_breaker", CircuitBreaker("ors", 2, 30))
+    post = mocker.patch("services.routing_service.get_http_client").return_value.post
+    post.side_effect = httpx.ConnectTimeout("timed out")
+
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectTimeout):
+            ORSBackend().route([[-75, 40], [-76, 41]])
+    with pytest.raises(CircuitOpen):
+        ORSBackend().route([[-75, 40], [-76, 41]])
+
+    assert post.call_count == 2
+
+
+def test_malformed_ors_body_raises_routing_error():
+    request = httpx.Request("POST", "https://ors.test")
+
+    with pytest.raises(RoutingError):
+        _parse(httpx.Response(200, json={"routes": []}, request=request))
+    with pytest.raises(RoutingError):
+        _parse(httpx.Response(200, content=b"<html>", request=request))
+
+
+def test_async_client_per_loop_is_closed_with_its_loop():
+    async def clients():
+        return get_async_http_client(), get_async_http_client()
+
+    first, again = asyncio.run(clients())
+    second, _ = asyncio.run(clients())
+
+    assert first is again
+    assert second is not first
+    assert first.is_closed and second.is_closed
+    assert not _async_clients
@@ -46,4 +46,57 @@ def test_start_fuel_exceeds_capacity():
         "start_fuel": 60,
     }
     serializer = OptimizeRouteSerializer(data=payload)
-    assert not serializer.is_valid()
\ No newline at end of file
+    assert not serializer.is_valid()
+
+def test_departure_time_is_optional_and_parsed():
+    payload = {
+        "start_lat": 40,
+        "start_lon": -75,
+        "end_lat": 41,
+        "end_lon": -76,
+        "tank_capacity": 50,
+        "mpg": 10,
+        "start_fuel": 10,
+    }
+
+    serializer = OptimizeRouteSerializer(data=payload)
+    assert serializer.is_valid()
+    assert "departure_time" not in serializer.validated_data
+
+    serializer = OptimizeRouteSerializer(data={**payload, "departure_time": "2026-01-15T08:00:00Z"})
+    assert serializer.is_valid()
+    assert serializer.validated_data["departure_time"].day == 15
+
+
+def test_waypoints_are_validated():
+    payload = {
+        "start_lat": 40,
+        "start_lon": -75,
+        "end_lat": 41,
+        "end_lon": -76,
+        "tank_capacity": 50,
+        "mpg": 10,
+        "start_fuel": 10,
+    }
+
+    serializer = OptimizeRouteSerializer(data={**payload, "waypoints": [{"lat": 40.5, "lon": -75.5}]})
+    assert serializer.is_valid()
+    assert serializer.validated_data["waypoints"] == [{"lat": 40.5, "lon": -75.5}]
+
+    serializer = OptimizeRouteSerializer(data={**payload, "waypoints": [{"lat": 140, "lon": -75.5}]})
+    assert not serializer.is_valid()
+
+
+def test_corridor_miles_cannot_widen_the_corridor():
+    payload = {
+        "start_lat": 40,
+        "start_lon": -75,
+        "end_lat": 41,
+        "end_lon": -76,
+        "tank_capacity": 50,
+        "mpg": 10,
+        "start_fuel": 10,
+    }
+
+    assert OptimizeRouteSerializer(data={**payload, "corridor_miles": 5}).is_valid()
+    assert not OptimizeRouteSerializer(data={**payload, "corridor_miles": 25}).is_valid()
@@ -1,7 +1,16 @@
 import pytest
 from django.contrib.gis.geos import Point
 from optimizer.models import FuelStation
-from services.spatial_service import build_route_line, get_stations_along_route
+from services.spatial_service import (
+    PROJECTED_CRS,
+    build_corridor,
+    build_route_line,
+    get_station_positions_along_route,
+    get_stations_along_route,
+    projected_location,
+    simplified_route_pieces,
+    simplify_route,
+)
 
 
 @pytest.mark.django_db
@@ -19,4 +28,138 @@ def test_station_within_corridor():
 
     qs = get_stations_along_route(route)
 
-    assert station in qs
\ No newline at end of file
+    assert station in qs
+
+@pytest.mark.django_db
+def test_station_positions_ordered_along_route():
+    route = build_route_line([(40, -75), (41, -75)])
+
+    far, near = [
+        FuelStation.objects.create(
+            opis_id=opis_id,
+            name="Test",
+            city="Test",
+            state="PA",
+            price=4.0,
+            location=Point(-75, lat, srid=4326)
+        )
+        for opis_id, lat in [(1, 40.75), (2, 40.25)]
+    ]
+
+    rows = get_station_positions_along_route(route)
+
+    assert [row[0] for row in rows] == [near.id, far.id]
+    assert rows[0][2] == pytest.approx(0.25, abs=0.01)
+    assert rows[1][2] == pytest.approx(0.75, abs=0.01)
+
+
+@pytest.mark.django_db
+def test_station_positions_include_ground_offset():
+    route = build_route_line([(40, -75), (41, -75)])
+
+    FuelStation.objects.create(
+        opis_id=1,
+        name="Test",
+        city="Test",
+        state="PA",
+        price=4.0,
+        location=Point(-74.9, 40.5, srid=4326)
+    )
+
+    [(_, _, _, offset)] = get_station_positions_along_route(route)
+
+    # 0.1 degrees of longitude at 40.5N is about 8.47 km.
+    assert offset == pytest.approx(8466, rel=0.01)
+
+
+@pytest.mark.django_db
+def test_station_positions_are_cut_at_twenty_ground_miles():
+    route = build_route_line([(40, -75), (41, -75)])
+
+    # 0.3422 / 0.4183 degrees of longitude at 40.5N: about 18 / 22 miles.
+    inside, outside = [
+        FuelStation.objects.create(
+            opis_id=opis_id,
+            name="Test",
+            city="Test",
+            state="PA",
+            price=4.0,
+            location=Point(lon, 40.5, srid=4326)
+        )
+        for opis_id, lon in [(1, -74.6578), (2, -74.5817)]
+    ]
+
+    rows = get_station_positions_along_route(route)
+
+    assert [row[0] for row in rows] == [inside.id]
+
+
+def test_buffer_corridor_reaches_twenty_ground_miles_at_high_latitude():
+    route = build_route_line([(48, -100), (48.5, -100)])
+    corridor = build_corridor(route)
+
+    # 19.5 miles of ground east of the route at 48.25N is 0.4234 degrees.
+    assert corridor.contains(Point(-99.5766, 48.25, srid=4326))
+    assert not corridor.contains(Point(-99.0, 48.25, srid=4326))
+
+
+@pytest.mark.django_db
+def test_dwithin_corridor_mode(settings):
+    route = build_route_line([(40, -75), (41, -75)])
+
+    inside, outside = [
+        FuelStation.objects.create(
+            opis_id=opis_id,
+            name="Test",
+            city="Test",
+            state="PA",
+            price=4.0,
+            location=Point(lon, 40.5, srid=4326)
+        )
+        for opis_id, lon in [(1, -75.1), (2, -76)]
+    ]
+
+    settings.CORRIDOR_MODE = "dwithin"
+    qs = get_stations_along_route(route)
+
+    assert inside in qs
+    assert outside not in qs
+
+    settings.CORRIDOR_MODE = "buffer"
+    qs = get_stations_along_route(route, mode="dwithin")
+
+    assert inside in qs
+    assert outside not in qs
+
+
+def test_simplified_route_pieces_follow_route():
+    coords = [(34.0 + i * 0.001, -118.0 + (i % 2) * 1e-5) for i in range(5000)]
+    projected = build_route_line(coords).transform(PROJECTED_CRS, clone=True)
+
+    pieces = simplified_route_pieces(projected)
+
+    assert 1 < len(pieces) < 10
+    assert sum(len(piece) for piece in pieces) < 50
+    assert pieces[0][0] == pytest.approx((-118.0, 34.0))
+    assert pieces[-1][-1] == pytest.approx(coords[-1][::-1])
+    for previous, piece in zip(pieces, pieces[1:]):
+        assert previous[-1] == piece[0]
+
+
+def test_simplify_route_keeps_endpoints():
+    coords = [(34.0 + i * 0.001, -118.0 + (i % 2) * 1e-5) for i in range(1000)]
+
+    simplified = simplify_route(coords, tolerance_meters=50)
+
+    assert len(simplified) == 2
+    assert simplified[0] == pytest.approx(coords[0])
+    assert simplified[-1] == pytest.approx(coords[-1])
+
+
+def test_projected_location_matches_expression_index():
+    index = next(
+        index for index in FuelStation._meta.indexes
+        if index.name == "fuelstation_location_3857_gist"
+    )
+
+    assert index.expressions == (projected_location(),)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from services.projection_service import locate_along_route
+from services.spatial_service import CORRIDOR_METERS
+from services.station_index import StationIndex, StationSnapshot
+
+
+def test_corridor_matches_projection():
+    route = [(40.0, -75.0), (40.5, -76.0), (41.0, -78.0)]
+    lonlat = np.array([
+        (-75.2, 40.2),   # near the start
+        (-77.0, 40.8),   # near the end
+        (-76.0, 43.0),   # ~170 miles north, outside the corridor
+    ])
+
+    snapshot = StationSnapshot.build([10, 20, 30], [3.5, 3.2, 3.0], lonlat)
+
+    ids, prices, mile_markers, offsets = snapshot.corridor(route, total_miles=200)
+
+    expected_markers, expected_offsets = locate_along_route(route, lonlat[:2], 200)
+    assert ids.tolist() == [10, 20]
+    assert prices.tolist() == [3.5, 3.2]
+    assert mile_markers == pytest.approx(expected_markers)
+    assert offsets == pytest.approx(expected_offsets)
+
+
+@pytest.mark.parametrize("latitude", [30.0, 45.0, 62.0])
+def test_corridor_is_twenty_ground_miles_at_any_latitude(latitude):
+    route = [(latitude, -100.0), (latitude, -95.0)]
+    rng = np.random.default_rng(0)
+    lonlat = np.column_stack((rng.uniform(-100, -95, 500), latitude + rng.uniform(-0.6, 0.6, 500)))
+
+    snapshot = StationSnapshot.build(np.arange(500), np.full(500, 3.0), lonlat)
+    ids, _, _, offsets = snapshot.corridor(route, total_miles=250)
+
+    _, expected_offsets = locate_along_route(route, lonlat, 250)
+    assert sorted(ids.tolist()) == np.flatnonzero(expected_offsets <= CORRIDOR_METERS).tolist()
+    assert offsets.max() > 0.9 * CORRIDOR_METERS
+
+
+def test_snapshot_swaps_on_version_change(mocker):
+    version = mocker.patch("services.station_index.get_station_data_version")
+    loader = mocker.Mock(side_effect=lambda v: StationSnapshot.build([], [], np.empty((0, 2)), v))
+
+    index = StationIndex(loader=loader, check_interval=0)
+
+    version.return_value = 1
+    first = index.snapshot()
+    assert index.snapshot() is first
+
+    version.return_value = 2
+    assert index.snapshot().version == 2
+    assert loader.call_count == 2
+
+
+def test_price_version_change_refreshes_prices_only(mocker):
+    mocker.patch("services.station_index.get_station_data_version", return_value=1)
+    price_version = mocker.patch("services.station_index.get_station_price_version", return_value=0)
+    loader = mocker.Mock(side_effect=lambda v: StationSnapshot.build(
+        [10, 20], [3.5, 3.2], np.array([(-75.0, 40.0), (-76.0, 41.0)]), v
+    ))
+    price_loader = mocker.Mock(return_value=([20, 99], [2.9, 1.0]))
+
+    index = StationIndex(loader=loader, check_interval=0, price_loader=price_loader)
+    first = index.snapshot()
+
+    price_version.return_value = 1
+    refreshed = index.snapshot()
+
+    assert loader.call_count == 1
+    assert refreshed.price_version == 1
+    assert refreshed.prices_for([10, 20]).tolist() == [3.5, 2.9]
+    assert refreshed.xy is first.xy
+    assert first.prices_for([20]).tolist() == [3.2]
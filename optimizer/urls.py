@@ -1,6 +1,14 @@
 from django.urls import path
-from optimizer.views import OptimizeRouteView
+from optimizer.views import (
+    AsyncOptimizeRouteView,
+    OptimizeBatchView,
+    OptimizeRouteView,
+    RouteCacheStatsView,
+)
 
 urlpatterns = [
     path("optimize/", OptimizeRouteView.as_view()),
+    path("optimize/batch/", OptimizeBatchView.as_view()),
+    path("optimize/async/", AsyncOptimizeRouteView.as_view()),
+    path("route-cache/stats/", RouteCacheStatsView.as_view()),
 ]
@@ -1,14 +1,54 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
 import polyline
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
-from optimizer.serializers import OptimizeRouteSerializer
-from services.routing_service import get_route
-from services.spatial_service import build_route_line, get_stations_along_route
-from services.projection_service import compute_mile_marker
-from services.optimization_service import StationDTO, optimize_fuel, RouteUnreachable
+from optimizer.models import FuelStation
+from optimizer.renderers import ORJSONRenderer, dumps
+from optimizer.serializers import OptimizeBatchSerializer, OptimizeRouteSerializer
+from services.circuit_breaker import CircuitOpen
+from services.data_version import get_station_data_version
+from services.metrics import CORRIDOR_STATIONS, registry, stage
+from services.price_history import prices_as_of
+from services.route_artifacts import RouteArtifacts, get_route_artifacts, store_route_artifacts
+from services.route_cache import route_cache
+from services.route_snapping import EXACT_PRECISION
+from services.routing_service import RoutingError, aget_route, get_route, route_cache_key
+from services.spatial_service import (
+    CORRIDOR_METERS,
+    build_corridor,
+    build_route_line,
+    get_station_coordinates_along_routes,
+    get_station_details,
+    get_station_positions_along_route,
+    get_stations_along_route,
+    simplify_route,
+)
+from services.projection_service import distances_from_route, locate_along_route
+from services.station_index import StationSnapshot, station_index
+from services.optimization_service import StationColumns, optimize_fuel, RouteUnreachable
+
+logger = logging.getLogger(__name__)
+
+METERS_PER_MILE = 1609.34
+
+ROUTING_ERRORS = (httpx.HTTPError, RoutingError, CircuitOpen)
+
 
 class OptimizeRouteView(APIView):
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
 
     def post(self, request):
         serializer = OptimizeRouteSerializer(data=request.data)
@@ -16,44 +56,425 @@ class OptimizeRouteView(APIView):
 
         data = serializer.validated_data
 
-        route = get_route(
-            [data["start_lon"], data["start_lat"]],
-            [data["end_lon"], data["end_lat"]],
-        )
+        lane = _lane(data)
+        try:
+            route = get_route(*_route_args(lane))
+        except ROUTING_ERRORS as e:
+            body, status, headers = _routing_failure(e)
+            return Response(body, status=status, headers=headers)
 
-        coords = polyline.decode(route["geometry"])
-        route_line = build_route_line(coords)
-        stations_qs = get_stations_along_route(route_line)
-
-        station_dtos = []
-        for station in stations_qs:
-            mile_marker = compute_mile_marker(
-                route_line,
-                station.location,
-                route["distance_miles"]
-            )
+        try:
+            return Response(_locate_and_plan(data, route, _route_key(lane, route)))
+        except RouteUnreachable as e:
+            return Response({"error": str(e)}, status=400)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncOptimizeRouteView(View):
+    """
+    Async variant of OptimizeRouteView for ASGI deployments (core.asgi).
+    The ORS call awaits the shared AsyncClient; corridor lookup and
+    optimization run in a worker thread.
+    """
+
+    async def post(self, request):
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({"error": "Invalid JSON."}, status=400)
+
+        serializer = OptimizeRouteSerializer(data=payload)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+
+        data = serializer.validated_data
+
+        lane = _lane(data)
+        try:
+            route = await aget_route(*_route_args(lane))
+        except ROUTING_ERRORS as e:
+            body, status, headers = _routing_failure(e)
+            return JsonResponse(body, status=status, headers=headers)
 
-            station_dtos.append(
-                StationDTO(
-                    id=station.id,
-                    mile_marker=mile_marker,
-                    price=station.price
-                )
-            )
         try:
-            stops, total_cost = optimize_fuel(
-                station_dtos,
-                total_distance=route["distance_miles"],
-                mpg=data["mpg"],
-                tank_capacity=data["tank_capacity"],
-                start_fuel=data["start_fuel"],
+            return HttpResponse(
+                dumps(await sync_to_async(_locate_and_plan)(data, route, _route_key(lane, route))),
+                content_type="application/json",
             )
         except RouteUnreachable as e:
-            return Response({"error": str(e)}, status=400)
-        
-        return Response({
-            "distance_miles": route["distance_miles"],
-            "fuel_stops": stops,
-            "total_cost": total_cost,
-            "route_geometry": route["geometry"],
-        })
+            return JsonResponse({"error": str(e)}, status=400)
+
+
+class OptimizeBatchView(APIView):
+    """
+    Plan many routes in one request. Identical origin/destination pairs
+    share one route fetch, routes are fetched concurrently, and corridor
+    stations for every route come from a single query.
+    """
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+
+    def post(self, request):
+        serializer = OptimizeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        items = serializer.validated_data["items"]
+        results = [None] * len(items)
+        lanes = {}
+
+        for i, payload in enumerate(items):
+            item = OptimizeRouteSerializer(data=payload)
+            if not item.is_valid():
+                results[i] = {"errors": item.errors}
+                continue
+            lanes.setdefault(_lane(item.validated_data), []).append((i, item.validated_data))
+
+        with stage("route"):
+            routes = _fetch_routes(list(lanes))
+
+        for lane, error in routes.items():
+            if isinstance(error, Exception):
+                for i, _ in lanes[lane]:
+                    results[i] = _routing_failure(error)[0]
+
+        routed = {lane: route for lane, route in routes.items() if not isinstance(route, Exception)}
+        snapshot, version = _station_source()
+        stations = {}
+        coords = {}
+
+        for lane, route in routed.items():
+            with stage("artifacts"):
+                artifacts = get_route_artifacts(_route_key(lane, route), version)
+            if artifacts is not None:
+                stations[lane] = _with_current_prices(artifacts, snapshot)
+            else:
+                with stage("decode"):
+                    coords[lane] = polyline.decode(route["geometry"])
+
+        if coords:
+            if snapshot is None:
+                with stage("corridor"):
+                    rows = get_station_coordinates_along_routes(
+                        [build_route_line(lane_coords) for lane_coords in coords.values()]
+                    )
+                corridor_source = StationSnapshot.from_rows(rows)
+            else:
+                corridor_source = snapshot
+
+            for lane, lane_coords in coords.items():
+                with stage("corridor"):
+                    stations[lane] = _snapshot_corridor(
+                        corridor_source, lane_coords, routed[lane]["distance_miles"]
+                    )
+                store_route_artifacts(_route_key(lane, routed[lane]), version, _artifacts(stations[lane]))
+
+        for lane, route in routed.items():
+            CORRIDOR_STATIONS.observe(len(stations[lane]))
+            for i, data in lanes[lane]:
+                try:
+                    results[i] = _plan(data, route, _stations_for(data, stations[lane]))
+                except RouteUnreachable as e:
+                    results[i] = {"error": str(e)}
+
+        return Response({"results": results})
+
+
+class MetricsView(View):
+    """
+    Prometheus text exposition of this process's metrics.
+    """
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class RouteCacheStatsView(APIView):
+    """
+    Hit/miss/eviction counters for each route cache tier in this process.
+    """
+
+    def get(self, request):
+        return Response(route_cache.stats())
+
+
+def _routing_failure(error: Exception) -> tuple[dict, int, dict]:
+    """
+    (body, status, headers) for a route that could not be fetched: 503
+    with Retry-After while the ORS circuit is open, 502 otherwise.
+    """
+    if isinstance(error, CircuitOpen):
+        return (
+            {"error": "Routing is temporarily unavailable."},
+            503,
+            {"Retry-After": str(max(1, round(error.retry_after)))},
+        )
+    return {"error": "Routing failed."}, 502, {}
+
+
+def _locate_and_plan(data, route, route_key) -> dict:
+    return _plan(data, route, _stations_for(data, _route_stations(route, route_key)))
+
+
+def _stations_for(data, stations: StationColumns) -> StationColumns:
+    """
+    Corridor stations narrowed to the request's corridor_miles and repriced
+    as of its departure_time, for whichever of the two it has.
+    """
+    corridor_miles = data.get("corridor_miles")
+    if corridor_miles is not None:
+        stations = stations.take(stations.detour_miles <= corridor_miles)
+
+    when = data.get("departure_time")
+    if when is None:
+        return stations
+
+    with stage("prices"):
+        prices = prices_as_of(stations.ids, when)
+    return stations.with_prices(prices).take(~np.isnan(prices))
+
+
+def _route_stations(route, route_key) -> StationColumns:
+    """
+    Corridor stations for a route. Repeat routes reuse the cached
+    artifacts for the current station data and only refresh prices.
+    """
+
+    snapshot, version = _station_source()
+
+    with stage("artifacts"):
+        artifacts = get_route_artifacts(route_key, version)
+    if artifacts is not None:
+        stations = _with_current_prices(artifacts, snapshot)
+        CORRIDOR_STATIONS.observe(len(stations))
+        return stations
+
+    with stage("decode"):
+        coords = polyline.decode(route["geometry"])
+    stations = _corridor_stations(coords, route["distance_miles"], snapshot)
+    CORRIDOR_STATIONS.observe(len(stations))
+
+    store_route_artifacts(route_key, version, _artifacts(stations))
+
+    return stations
+
+
+def _artifacts(stations: StationColumns) -> RouteArtifacts:
+    return RouteArtifacts(
+        station_ids=stations.ids,
+        mile_markers=stations.mile_markers,
+        detour_miles=stations.detour_miles,
+    )
+
+
+def _station_source():
+    """
+    (station index snapshot or None, station data version it reflects).
+    """
+    if settings.STATION_INDEX_ENABLED:
+        snapshot = station_index.snapshot()
+        return snapshot, snapshot.version
+
+    return None, get_station_data_version()
+
+
+def _with_current_prices(artifacts: RouteArtifacts, snapshot) -> StationColumns:
+    ids = artifacts.station_ids
+
+    with stage("prices"):
+        if snapshot is not None:
+            prices = snapshot.prices_for(ids)
+        else:
+            current = dict(FuelStation.objects.filter(id__in=ids.tolist()).values_list("id", "price"))
+            prices = np.array([current.get(station_id, np.nan) for station_id in ids.tolist()])
+
+    stations = StationColumns(
+        ids=ids,
+        mile_markers=artifacts.mile_markers,
+        prices=prices,
+        detour_miles=artifacts.detour_miles,
+    )
+    return stations.take(~np.isnan(prices))
+
+
+def _plan(data, route, stations: StationColumns) -> dict:
+    with stage("optimize"):
+        stops, total_cost = optimize_fuel(
+            stations,
+            total_distance=route["distance_miles"],
+            mpg=data["mpg"],
+            tank_capacity=data["tank_capacity"],
+            start_fuel=data["start_fuel"],
+            algorithm=data["algorithm"],
+            time_cost_per_hour=data["time_cost_per_hour"],
+        )
+
+    result = {
+        "distance_miles": route["distance_miles"],
+        "fuel_stops": stops,
+        "total_cost": total_cost,
+    }
+
+    geometry = _route_geometry(data, route)
+    if geometry is not None:
+        result["route_geometry"] = geometry
+
+    if data.get("waypoints"):
+        result["waypoint_mile_markers"] = _waypoint_mile_markers(route)
+
+    if "station" in data.get("expand", ()):
+        with stage("expand"):
+            _expand_stations(stops, route)
+
+    return result
+
+
+def _route_geometry(data, route) -> str | None:
+    """
+    The route polyline as requested by include_geometry, or None to omit it.
+    """
+    mode = data.get("include_geometry", "full")
+
+    if mode == "omit":
+        return None
+    if mode == "simplified":
+        with stage("simplify"):
+            coords = simplify_route(polyline.decode(route["geometry"]), data["geometry_tolerance_meters"])
+            return polyline.encode(coords)
+    return route["geometry"]
+
+
+def _expand_stations(stops: list[dict], route) -> None:
+    """
+    Attach station details to each stop, with one query for all stops.
+    Stops the optimizer did not charge a detour for get their one-way
+    detour from the route as the stop's own detour_miles.
+    """
+    if not stops:
+        return
+
+    details = get_station_details(stop["station_id"] for stop in stops)
+    found = [stop for stop in stops if stop["station_id"] in details]
+
+    if found:
+        lonlat = np.array([
+            (details[stop["station_id"]]["lon"], details[stop["station_id"]]["lat"])
+            for stop in found
+        ])
+        detours = distances_from_route(polyline.decode(route["geometry"]), lonlat) / METERS_PER_MILE
+
+        for stop, detour in zip(found, detours.tolist()):
+            station = dict(details[stop["station_id"]])
+            del station["id"]
+            stop["station"] = station
+            stop.setdefault("detour_miles", round(detour, 2))
+
+    for stop in stops:
+        stop.setdefault("station", None)
+
+
+def _waypoint_mile_markers(route) -> list[float]:
+    """
+    Mile marker of each intermediate waypoint, from the route's legs.
+    """
+    legs = route.get("leg_miles") or []
+    return [round(miles, 2) for miles in np.cumsum(legs[:-1]).tolist()]
+
+
+def _lane(data) -> tuple:
+    """
+    (start, *waypoints, end) as (lon, lat) pairs.
+    """
+    return (
+        (data["start_lon"], data["start_lat"]),
+        *((waypoint["lon"], waypoint["lat"]) for waypoint in data.get("waypoints", ())),
+        (data["end_lon"], data["end_lat"]),
+    )
+
+
+def _route_args(lane) -> tuple:
+    return list(lane[0]), list(lane[-1]), [list(point) for point in lane[1:-1]]
+
+
+def _route_key(lane, route) -> str:
+    """
+    Artifact key for a lane's route. Unlike route cache keys it is exact:
+    nearby lanes share a route but not its corrected ends or mile markers.
+    It also names the route fetch (fetched_at), so artifacts computed for
+    a route never outlive its background refresh.
+    """
+    lane_key = route_cache_key(lane[0], lane[-1], lane[1:-1], precision=EXACT_PRECISION)
+    return f"{lane_key}:{route.get('fetched_at', 0)!r}"
+
+
+def _fetch_routes(lanes: list[tuple]) -> dict:
+    """
+    Fetch routes for distinct lanes concurrently.
+    Maps each lane to its route, or to the exception that fetching raised,
+    so one bad lane fails only its own items.
+    """
+
+    def fetch(lane):
+        try:
+            return get_route(*_route_args(lane))
+        except ROUTING_ERRORS as e:
+            return e
+        except Exception as e:
+            logger.exception("Unexpected error routing batch lane %s", lane)
+            return e
+
+    with ThreadPoolExecutor(max_workers=settings.BATCH_ROUTE_WORKERS) as pool:
+        return dict(zip(lanes, pool.map(fetch, lanes)))
+
+
+def _corridor_stations(coords, distance_miles, snapshot=None) -> StationColumns:
+    """
+    Corridor stations with mile markers and detours, answered from the in-process
+    station index, located in PostGIS, or projected in Python depending
+    on settings.
+    """
+
+    if snapshot is not None:
+        with stage("corridor"):
+            return _snapshot_corridor(snapshot, coords, distance_miles)
+
+    with stage("buffer"):
+        route_line = build_route_line(coords)
+        corridor = build_corridor(route_line) if settings.CORRIDOR_MODE == "buffer" else None
+
+    if settings.LOCATE_STATIONS_IN_DB:
+        with stage("corridor"):
+            rows = np.array(
+                get_station_positions_along_route(route_line, corridor), dtype=np.float64
+            ).reshape(-1, 4)
+        return StationColumns(
+            ids=rows[:, 0].astype(np.int64),
+            mile_markers=rows[:, 2] * distance_miles,
+            prices=rows[:, 1],
+            detour_miles=rows[:, 3] / METERS_PER_MILE,
+        )
+
+    with stage("corridor"):
+        stations = list(get_stations_along_route(route_line, corridor))
+
+    with stage("projection"):
+        mile_markers, offsets = locate_along_route(
+            coords,
+            np.array([(s.location.x, s.location.y) for s in stations]),
+            distance_miles,
+        )
+
+    return StationColumns(
+        ids=np.fromiter((s.id for s in stations), dtype=np.int64, count=len(stations)),
+        mile_markers=mile_markers,
+        prices=np.fromiter((s.price for s in stations), dtype=np.float64, count=len(stations)),
+        detour_miles=offsets / METERS_PER_MILE,
+    ).take(offsets <= CORRIDOR_METERS)
+
+
+def _snapshot_corridor(snapshot: StationSnapshot, coords, distance_miles) -> StationColumns:
+    ids, prices, mile_markers, offsets = snapshot.corridor(coords, distance_miles)
+    return StationColumns(
+        ids=ids,
+        mile_markers=mile_markers,
+        prices=prices,
+        detour_miles=offsets / METERS_PER_MILE,
+    )
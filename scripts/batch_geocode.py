@@ -4,30 +4,37 @@ Batch geocoding script for fuel station dataset.
 This is a ONE-TIME data enrichment step.
 
 Features:
-- Aggressive local JSON caching
+- Append-only JSONL cache (seeded from the legacy geocode_cache.json)
 - Address deduplication
-- Rate-limit handling (1 req/sec for Nominatim)
-- Exponential backoff retries
+- Concurrent requests under a per-provider token-bucket rate limit
+- Retries with backoff for transient failures only
+- Offline fallback for addresses the provider could not resolve
+  (normalized/fuzzy matches against the cache, then city centroids),
+  with the match confidence written to the output
 - Idempotent (safe to re-run)
+
+Usage:
+    python scripts/batch_geocode.py [--provider nominatim] [--rate 1] [--concurrency 1]
+    python scripts/batch_geocode.py --offline [--gazetteer places.txt]
 """
 
+import argparse
+import asyncio
 import csv
 import json
-import time
-import httpx
 from pathlib import Path
 
+from geocoding import GeocodeCache, NominatimProvider, OfflineResolver, StubProvider, geocode_all
+from geocoding.offline import load_gazetteer
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 INPUT_FILE = BASE_DIR / "data" / "fuel-prices-for-be-assessment.csv"
 OUTPUT_FILE = BASE_DIR / "data" / "fuel-prices-enriched.csv"
-CACHE_FILE = BASE_DIR / "data" / "geocode_cache.json"
-
-NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
-
-RATE_LIMIT_DELAY = 1.1  # seconds (Nominatim requires 1/sec)
-MAX_RETRIES = 5
+CONFIDENCE_COLUMN = "Geocode Confidence"
+CACHE_FILE = BASE_DIR / "data" / "geocode_cache.jsonl"
+LEGACY_CACHE_FILE = BASE_DIR / "data" / "geocode_cache.json"
 
 
 def normalize_address(address, city, state):
@@ -38,53 +45,34 @@ def normalize_address(address, city, state):
     )
 
 
-def load_cache():
-    if CACHE_FILE.exists():
-        return json.loads(CACHE_FILE.read_text())
-    return {}
-
-
-def save_cache(cache):
-    CACHE_FILE.write_text(json.dumps(cache, indent=2))
+def build_provider(args):
+    if args.provider == "stub":
+        # Dry run: answers nothing, but exercises the whole pipeline.
+        results = json.loads(Path(args.stub_results).read_text()) if args.stub_results else {}
+        return StubProvider(results)
 
+    return NominatimProvider(
+        url=args.nominatim_url,
+        rate=args.rate,
+        concurrency=args.concurrency,
+    )
 
-def geocode(client, query):
-    """
-    Geocode with retry and exponential backoff.
-    """
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = client.get(
-                NOMINATIM_URL,
-                params={
-                    "q": query,
-                    "format": "json",
-                    "limit": 1,
-                },
-                headers={
-                    "User-Agent": "spotter-batch-geocoder/1.0"
-                },
-                timeout=10,
-            )
-
-            response.raise_for_status()
-            data = response.json()
-
-            if not data:
-                return None
-
-            return {
-                "lat": float(data[0]["lat"]),
-                "lon": float(data[0]["lon"]),
-            }
-
-        except Exception as e:
-            wait = 2 ** attempt
-            print(f"Retry {attempt+1}/{MAX_RETRIES} for {query} (wait {wait}s)")
-            time.sleep(wait)
 
-    print(f"FAILED to geocode: {query}")
-    return None
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", type=Path, default=INPUT_FILE)
+    parser.add_argument("--output", type=Path, default=OUTPUT_FILE)
+    parser.add_argument("--cache", type=Path, default=CACHE_FILE)
+    parser.add_argument("--provider", choices=["nominatim", "stub"], default="nominatim")
+    parser.add_argument("--nominatim-url", default="https://nominatim.openstreetmap.org/search")
+    parser.add_argument("--rate", type=float, default=1.0, help="Requests per second.")
+    parser.add_argument("--concurrency", type=int, default=1, help="Requests in flight.")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--flush-every", type=int, default=100, help="Cache entries per append.")
+    parser.add_argument("--stub-results", help="JSON {query: {lat, lon}} for --provider stub.")
+    parser.add_argument("--offline", action="store_true", help="Skip the provider; resolve from the cache only.")
+    parser.add_argument("--gazetteer", type=Path, help="City centroid CSV or Census Gazetteer places file.")
+    return parser.parse_args()
 
 
 # -----------------------------
@@ -92,58 +80,47 @@ def geocode(client, query):
 # -----------------------------
 
 def main():
+    args = parse_args()
 
     print("Loading cache...")
-    cache = load_cache()
+    cache = GeocodeCache(args.cache, legacy_path=LEGACY_CACHE_FILE, flush_every=args.flush_every)
 
     print("Reading CSV...")
-    with INPUT_FILE.open() as f:
+    with args.input.open() as f:
         rows = list(csv.DictReader(f))
 
-    # Deduplicate addresses
-    unique_queries = {}
-    for row in rows:
-        query = normalize_address(
-            row["Address"],
-            row["City"],
-            row["State"],
-        )
-        unique_queries[query] = None
+    queries = [
+        normalize_address(row["Address"], row["City"], row["State"])
+        for row in rows
+    ]
 
     print(f"Total rows: {len(rows)}")
-    print(f"Unique addresses: {len(unique_queries)}")
-
-    with httpx.Client() as client:
-
-        for i, query in enumerate(unique_queries.keys(), start=1):
+    print(f"Unique addresses: {len(set(queries))}")
 
-            if query in cache:
-                continue
+    def progress(query, result):
+        print(f"{'OK  ' if result else 'MISS'} {query}")
 
-            print(f"[{i}/{len(unique_queries)}] Geocoding: {query}")
-
-            result = geocode(client, query)
-
-            if result:
-                cache[query] = result
-            else:
-                cache[query] = None
+    if not args.offline:
+        stats = asyncio.run(
+            geocode_all(queries, build_provider(args), cache, max_retries=args.max_retries, progress=progress)
+        )
 
-            save_cache(cache)
+        print(
+            f"Cached: {stats.cached}, resolved: {stats.resolved}, "
+            f"not found: {stats.not_found}, failed (will retry next run): {stats.failed}"
+        )
 
-            time.sleep(RATE_LIMIT_DELAY)
+    print("Resolving offline...")
+    resolver = OfflineResolver(
+        dict(cache.items()),
+        load_gazetteer(args.gazetteer) if args.gazetteer else None,
+    )
+    confidence_counts = {}
 
     # Enrich rows
-    enriched_rows = []
-
-    for row in rows:
-        query = normalize_address(
-            row["Address"],
-            row["City"],
-            row["State"],
-        )
-
-        coords = cache.get(query)
+    for row, query in zip(rows, queries):
+        coords, confidence = resolver.resolve(query)
+        confidence_counts[confidence] = confidence_counts.get(confidence, 0) + 1
 
         if coords:
             row["Latitude"] = coords["lat"]
@@ -151,20 +128,23 @@ def main():
         else:
             row["Latitude"] = ""
             row["Longitude"] = ""
+        row[CONFIDENCE_COLUMN] = confidence or ""
 
-        enriched_rows.append(row)
+    print("Rows by confidence: " + ", ".join(
+        f"{confidence or 'unresolved'}: {count}" for confidence, count in confidence_counts.items()
+    ))
 
     print("Writing enriched CSV...")
-    fieldnames = list(rows[0].keys()) + ["Latitude", "Longitude"]
+    fieldnames = list(dict.fromkeys([*rows[0].keys(), "Latitude", "Longitude", CONFIDENCE_COLUMN]))
 
-    with OUTPUT_FILE.open("w", newline="") as f:
+    with args.output.open("w", newline="") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
-        writer.writerows(enriched_rows)
+        writer.writerows(rows)
 
     print("Done.")
     print("Geocoding complete. You can now disable geocoding in production.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,26 @@
+"""
+Geocoding pipeline for the fuel station dataset.
+
+Providers are rate limited with an async token bucket and queried
+concurrently; results go to an append-only JSONL cache flushed in
+batches, so re-runs only pay for addresses not seen before. Addresses
+no provider resolved can be filled in offline from known results.
+"""
+
+from .cache import GeocodeCache
+from .limiter import TokenBucket
+from .offline import OfflineResolver
+from .pipeline import GeocodeStats, geocode_all
+from .providers import NominatimProvider, PermanentError, StubProvider, TransientError
+
+__all__ = [
+    "GeocodeCache",
+    "GeocodeStats",
+    "NominatimProvider",
+    "OfflineResolver",
+    "PermanentError",
+    "StubProvider",
+    "TokenBucket",
+    "TransientError",
+    "geocode_all",
+]
@@ -0,0 +1,81 @@
+"""
+Append-only JSONL geocode cache.
+
+Each line is {"q": query, "r": result-or-null}; later lines win. New
+results are buffered and appended in batches, so a run costs O(new
+results) I/O instead of rewriting the whole cache after every query.
+"""
+
+import json
+from pathlib import Path
+
+
+class GeocodeCache:
+
+    def __init__(self, path: Path, legacy_path: Path | None = None, flush_every: int = 100):
+        self.path = Path(path)
+        self.flush_every = flush_every
+        self._entries = {}
+        self._pending = []
+
+        if self.path.exists():
+            self._load()
+        elif legacy_path is not None and Path(legacy_path).exists():
+            self._import_legacy(Path(legacy_path))
+
+    def __contains__(self, query: str) -> bool:
+        return query in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, query: str):
+        return self._entries.get(query)
+
+    def items(self):
+        return self._entries.items()
+
+    def put(self, query: str, result):
+        self._entries[query] = result
+        self._pending.append(query)
+
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as file:
+            file.writelines(
+                json.dumps({"q": query, "r": self._entries[query]}, separators=(",", ":")) + "\n"
+                for query in self._pending
+            )
+        self._pending.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def _load(self):
+        with self.path.open(encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn final line from an interrupted run
+                self._entries[entry["q"]] = entry["r"]
+
+    def _import_legacy(self, legacy_path: Path):
+        """
+        Seed from the old single-object geocode_cache.json.
+        """
+        for query, result in json.loads(legacy_path.read_text()).items():
+            self.put(query, result)
+        self.flush()
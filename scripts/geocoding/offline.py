@@ -0,0 +1,205 @@
+"""
+Offline geocoding from already-known results.
+
+Resolves addresses without network calls, in decreasing confidence:
+
+- "exact":      the query itself has cached coordinates.
+- "normalized": a cached query in the same city with the same address
+                tokens once road names are normalized ("I-44", "I 44",
+                "Interstate 44" -> "i44").
+- "fuzzy":      the closest cached address in the same city sharing a
+                road, or anywhere in the state at the same road and exit.
+- "city":       the city's centroid, from a gazetteer file or derived
+                from cached results in that city.
+"""
+
+import csv
+import difflib
+import re
+from collections import defaultdict
+from pathlib import Path
+
+CONFIDENCE_LEVELS = ("exact", "normalized", "fuzzy", "city")
+
+FUZZY_MIN_SIMILARITY = 0.3
+CITY_MIN_SIMILARITY = 0.85
+
+_ROAD_PREFIXES = [
+    (r"(?:i|ih|interstate)", "i"),
+    (r"(?:us|u\.s\.)(?:\s*hwy|\s*highway)?", "us"),
+    (r"(?:sr|sh|state\s+route|state\s+road|state\s+hwy|state\s+highway|hwy|highway)", "sr"),
+    (r"(?:cr|county\s+road|co\s+rd)", "cr"),
+    (r"(?:exit|ex)\s*#?", "exit"),
+]
+_ROAD_PATTERNS = [
+    (re.compile(rf"\b{pattern}[\s-]*(\d+[a-z]?)\b"), prefix)
+    for pattern, prefix in _ROAD_PREFIXES
+]
+_STOPWORDS = frozenset({"and", "at", "near", "the", "of"})
+_ROAD_TOKEN = re.compile(r"^(?:i|us|sr|cr)\d")
+_GAZETTEER_SUFFIXES = re.compile(r"\s+(?:city|town|village|borough|cdp|municipality)$")
+
+
+def split_query(query: str) -> tuple[str, str, str]:
+    """
+    (address, city, state) from a normalized "address, city, state, usa"
+    query as produced by batch_geocode.normalize_address.
+    """
+    address, city, state, _ = query.rsplit(", ", 3)
+    return address, city, state
+
+
+def address_tokens(address: str) -> frozenset[str]:
+    text = address.lower().replace("&", " ").replace("/", " ").replace(",", " ")
+    for pattern, prefix in _ROAD_PATTERNS:
+        text = pattern.sub(lambda match: f" {prefix}{match.group(1)} ", text)
+    return frozenset(re.findall(r"[a-z0-9]+", text)) - _STOPWORDS
+
+
+def city_key(city: str) -> str:
+    city = re.sub(r"[^a-z0-9 ]", "", city.lower())
+    city = re.sub(r"^(?:saint|ste?)\s+", "st ", city)
+    return re.sub(r"\s+", " ", city).strip()
+
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+class OfflineResolver:
+    """
+    Index over known (query -> coordinates) results plus city centroids.
+    """
+
+    def __init__(self, known: dict, city_centroids: dict | None = None):
+        self._exact = {}
+        self._by_city = defaultdict(list)
+        self._by_exit = defaultdict(list)
+        city_points = defaultdict(list)
+
+        for query, coords in known.items():
+            if not coords:
+                continue
+
+            try:
+                address, city, state = split_query(query)
+            except ValueError:
+                continue
+
+            tokens = address_tokens(address)
+            key = (state, city_key(city))
+
+            self._exact[query] = coords
+            self._by_city[key].append((tokens, coords))
+            city_points[key].append(coords)
+
+            for road in _roads(tokens):
+                for exit_token in _exits(tokens):
+                    self._by_exit[(state, road, exit_token)].append(coords)
+
+        self._centroids = {
+            key: {
+                "lat": sum(p["lat"] for p in points) / len(points),
+                "lon": sum(p["lon"] for p in points) / len(points),
+            }
+            for key, points in city_points.items()
+        }
+        # Gazetteer centroids take precedence over derived ones.
+        self._centroids.update(city_centroids or {})
+
+        self._cities_by_state = defaultdict(list)
+        for state, city in self._centroids:
+            self._cities_by_state[state].append(city)
+
+    @classmethod
+    def from_cache(cls, cache, gazetteer_path: Path | None = None) -> "OfflineResolver":
+        return cls(
+            dict(cache.items()),
+            load_gazetteer(gazetteer_path) if gazetteer_path else None,
+        )
+
+    def resolve(self, query: str):
+        """
+        (coordinates, confidence) for a normalized query, or (None, None).
+        """
+
+        coords = self._exact.get(query)
+        if coords:
+            return coords, "exact"
+
+        try:
+            address, city, state = split_query(query)
+        except ValueError:
+            return None, None
+
+        tokens = address_tokens(address)
+        key = (state, city_key(city))
+        candidates = self._by_city.get(key, ())
+
+        for candidate_tokens, coords in candidates:
+            if candidate_tokens == tokens:
+                return coords, "normalized"
+
+        roads = _roads(tokens)
+        best, best_score = None, FUZZY_MIN_SIMILARITY
+        for candidate_tokens, coords in candidates:
+            if roads & candidate_tokens:
+                score = _similarity(tokens, candidate_tokens)
+                if score >= best_score:
+                    best, best_score = coords, score
+        if best is not None:
+            return best, "fuzzy"
+
+        for road in sorted(roads):
+            for exit_token in sorted(_exits(tokens)):
+                matches = self._by_exit.get((state, road, exit_token))
+                if matches:
+                    return matches[0], "fuzzy"
+
+        centroid = self._centroids.get(key)
+        if centroid is None:
+            close = difflib.get_close_matches(key[1], self._cities_by_state.get(state, []), n=1, cutoff=CITY_MIN_SIMILARITY)
+            if close:
+                centroid = self._centroids[(state, close[0])]
+        if centroid is not None:
+            return centroid, "city"
+
+        return None, None
+
+
+def load_gazetteer(path: Path) -> dict:
+    """
+    City centroids {(state, city_key): {"lat", "lon"}} from a CSV with
+    state, city, lat, lon columns, or from a US Census Gazetteer places
+    file (tab separated USPS, NAME, INTPTLAT, INTPTLONG).
+    """
+
+    centroids = {}
+
+    with Path(path).open(newline="", encoding="utf-8") as file:
+        sample = file.readline()
+        file.seek(0)
+        reader = csv.DictReader(file, delimiter="\t" if "\t" in sample else ",")
+
+        for row in reader:
+            row = {name.strip().lower(): value for name, value in row.items() if name}
+
+            try:
+                state = (row.get("state") or row["usps"]).strip().lower()
+                city = _GAZETTEER_SUFFIXES.sub("", (row.get("city") or row["name"]).strip().lower())
+                lat = float(row.get("lat") or row["intptlat"])
+                lon = float(row.get("lon") or row["intptlong"])
+            except (KeyError, TypeError, ValueError):
+                continue
+
+            centroids[(state, city_key(city))] = {"lat": lat, "lon": lon}
+
+    return centroids
+
+
+def _roads(tokens) -> set:
+    return {token for token in tokens if _ROAD_TOKEN.match(token)}
+
+
+def _exits(tokens) -> set:
+    return {token for token in tokens if token.startswith("exit") and token != "exit"}
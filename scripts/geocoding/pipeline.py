@@ -0,0 +1,95 @@
+"""
+Concurrent, rate-limited geocoding of many queries.
+"""
+
+import asyncio
+import random
+from dataclasses import dataclass
+
+import httpx
+
+from .cache import GeocodeCache
+from .limiter import TokenBucket
+from .providers import PermanentError, TransientError
+
+
+@dataclass
+class GeocodeStats:
+    cached: int = 0
+    resolved: int = 0
+    not_found: int = 0
+    failed: int = 0
+
+
+async def geocode_all(
+    queries,
+    provider,
+    cache: GeocodeCache,
+    max_retries: int = 5,
+    backoff: float = 1.0,
+    client: httpx.AsyncClient | None = None,
+    progress=None,
+) -> GeocodeStats:
+    """
+    Geocode every query not already in the cache.
+
+    At most `provider.concurrency` requests are in flight, started at no
+    more than `provider.rate` per second. Transient errors are retried
+    with jittered exponential backoff; permanent errors are not. Found
+    and not-found results are cached; failures are not, so the next run
+    retries them.
+    """
+
+    stats = GeocodeStats()
+    pending = []
+
+    for query in dict.fromkeys(queries):
+        if query in cache:
+            stats.cached += 1
+        else:
+            pending.append(query)
+
+    limiter = TokenBucket(provider.rate, capacity=max(1, provider.concurrency))
+    semaphore = asyncio.Semaphore(provider.concurrency)
+
+    async def one(http, query):
+        async with semaphore:
+            try:
+                result = await _geocode_with_retries(provider, http, query, limiter, max_retries, backoff)
+            except (TransientError, PermanentError):
+                stats.failed += 1
+                return
+
+        cache.put(query, result)
+        if result is None:
+            stats.not_found += 1
+        else:
+            stats.resolved += 1
+
+        if progress is not None:
+            progress(query, result)
+
+    async def run(http):
+        await asyncio.gather(*(one(http, query) for query in pending))
+
+    try:
+        if client is None:
+            async with httpx.AsyncClient() as http:
+                await run(http)
+        else:
+            await run(client)
+    finally:
+        cache.flush()
+
+    return stats
+
+
+async def _geocode_with_retries(provider, http, query, limiter, max_retries, backoff):
+    for attempt in range(max_retries):
+        await limiter.acquire()
+        try:
+            return await provider.geocode(http, query)
+        except TransientError:
+            if attempt == max_retries - 1:
+                raise
+            await asyncio.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.0))
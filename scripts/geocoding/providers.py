@@ -0,0 +1,92 @@
+"""
+Geocoding providers.
+
+A provider exposes `rate` (requests per second), `concurrency` (requests
+in flight) and `async geocode(client, query)`, which returns
+{"lat": ..., "lon": ...}, None when the address has no match, or raises
+TransientError / PermanentError.
+"""
+
+import httpx
+
+
+class TransientError(Exception):
+    """
+    Failure worth retrying: timeouts, connection errors, 429 and 5xx.
+    """
+
+
+class PermanentError(Exception):
+    """
+    Failure retrying will not fix, e.g. a rejected request.
+    """
+
+
+class NominatimProvider:
+    """
+    OpenStreetMap Nominatim. The public instance allows one request per
+    second; self-hosted instances can raise rate and concurrency.
+    """
+
+    def __init__(
+        self,
+        url: str = "https://nominatim.openstreetmap.org/search",
+        user_agent: str = "spotter-batch-geocoder/1.0",
+        rate: float = 1.0,
+        concurrency: int = 1,
+        timeout: float = 10,
+    ):
+        self.url = url
+        self.user_agent = user_agent
+        self.rate = rate
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    async def geocode(self, client: httpx.AsyncClient, query: str):
+        try:
+            response = await client.get(
+                self.url,
+                params={"q": query, "format": "json", "limit": 1},
+                headers={"User-Agent": self.user_agent},
+                timeout=self.timeout,
+            )
+        except httpx.TransportError as e:
+            raise TransientError(str(e)) from e
+
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientError(f"HTTP {response.status_code}")
+        if response.status_code >= 400:
+            raise PermanentError(f"HTTP {response.status_code}")
+
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise TransientError("Invalid JSON response") from e
+
+        if not data:
+            return None
+
+        return {"lat": float(data[0]["lat"]), "lon": float(data[0]["lon"])}
+
+
+class StubProvider:
+    """
+    Offline provider answering from a dict, for tests and dry runs.
+    Queries listed in `transient_failures` fail that many times first.
+    """
+
+    def __init__(self, results: dict, rate: float = 1000.0, concurrency: int = 16, transient_failures=None):
+        self.results = results
+        self.rate = rate
+        self.concurrency = concurrency
+        self.transient_failures = dict(transient_failures or {})
+        self.calls = 0
+
+    async def geocode(self, client, query: str):
+        self.calls += 1
+
+        if self.transient_failures.get(query, 0) > 0:
+            self.transient_failures[query] -= 1
+            raise TransientError(f"stub failure for {query}")
+
+        return self.results.get(query)
@@ -0,0 +1,114 @@
+"""
+Circuit breaker for upstream calls.
+
+After `failure_threshold` consecutive failures the breaker opens and
+calls fail immediately with CircuitOpen instead of waiting on a struggling
+upstream. After `reset_timeout` seconds one probe call is let through
+(half-open): success closes the breaker, failure opens it again. State is
+per process, like the route cache stats.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from services.metrics import CIRCUIT_BREAKER_EVENTS
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """
+    The call was not attempted because the breaker is open.
+    """
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit is open; retry in {retry_after:.0f}s.")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go ahead now. While half-open only the first
+        caller (the probe) is allowed.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            # A probe that never reported back (e.g. cancelled) does not
+            # hold the breaker half-open forever: another one goes after
+            # the same timeout.
+            now = self._clock()
+            if now - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._opened_at = now
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        """
+        Seconds until the next probe may be let through.
+        """
+        return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self._state != CLOSED:
+                self._state = CLOSED
+                CIRCUIT_BREAKER_EVENTS.inc(breaker=self.name, event="closed")
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    CIRCUIT_BREAKER_EVENTS.inc(breaker=self.name, event="opened")
+                self._state = OPEN
+                self._opened_at = self._clock()
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+
+    @contextmanager
+    def guard(self, is_failure=lambda error: True):
+        """
+        Run the block if the breaker allows it and record the outcome.
+        Exceptions for which is_failure(error) is false (say, a 4xx from a
+        healthy upstream) count as successes. Raises CircuitOpen without
+        running the block while the breaker is open.
+        """
+        if not self.allow():
+            CIRCUIT_BREAKER_EVENTS.inc(breaker=self.name, event="rejected")
+            raise CircuitOpen(self.name, self.retry_after())
+
+        try:
+            yield
+        except Exception as e:
+            if is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        else:
+            self.record_success()
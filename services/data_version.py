@@ -0,0 +1,47 @@
+"""
+Station version counters, shared across workers through the cache.
+
+- The data version changes when stations are (re)loaded, and may move
+  or remove stations. Anything derived from station locations is keyed
+  on it.
+- The price version changes when only prices were refreshed. Geometry
+  derived caches stay valid and only prices need re-reading.
+"""
+
+from django.core.cache import cache
+
+STATION_DATA_VERSION_KEY = "stations:data_version"
+STATION_PRICE_VERSION_KEY = "stations:price_version"
+
+
+def get_station_data_version() -> int:
+    """
+    Current station data version (0 if stations were never reloaded).
+    """
+    return cache.get(STATION_DATA_VERSION_KEY, 0)
+
+
+def bump_station_data_version() -> int:
+    """
+    Mark station data as changed. Returns the new version.
+    """
+    return _bump(STATION_DATA_VERSION_KEY)
+
+
+def get_station_price_version() -> int:
+    """
+    Current station price version (0 if prices were never refreshed).
+    """
+    return cache.get(STATION_PRICE_VERSION_KEY, 0)
+
+
+def bump_station_price_version() -> int:
+    """
+    Mark station prices (only) as changed. Returns the new version.
+    """
+    return _bump(STATION_PRICE_VERSION_KEY)
+
+
+def _bump(key: str) -> int:
+    cache.add(key, 0, timeout=None)
+    return cache.incr(key)
@@ -0,0 +1,225 @@
+"""
+In-process metrics for the optimize pipeline.
+
+Stage timers feed Prometheus-style histograms, rendered in the text
+exposition format at /metrics, and the current request's timings, which
+ServerTimingMiddleware returns as a Server-Timing header. Like the route
+cache stats, metrics are per process; scrape every worker.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATION_COUNT_BUCKETS = (0, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class Counter:
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_values(self.labels, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_values(self.labels, labels), 0)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name: str, documentation: str, buckets, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(float(bound) for bound in buckets)
+        self.labels = labels
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_values(self.labels, labels)
+        slot = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    def label_values(self) -> list[dict]:
+        """
+        Labels of every series observed so far.
+        """
+        return [dict(zip(self.labels, key)) for key in list(self._series)]
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_label_values(self.labels, labels))
+        return series[2] if series else 0
+
+    def sum(self, **labels) -> float:
+        series = self._series.get(_label_values(self.labels, labels))
+        return series[1] if series else 0.0
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                    cumulative += bucket_count
+                    le = bound if bound == "+Inf" else _format_value(bound)
+                    labels = _format_labels((*self.labels, "le"), (*key, le))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labels, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self._register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self._register(Histogram(*args, **kwargs))
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+    def clear(self):
+        for metric in self._metrics:
+            metric.clear()
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "optimize_stage_seconds",
+    "Time spent in each stage of the optimize pipeline.",
+    LATENCY_BUCKETS,
+    labels=("stage",),
+)
+CACHE_LOOKUPS = registry.counter(
+    "route_cache_lookups_total",
+    "Route and artifact cache lookups by cache and result.",
+    labels=("cache", "result"),
+)
+ROUTING_REQUESTS = registry.counter(
+    "routing_backend_requests_total",
+    "Routing backend calls by backend and result.",
+    labels=("backend", "result"),
+)
+CIRCUIT_BREAKER_EVENTS = registry.counter(
+    "circuit_breaker_events_total",
+    "Circuit breaker transitions (opened, closed) and calls rejected while open.",
+    labels=("breaker", "event"),
+)
+STALE_ROUTES = registry.counter(
+    "route_cache_stale_served_total",
+    "Cached routes served past their soft TTL.",
+)
+ROUTE_REFRESHES = registry.counter(
+    "route_refreshes_total",
+    "Background refreshes of stale routes by result.",
+    labels=("result",),
+)
+CORRIDOR_STATIONS = registry.histogram(
+    "corridor_stations",
+    "Corridor stations per planned route.",
+    STATION_COUNT_BUCKETS,
+)
+
+_timings: ContextVar[dict | None] = ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a pipeline stage into STAGE_SECONDS and the current request's
+    timings, if they are being collected.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+@contextmanager
+def collect_timings():
+    """
+    Collect stage timings (seconds, summed per stage) for the duration of
+    the block, e.g. one request.
+    """
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def server_timing(timings: dict) -> str:
+    """
+    Server-Timing header value, durations in milliseconds.
+    """
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+def _label_values(names: tuple[str, ...], labels: dict) -> tuple:
+    return tuple(str(labels[name]) for name in names)
+
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
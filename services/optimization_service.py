@@ -1,9 +1,25 @@
 """
-Greedy fuel optimization algorithm.
+Fuel optimization algorithms.
+
+Both engines share the same refueling rule: at each station, buy just
+enough fuel to reach the next cheaper station if one is within range,
+otherwise fill up (capped by what is needed to finish). They differ only
+in how the next cheaper station is found:
+
+- "greedy": look-ahead scan from every station, O(n^2) in the worst case.
+- "optimal": next-smaller-element monotonic stack, O(n) after sorting.
+
+Stations off the route cost a detour: stopping at one burns the fuel for
+the drive there and back, plus an optional time cost per hour of detour.
+The detour fuel is added to the gallons bought at the stop and the time
+cost to the total; both are folded into an effective price (amortized
+over a full tank) when deciding which station is cheaper.
 """
 
-from dataclasses import dataclass
-from typing import List, Tuple
+from dataclasses import dataclass, replace
+from typing import List, Optional, Tuple
+
+import numpy as np
 
 
 @dataclass(slots=True)
@@ -13,16 +29,114 @@ class StationDTO:
     price: float
 
 
+# Average speed assumed while driving off the route to a station.
+DETOUR_SPEED_MPH = 35.0
+
+
+@dataclass(slots=True)
+class StationColumns:
+    """
+    Columnar station input: parallel arrays of ids, mile markers and prices,
+    and optionally each station's one-way detour from the route in miles.
+    """
+    ids: np.ndarray
+    mile_markers: np.ndarray
+    prices: np.ndarray
+    detour_miles: np.ndarray | None = None
+
+    @classmethod
+    def from_dtos(cls, stations: List[StationDTO]) -> "StationColumns":
+        count = len(stations)
+        return cls(
+            ids=np.fromiter((s.id for s in stations), dtype=np.int64, count=count),
+            mile_markers=np.fromiter((s.mile_marker for s in stations), dtype=np.float64, count=count),
+            prices=np.fromiter((s.price for s in stations), dtype=np.float64, count=count),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def take(self, selector) -> "StationColumns":
+        """
+        Rows picked by a boolean mask or index array, in that order.
+        """
+        return StationColumns(
+            ids=self.ids[selector],
+            mile_markers=self.mile_markers[selector],
+            prices=self.prices[selector],
+            detour_miles=self.detour_miles[selector] if self.detour_miles is not None else None,
+        )
+
+    def with_prices(self, prices: np.ndarray) -> "StationColumns":
+        return replace(self, prices=prices)
+
+
 class RouteUnreachable(Exception):
     pass
 
 
+def _scan_cheaper(
+    mile_markers: List[float],
+    prices: List[float],
+    max_range: float,
+) -> List[Optional[int]]:
+    """
+    For each station, scan ahead for a cheaper station within range.
+    """
+    cheaper = []
+    n = len(prices)
+
+    for i in range(n):
+        found = None
+        for j in range(i + 1, n):
+            if (
+                prices[j] < prices[i] and
+                mile_markers[j] - mile_markers[i] <= max_range
+            ):
+                found = j
+                break
+        cheaper.append(found)
+
+    return cheaper
+
+
+def _stack_cheaper(
+    mile_markers: List[float],
+    prices: List[float],
+    max_range: float,
+) -> List[Optional[int]]:
+    """
+    For each station, the next strictly cheaper station if it is within
+    range. Stations are sorted by mile marker, so the nearest cheaper one
+    is the only candidate that can be reachable.
+    """
+    cheaper = [None] * len(prices)
+    stack = []
+
+    for j, price in enumerate(prices):
+        while stack and prices[stack[-1]] > price:
+            i = stack.pop()
+            if mile_markers[j] - mile_markers[i] <= max_range:
+                cheaper[i] = j
+        stack.append(j)
+
+    return cheaper
+
+
+ALGORITHMS = {
+    "greedy": _scan_cheaper,
+    "optimal": _stack_cheaper,
+}
+
+
 def optimize_fuel(
-    stations: List[StationDTO],
+    stations: List[StationDTO] | StationColumns,
     total_distance: float,
     mpg: float,
     tank_capacity: float,
     start_fuel: float,
+    algorithm: str = "greedy",
+    time_cost_per_hour: float = 0.0,
 ) -> Tuple[List[dict], float]:
 
     max_range = tank_capacity * mpg
@@ -31,77 +145,107 @@ def optimize_fuel(
     total_cost = 0.0
     stops = []
 
-    stations = sorted(stations, key=lambda s: s.mile_marker)
+    if not isinstance(stations, StationColumns):
+        stations = StationColumns.from_dtos(stations)
+
+    # Sort once, then walk plain lists; index n is the destination.
+    order = np.argsort(stations.mile_markers, kind="stable")
+    ids = stations.ids[order].tolist()
+    mile_markers = stations.mile_markers[order].tolist()
+    prices = stations.prices[order].tolist()
+    n = len(ids)
+
+    if stations.detour_miles is not None:
+        detour_miles = stations.detour_miles[order]
+    else:
+        detour_miles = np.zeros(n)
+
+    # One-way detour fuel, and the time cost of the round trip, per station.
+    detour_fuel = detour_miles / mpg
+    time_costs = 2 * detour_miles / DETOUR_SPEED_MPH * time_cost_per_hour
+    effective_prices = (
+        stations.prices[order]
+        + (2 * detour_fuel * stations.prices[order] + time_costs) / tank_capacity
+    ).tolist()
+    detour_fuel = detour_fuel.tolist()
+    time_costs = time_costs.tolist()
+    detour_miles = detour_miles.tolist()
 
-    # Append destination marker
-    stations.append(
-        StationDTO(id=None, mile_marker=total_distance, price=None)
-    )
+    cheaper = ALGORITHMS[algorithm](mile_markers, effective_prices, max_range)
 
-    for i, station in enumerate(stations):
+    for i in range(n + 1):
 
-        distance = station.mile_marker - current_position
+        mile_marker = mile_markers[i] if i < n else total_distance
+        distance = mile_marker - current_position
 
         if distance > max_range:
             raise RouteUnreachable("Segment exceeds max vehicle range.")
 
         fuel_needed_to_reach_station = distance / mpg
 
-        if current_fuel < fuel_needed_to_reach_station:
+        # Tolerate float error from plans that arrive with exactly 0 gallons
+        if current_fuel < fuel_needed_to_reach_station - 1e-9:
             raise RouteUnreachable("Not enough fuel to reach next station.")
 
         # Consume fuel to reach this station
-        current_fuel -= fuel_needed_to_reach_station
-        current_position = station.mile_marker
+        current_fuel = max(0.0, current_fuel - fuel_needed_to_reach_station)
+        current_position = mile_marker
 
         # If destination → stop
-        if station.id is None:
+        if i == n:
             break
 
+        price = prices[i]
+        detour = detour_fuel[i]
+
         # Calculate remaining trip requirement
-        remaining_distance = total_distance - station.mile_marker
+        remaining_distance = total_distance - mile_marker
         fuel_needed_to_finish = remaining_distance / mpg
 
-        # Look ahead for cheaper station reachable from HERE
-        cheaper_station = None
-        for future in stations[i + 1:]:
-            if future.id is None:
-                break
-            if (
-                future.price < station.price and
-                future.mile_marker - station.mile_marker <= max_range
-            ):
-                cheaper_station = future
-                break
-
-        if cheaper_station:
-            # Buy just enough to reach cheaper station
-            distance_to_cheaper = cheaper_station.mile_marker - station.mile_marker
-            fuel_needed = distance_to_cheaper / mpg
+        # Cheaper station reachable from HERE
+        j = cheaper[i]
 
-            fuel_to_buy = max(0.0, fuel_needed - current_fuel)
+        if j is not None:
+            # Rejoin the route with just enough to reach the cheaper
+            # station, including the detour to it
+            distance_to_cheaper = mile_markers[j] - mile_marker
+            fuel_needed = distance_to_cheaper / mpg + detour_fuel[j]
 
         else:
             # Fill — BUT cap by finish requirement
-            max_fill_allowed = min(
-                tank_capacity - current_fuel,
-                fuel_needed_to_finish - current_fuel
-            )
+            fuel_needed = min(tank_capacity - detour, fuel_needed_to_finish)
 
-            fuel_to_buy = max(0.0, max_fill_allowed)
+        # The detour there and back comes out of the tank before rejoining,
+        # and the tank only holds what is left after driving there.
+        fuel_to_buy = min(
+            max(0.0, fuel_needed - (current_fuel - 2 * detour)),
+            tank_capacity - (current_fuel - detour),
+        )
 
-        cost = fuel_to_buy * station.price
-        total_cost += cost
+        # Only leave the route if the stop adds fuel beyond the detour
+        # itself, and only if the station can be reached.
+        if detour and (fuel_to_buy - 2 * detour <= 1e-6 or current_fuel < detour - 1e-9):
+            continue
+
+        cost = fuel_to_buy * price
+        # Time costs are non-zero only off the route, where a stop that
+        # is made always buys fuel.
+        total_cost += cost + time_costs[i]
 
         if fuel_to_buy > 1e-6:
-            stops.append({
-                "station_id": station.id,
-                "mile_marker": round(station.mile_marker, 2),
-                "price": station.price,
+            stop = {
+                "station_id": ids[i],
+                "mile_marker": round(mile_marker, 2),
+                "price": price,
                 "gallons": round(fuel_to_buy, 2),
                 "cost": round(cost, 2),
-            })
-
-        current_fuel += fuel_to_buy
+            }
+            if detour:
+                stop["detour_miles"] = round(detour_miles[i], 2)
+                if time_costs[i]:
+                    stop["detour_time_cost"] = round(time_costs[i], 2)
+            stops.append(stop)
+
+        current_fuel += fuel_to_buy - 2 * detour
 
     return stops, round(total_cost, 2)
@@ -0,0 +1,64 @@
+"""
+Station price history: recording price changes and resolving prices as
+of a point in time.
+"""
+
+from datetime import datetime
+
+import numpy as np
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from optimizer.models import FuelPriceHistory, FuelStation
+
+
+def record_price_snapshot() -> int:
+    """
+    Append a history row, effective now, for every station whose current
+    price differs from its latest recorded price. Returns rows written.
+    """
+
+    history = FuelPriceHistory._meta.db_table
+    stations = FuelStation._meta.db_table
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {history} (station_id, effective_from, price)
+            SELECT station.id, statement_timestamp(), station.price
+            FROM {stations} AS station
+            WHERE station.price IS DISTINCT FROM (
+                SELECT latest.price
+                FROM {history} AS latest
+                WHERE latest.station_id = station.id
+                ORDER BY latest.effective_from DESC
+                LIMIT 1
+            )
+            """
+        )
+        return cursor.rowcount
+
+
+def prices_as_of(ids: np.ndarray, when: datetime) -> np.ndarray:
+    """
+    Price of each station as of `when`, aligned with `ids`, in one query.
+    Stations without history before `when` fall back to their current
+    price; ids that no longer exist are NaN.
+    """
+
+    latest = (
+        FuelPriceHistory.objects
+        .filter(station=OuterRef("pk"), effective_from__lte=when)
+        .order_by("-effective_from")
+        .values("price")[:1]
+    )
+
+    resolved = dict(
+        FuelStation.objects
+        .filter(id__in=ids.tolist())
+        .annotate(price_as_of=Coalesce(Subquery(latest), "price"))
+        .values_list("id", "price_as_of")
+    )
+
+    return np.array([resolved.get(station_id, np.nan) for station_id in ids.tolist()], dtype=np.float64)
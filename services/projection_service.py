@@ -2,8 +2,18 @@
 Projection utilities for computing mile markers.
 """
 
+import numpy as np
+
 PROJECTED_CRS = 3857
 
+# EPSG:3857 is spherical Mercator on the WGS84 semi-major axis.
+EARTH_RADIUS_M = 6378137.0
+
+# Route segments per pruning block, and an upper bound on
+# (stations x segments) elements handled per vectorized chunk.
+BLOCK_SIZE = 32
+MAX_CHUNK_ELEMENTS = 1_000_000
+
 
 def compute_mile_marker(route_line, station_point, total_miles):
     """
@@ -18,3 +28,150 @@ def compute_mile_marker(route_line, station_point, total_miles):
 
     fraction = projection_distance / total_length
     return fraction * total_miles
+
+
+def to_projected(lonlat: np.ndarray) -> np.ndarray:
+    """
+    Forward-project (lon, lat) degrees to EPSG:3857 meters.
+    """
+    lonlat = np.asarray(lonlat, dtype=np.float64).reshape(-1, 2)
+    lon = np.radians(lonlat[:, 0])
+    lat = np.radians(lonlat[:, 1])
+
+    return np.column_stack((
+        EARTH_RADIUS_M * lon,
+        EARTH_RADIUS_M * np.log(np.tan(np.pi / 4 + lat / 2)),
+    ))
+
+
+def project_onto_route(
+    route_xy: np.ndarray,
+    points_xy: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Project points onto a projected polyline, segment-wise.
+
+    Returns (along, offset): the distance along the line to each point's
+    nearest location on it, and the distance from the point to that
+    location. Both are in the units of the inputs.
+
+    Segments are grouped into blocks of BLOCK_SIZE; a block is only
+    searched when its bounding box is closer to the point than the
+    nearest block anchor vertex, so the result is exact but most of the
+    route is never touched for stations sitting near it.
+    """
+
+    starts = route_xy[:-1]
+    deltas = route_xy[1:] - starts
+    seg_len_sq = (deltas ** 2).sum(axis=1)
+    seg_len = np.sqrt(seg_len_sq)
+    cumulative = np.concatenate(([0.0], np.cumsum(seg_len)[:-1]))
+
+    n_points = len(points_xy)
+    n_segments = len(starts)
+    along = np.zeros(n_points)
+    offset = np.zeros(n_points)
+
+    if n_points == 0 or n_segments == 0:
+        return along, offset
+
+    block_starts = np.arange(0, n_segments, BLOCK_SIZE)
+    block_ends = np.minimum(block_starts + BLOCK_SIZE, n_segments)
+    box_min = np.minimum(np.minimum.reduceat(starts, block_starts), route_xy[block_ends])
+    box_max = np.maximum(np.maximum.reduceat(starts, block_starts), route_xy[block_ends])
+    anchors = route_xy[block_starts]
+    lanes = np.arange(BLOCK_SIZE)
+
+    chunk = max(1, MAX_CHUNK_ELEMENTS // n_segments)
+
+    for lo in range(0, n_points, chunk):
+        pts = points_xy[lo:lo + chunk]
+
+        # Lower bound: distance to each block's box.
+        # Upper bound: distance to the nearest block anchor vertex.
+        outside = (
+            np.maximum(box_min[None] - pts[:, None], 0.0)
+            + np.maximum(pts[:, None] - box_max[None], 0.0)
+        )
+        lower_sq = (outside ** 2).sum(axis=2)
+        upper_sq = ((anchors[None] - pts[:, None]) ** 2).sum(axis=2).min(axis=1)
+
+        owner, block = np.nonzero(lower_sq <= upper_sq[:, None] * (1 + 1e-9))
+
+        seg = (block_starts[block][:, None] + lanes[None]).ravel()
+        owner = np.repeat(owner, BLOCK_SIZE)
+        valid = seg < n_segments
+        seg = seg[valid]
+        owner = owner[valid]
+
+        rel = pts[owner] - starts[seg]
+        t = np.divide(
+            (rel * deltas[seg]).sum(axis=1),
+            seg_len_sq[seg],
+            out=np.zeros(len(seg)),
+            where=seg_len_sq[seg] > 0,
+        )
+        np.clip(t, 0.0, 1.0, out=t)
+
+        gap = rel - t[:, None] * deltas[seg]
+        dist_sq = (gap ** 2).sum(axis=1)
+
+        # Nearest segment per point; ties go to the earliest segment.
+        order = np.lexsort((seg, dist_sq, owner))
+        owners = owner[order]
+        best = order[np.r_[True, owners[1:] != owners[:-1]]]
+
+        rows = lo + owner[best]
+        along[rows] = cumulative[seg[best]] + t[best] * seg_len[seg[best]]
+        offset[rows] = np.sqrt(dist_sq[best])
+
+    return along, offset
+
+
+def compute_mile_markers(route_coords, station_lonlat, total_miles) -> np.ndarray:
+    """
+    Compute mile markers for many stations in one vectorized pass.
+    route_coords format: [(lat, lon), ...] as decoded from the route polyline.
+    station_lonlat format: [(lon, lat), ...]
+    """
+
+    mile_markers, _ = locate_along_route(route_coords, station_lonlat, total_miles)
+    return mile_markers
+
+
+def locate_along_route(route_coords, station_lonlat, total_miles) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Mile markers and off-route distances (ground meters) for many stations,
+    from the same projection pass.
+    route_coords format: [(lat, lon), ...]; station_lonlat: [(lon, lat), ...]
+    """
+
+    route_xy = to_projected(np.asarray(route_coords, dtype=np.float64).reshape(-1, 2)[:, ::-1])
+    points_xy = to_projected(station_lonlat)
+
+    along, offset = project_onto_route(route_xy, points_xy)
+    offset = offset * ground_scale(points_xy[:, 1])
+
+    total_length = np.hypot(*np.diff(route_xy, axis=0).T).sum()
+    if total_length == 0:
+        return np.zeros(len(points_xy)), offset
+
+    return along / total_length * total_miles, offset
+
+
+def ground_scale(y: np.ndarray) -> np.ndarray:
+    """
+    Ground meters per Web Mercator meter at projected northings y,
+    i.e. cos(latitude).
+    """
+    return 1.0 / np.cosh(np.asarray(y, dtype=np.float64) / EARTH_RADIUS_M)
+
+
+def distances_from_route(route_coords, station_lonlat) -> np.ndarray:
+    """
+    Approximate ground distance in meters from each station to the route.
+    route_coords format: [(lat, lon), ...]; station_lonlat: [(lon, lat), ...]
+    """
+
+    _, offset = locate_along_route(route_coords, station_lonlat, 0.0)
+    return offset
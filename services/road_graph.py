@@ -0,0 +1,434 @@
+"""
+Local road graph routing.
+
+`build_road_graph` turns road centerlines into a directed graph in
+compressed sparse row (CSR) form: node coordinates, per-node edge offsets,
+edge targets, lengths and travel times. The arrays are saved as .npy files
+and opened memory-mapped, so workers share one copy through the page
+cache and a load costs no parsing.
+
+Routes are fastest paths found with A*. The lower bound on the remaining
+time is the larger of the straight-line distance at the graph's top speed
+and the ALT bound: travel times to and from a few landmarks, precomputed
+at build time, bound any remaining time through the triangle inequality.
+Request coordinates snap to the nearest node through a uniform grid in
+EPSG:3857, like the station index.
+"""
+
+import asyncio
+import heapq
+import json
+import math
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import polyline
+from django.conf import settings
+
+from services.metrics import stage
+from services.projection_service import ground_scale, to_projected
+from services.routing_service import RoutingError
+
+GRAPH_FORMAT = 1
+GRAPH_ARRAYS = (
+    "lonlat", "indptr", "targets", "lengths", "seconds",
+    "cell_keys", "cell_starts", "order", "from_landmarks", "to_landmarks",
+)
+DEFAULT_LANDMARKS = 8
+
+METERS_PER_MILE = 1609.34
+EARTH_RADIUS_M = 6371008.8
+
+# Speed for roads without a usable maxspeed.
+DEFAULT_SPEED_MPH = 55.0
+CELL_METERS = 5000.0
+# Vertices closer than 10^-COORD_DECIMALS degrees (about 1 cm) are one node.
+COORD_DECIMALS = 7
+
+_CELL_OFFSET = 1 << 20
+
+
+class NoRoute(RoutingError):
+    """
+    The graph does not cover the request, or has no path between its points.
+    """
+
+
+@dataclass(frozen=True, slots=True)
+class RoadGraph:
+    lonlat: np.ndarray
+    indptr: np.ndarray
+    targets: np.ndarray
+    lengths: np.ndarray
+    seconds: np.ndarray
+    cell_keys: np.ndarray
+    cell_starts: np.ndarray
+    order: np.ndarray
+    # Seconds from / to each landmark, (nodes, landmarks); inf if unreachable.
+    from_landmarks: np.ndarray
+    to_landmarks: np.ndarray
+    max_speed: float
+
+    @classmethod
+    def build(cls, lonlat, sources, targets, lengths, seconds, landmarks=DEFAULT_LANDMARKS) -> "RoadGraph":
+        """
+        Graph from node coordinates and directed edges. Parallel edges keep
+        the fastest one.
+        """
+        lonlat = np.asarray(lonlat, dtype=np.float64).reshape(-1, 2)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        lengths = np.asarray(lengths, dtype=np.float64)
+        seconds = np.asarray(seconds, dtype=np.float64)
+
+        keep = sources != targets
+        sources, targets, lengths, seconds = sources[keep], targets[keep], lengths[keep], seconds[keep]
+
+        by_edge = np.lexsort((seconds, targets, sources))
+        sources, targets, lengths, seconds = sources[by_edge], targets[by_edge], lengths[by_edge], seconds[by_edge]
+        first = np.ones(len(sources), dtype=bool)
+        first[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+        sources, targets, lengths, seconds = sources[first], targets[first], lengths[first], seconds[first]
+
+        indptr = np.zeros(len(lonlat) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(lonlat)), out=indptr[1:])
+
+        keys = _cell_keys(np.floor(to_projected(lonlat) / CELL_METERS).astype(np.int64))
+        order = np.argsort(keys, kind="stable")
+        cell_keys, cell_starts = np.unique(keys[order], return_index=True)
+
+        # Reverse edges, for travel times towards the landmarks.
+        by_target = np.argsort(targets, kind="stable")
+        reverse_indptr = np.zeros(len(lonlat) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=len(lonlat)), out=reverse_indptr[1:])
+
+        chosen = _spread_nodes(lonlat, landmarks)
+        from_landmarks = np.empty((len(lonlat), len(chosen)), dtype=np.float32)
+        to_landmarks = np.empty((len(lonlat), len(chosen)), dtype=np.float32)
+        for i, landmark in enumerate(chosen):
+            from_landmarks[:, i] = _travel_times(indptr, targets, seconds, landmark)
+            to_landmarks[:, i] = _travel_times(reverse_indptr, sources[by_target], seconds[by_target], landmark)
+
+        speeds = lengths / np.maximum(seconds, 1e-9)
+        return cls(
+            lonlat=lonlat,
+            indptr=indptr,
+            targets=targets.astype(np.int32),
+            lengths=lengths.astype(np.float32),
+            seconds=seconds.astype(np.float32),
+            cell_keys=cell_keys,
+            cell_starts=np.append(cell_starts, len(order)).astype(np.int64),
+            order=order.astype(np.int32),
+            from_landmarks=from_landmarks,
+            to_landmarks=to_landmarks,
+            max_speed=float(speeds.max()) if len(speeds) else 1.0,
+        )
+
+    @classmethod
+    def load(cls, path) -> "RoadGraph":
+        """
+        Open a saved graph, memory-mapping its arrays.
+        """
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if meta["format"] != GRAPH_FORMAT:
+            raise ValueError(f"Road graph format {meta['format']} is not {GRAPH_FORMAT}; rebuild it.")
+
+        # Plain ndarray views over the maps: np.memmap indexing is several
+        # times slower, and the search indexes per node.
+        arrays = {
+            name: np.load(path / f"{name}.npy", mmap_mode="r").view(np.ndarray)
+            for name in GRAPH_ARRAYS
+        }
+        return cls(**arrays, max_speed=meta["max_speed"])
+
+    def save(self, path):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in GRAPH_ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        (path / "meta.json").write_text(json.dumps({
+            "format": GRAPH_FORMAT,
+            "nodes": self.node_count,
+            "edges": self.edge_count,
+            "landmarks": self.from_landmarks.shape[1],
+            "max_speed": self.max_speed,
+        }), encoding="utf-8")
+
+    @property
+    def node_count(self) -> int:
+        return len(self.lonlat)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def nearest_node(self, lon: float, lat: float, max_meters: float) -> int:
+        """
+        Closest node within max_meters (ground distance) of (lon, lat).
+        """
+        xy = to_projected([lon, lat])[0]
+        # Projected distances are ground distances stretched by 1/scale.
+        reach = max_meters / ground_scale(xy[1])
+        rings = max(1, math.ceil(reach / CELL_METERS))
+
+        cell = np.floor(xy / CELL_METERS).astype(np.int64)
+        candidates = []
+        for dx in range(-rings, rings + 1):
+            low = _cell_keys(np.array([[cell[0] + dx, cell[1] - rings]]))[0]
+            high = _cell_keys(np.array([[cell[0] + dx, cell[1] + rings]]))[0]
+            first, last = np.searchsorted(self.cell_keys, [low, high + 1])
+            if first < last:
+                candidates.append(self.order[self.cell_starts[first]:self.cell_starts[last]])
+
+        if candidates:
+            nodes = np.concatenate(candidates)
+            meters = _haversine_m(self.lonlat[nodes], lon, lat)
+            best = int(np.argmin(meters))
+            if meters[best] <= max_meters:
+                return int(nodes[best])
+
+        raise NoRoute(f"No road within {max_meters:.0f} m of ({lon}, {lat}).")
+
+    def shortest_path(self, source: int, target: int, max_expansions: int | None = None) -> list[int]:
+        """
+        Fastest node path from source to target (A*). Raises NoRoute after
+        settling max_expansions nodes without reaching the target.
+        """
+        indptr, targets, seconds, lonlat = self.indptr, self.targets, self.seconds, self.lonlat
+        from_landmarks, to_landmarks = self.from_landmarks, self.to_landmarks
+        target_lon, target_lat = lonlat[target].tolist()
+        cos_target = math.cos(math.radians(target_lat))
+        seconds_per_meter = 1.0 / self.max_speed
+        landmarks_to_target = from_landmarks[target].tolist()
+        target_to_landmarks = to_landmarks[target].tolist()
+
+        def remaining(node):
+            lon, lat = lonlat[node].tolist()
+            a = (
+                math.sin(math.radians(target_lat - lat) / 2) ** 2
+                + math.cos(math.radians(lat)) * cos_target * math.sin(math.radians(target_lon - lon) / 2) ** 2
+            )
+            bound = 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1.0))) * seconds_per_meter
+
+            # d(L, t) - d(L, v) and d(v, L) - d(t, L) never exceed d(v, t).
+            # Unreachable landmarks give inf - inf = nan, which max skips
+            # as long as it is not first.
+            for landmark_to_target, landmark_to_node in zip(landmarks_to_target, from_landmarks[node].tolist()):
+                bound = max(bound, landmark_to_target - landmark_to_node)
+            for target_to_landmark, node_to_landmark in zip(target_to_landmarks, to_landmarks[node].tolist()):
+                bound = max(bound, node_to_landmark - target_to_landmark)
+            return bound
+
+        best = {source: 0.0}
+        parent = {source: -1}
+        done = set()
+        heap = [(remaining(source), 0.0, source)]
+
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == target:
+                return _unwind(parent, target)
+            if node in done:
+                continue
+            done.add(node)
+            if max_expansions is not None and len(done) > max_expansions:
+                raise NoRoute(f"No route found within {max_expansions} node expansions.")
+
+            first, last = indptr[node:node + 2].tolist()
+            for neighbour, edge_seconds in zip(targets[first:last].tolist(), seconds[first:last].tolist()):
+                candidate = cost + edge_seconds
+                if candidate < best.get(neighbour, math.inf):
+                    best[neighbour] = candidate
+                    parent[neighbour] = node
+                    heapq.heappush(heap, (candidate + remaining(neighbour), candidate, neighbour))
+
+        raise NoRoute("No road connects these points.")
+
+    def path_meters(self, path: list[int]) -> float:
+        """
+        Length of a node path along its edges.
+        """
+        meters = 0.0
+        for node, following in zip(path, path[1:]):
+            first, last = self.indptr[node:node + 2].tolist()
+            edges = np.flatnonzero(self.targets[first:last] == following)
+            meters += float(self.lengths[first + edges[0]])
+        return meters
+
+    def route(self, coordinates, max_snap_meters: float, max_expansions: int | None = None) -> dict:
+        """
+        Route through [lon, lat] coordinates, in the get_route shape.
+        max_expansions bounds the search of each leg.
+        """
+        nodes = [self.nearest_node(lon, lat, max_snap_meters) for lon, lat in coordinates]
+
+        path = [nodes[0]]
+        leg_miles = []
+        for source, target in zip(nodes, nodes[1:]):
+            leg = self.shortest_path(source, target, max_expansions)
+            leg_miles.append(self.path_meters(leg) / METERS_PER_MILE)
+            path.extend(leg[1:])
+
+        return {
+            "distance_miles": sum(leg_miles),
+            "leg_miles": leg_miles,
+            "geometry": polyline.encode([(lat, lon) for lon, lat in self.lonlat[path].tolist()]),
+        }
+
+
+def graph_from_lines(lines, landmarks=DEFAULT_LANDMARKS) -> RoadGraph:
+    """
+    Graph from road centerlines: (coordinates, oneway, speed_mph) per line,
+    coordinates as [lon, lat] pairs. oneway is 0 (both directions), 1
+    (digitized direction only) or -1 (reverse only); speed_mph may be None.
+    Lines sharing a vertex are connected there.
+    """
+    vertices = []
+    line_ids = []
+    line_oneway = []
+    line_speed = []
+
+    for i, (coordinates, oneway, speed_mph) in enumerate(lines):
+        vertices.append(np.asarray(coordinates, dtype=np.float64).reshape(-1, 2))
+        line_ids.append(np.full(len(vertices[-1]), i))
+        line_oneway.append(oneway)
+        line_speed.append(speed_mph or DEFAULT_SPEED_MPH)
+
+    if not vertices:
+        raise ValueError("No road lines to build a graph from.")
+
+    vertices = np.concatenate(vertices)
+    line_ids = np.concatenate(line_ids)
+    lonlat, node_ids = np.unique(vertices.round(COORD_DECIMALS), axis=0, return_inverse=True)
+    node_ids = node_ids.ravel()
+
+    # Consecutive vertices of the same line form an edge.
+    same_line = line_ids[1:] == line_ids[:-1]
+    sources = node_ids[:-1][same_line]
+    targets = node_ids[1:][same_line]
+    edge_lines = line_ids[:-1][same_line]
+
+    lengths = _haversine_pairs(lonlat[sources], lonlat[targets])
+    seconds = lengths / (np.asarray(line_speed)[edge_lines] * METERS_PER_MILE / 3600)
+    oneway = np.asarray(line_oneway)[edge_lines]
+
+    forward = oneway >= 0
+    backward = oneway <= 0
+    return RoadGraph.build(
+        lonlat,
+        np.concatenate((sources[forward], targets[backward])),
+        np.concatenate((targets[forward], sources[backward])),
+        np.concatenate((lengths[forward], lengths[backward])),
+        np.concatenate((seconds[forward], seconds[backward])),
+        landmarks=landmarks,
+    )
+
+
+class LocalGraphBackend:
+    """
+    Routing backend answering from the road graph at settings.ROAD_GRAPH_PATH,
+    opened on first use. A missing graph, coordinates it cannot route, or a
+    search over settings.ROAD_GRAPH_MAX_EXPANSIONS nodes raise RoutingError
+    so the next backend is tried.
+    """
+    name = "local"
+
+    def __init__(self, path=None):
+        self._path = path
+        self._graph = None
+        self._lock = threading.Lock()
+
+    def graph(self) -> RoadGraph:
+        if self._graph is None:
+            with self._lock:
+                if self._graph is None:
+                    path = Path(self._path or settings.ROAD_GRAPH_PATH)
+                    if not (path / "meta.json").exists():
+                        raise NoRoute(f"No road graph at {path}; run build_road_graph.")
+                    self._graph = RoadGraph.load(path)
+        return self._graph
+
+    def route(self, coordinates) -> dict:
+        with stage("local_route"):
+            return self.graph().route(
+                coordinates,
+                settings.ROAD_GRAPH_MAX_SNAP_METERS,
+                settings.ROAD_GRAPH_MAX_EXPANSIONS,
+            )
+
+    async def aroute(self, coordinates) -> dict:
+        # The search is pure-Python CPU work; run it on a thread so it
+        # never blocks the event loop.
+        return await asyncio.to_thread(self.route, coordinates)
+
+
+def _unwind(parent: dict, node: int) -> list[int]:
+    path = []
+    while node != -1:
+        path.append(node)
+        node = parent[node]
+    return path[::-1]
+
+
+def _spread_nodes(lonlat: np.ndarray, count: int) -> list[int]:
+    """
+    `count` nodes spread over the graph's extent: each is the node farthest
+    from those already chosen, starting from the one farthest from the
+    centroid. Landmarks on the periphery give the tightest bounds.
+    """
+    if count <= 0 or not len(lonlat):
+        return []
+
+    distances = _haversine_m(lonlat, *lonlat.mean(axis=0))
+    chosen = []
+    for _ in range(min(count, len(lonlat))):
+        node = int(np.argmax(distances))
+        chosen.append(node)
+        distances = np.minimum(distances, _haversine_m(lonlat, *lonlat[node]))
+        distances[chosen] = -1.0
+    return chosen
+
+
+def _travel_times(indptr, targets, seconds, source: int) -> np.ndarray:
+    """
+    Seconds from source to every node over CSR edges (Dijkstra), inf where
+    unreachable.
+    """
+    indptr, targets, seconds = indptr.tolist(), targets.tolist(), seconds.tolist()
+    times = [math.inf] * (len(indptr) - 1)
+    times[source] = 0.0
+    heap = [(0.0, source)]
+
+    while heap:
+        time, node = heapq.heappop(heap)
+        if time > times[node]:
+            continue
+        for edge in range(indptr[node], indptr[node + 1]):
+            candidate = time + seconds[edge]
+            neighbour = targets[edge]
+            if candidate < times[neighbour]:
+                times[neighbour] = candidate
+                heapq.heappush(heap, (candidate, neighbour))
+
+    return np.array(times)
+
+
+def _cell_keys(cells: np.ndarray) -> np.ndarray:
+    return (cells[:, 0] + _CELL_OFFSET) * (2 * _CELL_OFFSET) + (cells[:, 1] + _CELL_OFFSET)
+
+
+def _haversine_m(lonlat: np.ndarray, lon: float, lat: float) -> np.ndarray:
+    return _haversine_pairs(lonlat, np.array([[lon, lat]]))
+
+
+def _haversine_pairs(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    lon_a, lat_a = np.radians(a[:, 0]), np.radians(a[:, 1])
+    lon_b, lat_b = np.radians(b[:, 0]), np.radians(b[:, 1])
+    h = (
+        np.sin((lat_b - lat_a) / 2) ** 2
+        + np.cos(lat_a) * np.cos(lat_b) * np.sin((lon_b - lon_a) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
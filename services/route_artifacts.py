@@ -0,0 +1,80 @@
+"""
+Cache of per-route geometry work.
+
+For a given route and station data version, the stations along it (with
+mile markers and detours) never change, so a repeat lane can skip
+decoding, buffering and projection entirely and only needs fresh prices.
+"""
+
+import io
+from dataclasses import dataclass
+
+import numpy as np
+from django.conf import settings
+
+from services.route_cache import LocalLRU, RouteCache
+
+
+@dataclass(slots=True)
+class RouteArtifacts:
+    """
+    station_ids / mile_markers / detour_miles: corridor stations ordered by
+    mile marker, with their one-way distance from the route.
+    """
+    station_ids: np.ndarray
+    mile_markers: np.ndarray
+    detour_miles: np.ndarray
+
+
+def _dumps(artifacts: RouteArtifacts) -> bytes:
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        station_ids=artifacts.station_ids,
+        mile_markers=artifacts.mile_markers,
+        detour_miles=artifacts.detour_miles,
+    )
+    return buffer.getvalue()
+
+
+def _loads(raw: bytes) -> RouteArtifacts:
+    with np.load(io.BytesIO(raw)) as arrays:
+        return RouteArtifacts(
+            station_ids=arrays["station_ids"],
+            mile_markers=arrays["mile_markers"],
+            detour_miles=arrays["detour_miles"],
+        )
+
+
+artifact_cache = RouteCache(
+    LocalLRU(
+        max_entries=settings.ROUTE_CACHE_LOCAL_MAX_ENTRIES,
+        ttl=settings.ROUTE_CACHE_LOCAL_TTL,
+    ),
+    codec=settings.ROUTE_CACHE_COMPRESSION,
+    dumps=_dumps,
+    loads=_loads,
+    name="artifacts",
+)
+
+
+# Bumped whenever RouteArtifacts gains or changes a field, so entries
+# written by older code are never read back.
+ARTIFACT_FORMAT = 4
+
+
+def artifact_key(route_key: str, version: int) -> str:
+    return f"artifacts:v{ARTIFACT_FORMAT}:{version}:{route_key}"
+
+
+def get_route_artifacts(route_key: str, version: int) -> RouteArtifacts | None:
+    return artifact_cache.get(artifact_key(route_key, version))
+
+
+def store_route_artifacts(route_key: str, version: int, artifacts: RouteArtifacts):
+    """
+    Store artifacts under the station data version they were computed
+    against, read before the corridor lookup so a concurrent reload can
+    only make them unreachable, never stale.
+    """
+    artifact_cache.set(artifact_key(route_key, version), artifacts)
@@ -0,0 +1,191 @@
+"""
+Two-tier route cache: a bounded in-process LRU in front of Redis.
+
+Payloads are JSON-encoded and compressed before they go to Redis, so hot
+lanes are served from process memory and cold ones cost one small GET.
+"""
+
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+from services.metrics import CACHE_LOOKUPS
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # optional dependency
+    lz4_frame = None
+
+# One-byte codec tag prefixed to every Redis payload.
+_CODECS = {
+    "none": (b"j", lambda raw: raw, lambda raw: raw),
+    "zlib": (b"z", lambda raw: zlib.compress(raw, 6), zlib.decompress),
+}
+if lz4_frame is not None:
+    _CODECS["lz4"] = (b"4", lz4_frame.compress, lz4_frame.decompress)
+
+_DECODERS = {tag: decode for tag, _, decode in _CODECS.values()}
+
+
+def _json_dumps(value) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def encode_payload(value, codec: str = "zlib", dumps=_json_dumps) -> bytes:
+    tag, encode, _ = _CODECS[codec]
+    return tag + encode(dumps(value))
+
+
+def decode_payload(payload, loads=json.loads):
+    # Entries written before compression was introduced are plain dicts.
+    if not isinstance(payload, bytes):
+        return payload
+
+    return loads(_DECODERS[payload[:1]](payload[1:]))
+
+
+class LocalLRU:
+    """
+    Thread-safe LRU with a per-entry TTL.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class RouteCache:
+    """
+    Local LRU tier in front of a Django cache (Redis) tier.
+    Values are JSON by default; pass dumps/loads for other payloads.
+    """
+
+    def __init__(
+        self,
+        local: LocalLRU,
+        remote=cache,
+        codec: str = "zlib",
+        timeout: int = 86400,
+        dumps=_json_dumps,
+        loads=json.loads,
+        name: str = "route",
+    ):
+        if codec not in _CODECS:
+            raise ImproperlyConfigured(f"Unsupported route cache compression: {codec!r}")
+
+        self.local = local
+        self.remote = remote
+        self.codec = codec
+        self.timeout = timeout
+        self.dumps = dumps
+        self.loads = loads
+        self.name = name
+        self.remote_hits = 0
+        self.remote_misses = 0
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            CACHE_LOOKUPS.inc(cache=self.name, result="local_hit")
+            return value
+
+        return self._from_remote(key, self.remote.get(key))
+
+    async def aget(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            CACHE_LOOKUPS.inc(cache=self.name, result="local_hit")
+            return value
+
+        return self._from_remote(key, await self.remote.aget(key))
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        self.remote.set(key, encode_payload(value, self.codec, self.dumps), timeout=self.timeout)
+
+    async def aset(self, key, value):
+        self.local.set(key, value)
+        await self.remote.aset(key, encode_payload(value, self.codec, self.dumps), timeout=self.timeout)
+
+    def stats(self) -> dict:
+        return {
+            "local": self.local.stats(),
+            "redis": {"hits": self.remote_hits, "misses": self.remote_misses},
+        }
+
+    def _from_remote(self, key, payload):
+        if payload is None:
+            self.remote_misses += 1
+            CACHE_LOOKUPS.inc(cache=self.name, result="miss")
+            return None
+
+        self.remote_hits += 1
+        CACHE_LOOKUPS.inc(cache=self.name, result="redis_hit")
+        value = decode_payload(payload, self.loads)
+        self.local.set(key, value)
+        return value
+
+
+route_cache = RouteCache(
+    LocalLRU(
+        max_entries=settings.ROUTE_CACHE_LOCAL_MAX_ENTRIES,
+        ttl=settings.ROUTE_CACHE_LOCAL_TTL,
+    ),
+    codec=settings.ROUTE_CACHE_COMPRESSION,
+    timeout=settings.ROUTE_CACHE_HARD_TTL,
+)
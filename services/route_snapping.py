@@ -0,0 +1,222 @@
+"""
+Route cache keys that tolerate nearby coordinates, and endpoint correction.
+
+Cache keys round every coordinate to settings.ROUTE_KEY_PRECISION decimal
+places, so requests from the same yard share one cached route even when
+their coordinates differ in the last digits. A shared route starts and
+ends where its first requester's road snap did, so each caller's copy is
+corrected: its ends are re-projected onto the route and joined to the
+caller's exact start and finish, and the distances are adjusted to match.
+
+Decoding and re-encoding a long polyline costs far more than the rest of a
+cache hit, so when a route is fetched the vertices within
+ENDPOINT_WINDOW_METERS of each end are decoded once and stored with it,
+along with where they sit in the encoded string. Correction rewrites only those windows and splices
+the untouched middle of the string back in.
+"""
+
+import hashlib
+import math
+
+import numpy as np
+import polyline
+from django.conf import settings
+
+METERS_PER_MILE = 1609.34
+EARTH_RADIUS_M = 6371008.8
+
+# Stretch at each end of a route the exact endpoints may project onto,
+# well beyond a key grid cell, with a cap on its vertices.
+ENDPOINT_WINDOW_METERS = 2000.0
+MAX_WINDOW_POINTS = 256
+# Keys at this precision are as exact as the 5-decimal polyline geometry.
+EXACT_PRECISION = 6
+# Corrections shorter than this leave the route as is.
+MIN_CORRECTION_METERS = 0.5
+
+
+def snapped_route_key(coordinates, precision: int | None = None) -> str:
+    """
+    Cache key for a route through [lon, lat] coordinates, rounded to
+    `precision` decimal places (settings.ROUTE_KEY_PRECISION by default).
+    """
+    if precision is None:
+        precision = settings.ROUTE_KEY_PRECISION
+    raw_key = ":".join(f"{lon:.{precision}f}:{lat:.{precision}f}" for lon, lat in coordinates)
+    return f"route:{hashlib.md5(raw_key.encode()).hexdigest()}"
+
+
+def with_endpoints(route: dict) -> dict:
+    """
+    The route with its decoded end windows attached, ready to cache.
+    """
+    points, offsets = _decode_with_offsets(route["geometry"])
+    n = len(points)
+    head = points[:MAX_WINDOW_POINTS].tolist()
+    tail = points[::-1][:MAX_WINDOW_POINTS].tolist()
+    head_size, tail_size = _window(head), _window(tail)
+
+    return {
+        **route,
+        "endpoints": {
+            "head": head[:head_size],
+            "head_chars": int(offsets[head_size]),
+            "tail": tail[:tail_size][::-1],
+            "tail_chars": int(offsets[-1] - offsets[n - tail_size + 1]) if tail_size else 0,
+            "points": n,
+        },
+    }
+
+
+def correct_endpoints(route: dict, start, finish) -> dict:
+    """
+    Copy of a cached route that starts at `start` and ends at `finish`
+    ([lon, lat]), with distance_miles and the first and last leg_miles
+    adjusted. Routes cached without end windows are returned unchanged.
+    """
+    ends = route.get("endpoints")
+    if ends is None:
+        return route
+
+    corrected = {key: value for key, value in route.items() if key != "endpoints"}
+    geometry = route["geometry"]
+
+    if ends["points"] < 2:
+        return corrected
+
+    if len(ends["head"]) + len(ends["tail"]) >= ends["points"]:
+        # Short route: the windows meet, so re-encode it whole.
+        points = polyline.decode(geometry)
+        points, start_meters = _attach(points, start)
+        points, finish_meters = _attach(points[::-1], finish)
+        corrected["geometry"] = polyline.encode(points[::-1])
+    else:
+        head, start_meters = _attach(ends["head"], start)
+        tail, finish_meters = _attach(ends["tail"][::-1], finish)
+        tail = tail[::-1]
+
+        # The middle of the string encodes deltas from head[-1] up to
+        # tail[0]; both windows keep those vertices, so it is reused as is.
+        middle = geometry[ends["head_chars"]:len(geometry) - ends["tail_chars"]]
+        corrected["geometry"] = polyline.encode(head) + middle + _encode_after(tail[0], tail[1:])
+
+    start_miles = start_meters / METERS_PER_MILE
+    finish_miles = finish_meters / METERS_PER_MILE
+    corrected["distance_miles"] = route["distance_miles"] + start_miles + finish_miles
+
+    legs = list(route.get("leg_miles") or [])
+    if legs:
+        legs[0] += start_miles
+        legs[-1] += finish_miles
+        corrected["leg_miles"] = legs
+
+    return corrected
+
+
+def _window(points: list) -> int:
+    """
+    Number of leading points spanning ENDPOINT_WINDOW_METERS (at least two,
+    at most MAX_WINDOW_POINTS).
+    """
+    meters = 0.0
+    for i in range(1, min(len(points), MAX_WINDOW_POINTS)):
+        meters += _haversine(points[i - 1], points[i])
+        if meters >= ENDPOINT_WINDOW_METERS:
+            return i + 1
+    return min(len(points), MAX_WINDOW_POINTS)
+
+
+def _attach(points: list, lonlat) -> tuple[list, float]:
+    """
+    Re-start (lat, lon) points at lonlat: drop the stretch before the
+    point's projection onto them and join it with a straight segment.
+    Returns the new points and the change in length in meters.
+    """
+    lat, lon = lonlat[1], lonlat[0]
+    segment, fraction, meters_to_route = _project(points, lat, lon)
+
+    projected = _interpolate(points[segment], points[segment + 1], fraction)
+    dropped = sum(
+        _haversine(points[i], points[i + 1]) for i in range(segment)
+    ) + _haversine(points[segment], projected)
+
+    if meters_to_route < MIN_CORRECTION_METERS and dropped < MIN_CORRECTION_METERS:
+        return list(points), 0.0
+
+    # The last point is always kept: the spliced middle is encoded
+    # relative to it.
+    rest = list(points[segment + 1:])
+    joined = [(lat, lon)]
+    if (
+        _haversine(projected, rest[0]) >= MIN_CORRECTION_METERS
+        and _haversine(projected, (lat, lon)) >= MIN_CORRECTION_METERS
+    ):
+        joined.append(projected)
+
+    return joined + rest, meters_to_route - dropped
+
+
+def _project(points: list, lat: float, lon: float) -> tuple[int, float, float]:
+    """
+    (segment index, fraction along it, meters) of the point on the
+    polyline closest to (lat, lon), in a local equirectangular frame.
+    """
+    latlon = np.asarray(points, dtype=np.float64)
+    scale = math.cos(math.radians(lat))
+    xy = np.column_stack(((latlon[:, 1] - lon) * scale, latlon[:, 0] - lat))
+
+    starts, deltas = xy[:-1], xy[1:] - xy[:-1]
+    length_sq = (deltas ** 2).sum(axis=1)
+    fraction = np.clip(-(starts * deltas).sum(axis=1) / np.where(length_sq > 0, length_sq, 1), 0, 1)
+    nearest = starts + deltas * fraction[:, None]
+    distance_sq = (nearest ** 2).sum(axis=1)
+
+    segment = int(np.argmin(distance_sq))
+    meters = math.radians(math.sqrt(distance_sq[segment])) * EARTH_RADIUS_M
+    return segment, float(fraction[segment]), meters
+
+
+def _interpolate(a, b, fraction: float) -> tuple[float, float]:
+    return (
+        round(a[0] + (b[0] - a[0]) * fraction, 5),
+        round(a[1] + (b[1] - a[1]) * fraction, 5),
+    )
+
+
+def _haversine(a, b) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(h, 1.0)))
+
+
+def _encode_after(previous, points: list) -> str:
+    """
+    Polyline deltas for points following `previous`, without `previous`.
+    """
+    return polyline.encode([previous, *points])[len(polyline.encode([previous])):]
+
+
+def _decode_with_offsets(geometry: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Decoded (n, 2) (lat, lon) points, and the string offset where each
+    point's encoding starts (plus the string length at the end).
+    Vectorized, as it runs over whole routes.
+    """
+    chunks = np.frombuffer(geometry.encode(), dtype=np.uint8).astype(np.int64) - 63
+    if not len(chunks):
+        return np.empty((0, 2)), np.zeros(1, dtype=np.int64)
+
+    # Each value is a run of 5-bit chunks, least significant first; all
+    # but its last chunk have the 0x20 continuation bit set.
+    last = chunks < 0x20
+    value_ends = np.flatnonzero(last)
+    value_starts = np.concatenate(([0], value_ends[:-1] + 1))
+    value_of = np.repeat(np.arange(len(value_ends)), value_ends - value_starts + 1)
+    shifts = 5 * (np.arange(len(chunks)) - value_starts[value_of])
+
+    # Values fit in 32 bits, so float64 sums are exact.
+    raw = np.bincount(value_of, weights=(chunks & 0x1F) << shifts).astype(np.int64)
+    values = np.where(raw & 1, ~(raw >> 1), raw >> 1)
+
+    latlon = np.cumsum(values.reshape(-1, 2), axis=0) / 1e5
+    return latlon, np.append(value_starts[::2], len(chunks))
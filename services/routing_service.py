@@ -1,52 +1,375 @@
+"""
+Route fetching: caching, single-flight and the routing backend chain.
+
+On a cache miss the backends named in settings.ROUTING_BACKENDS are tried
+in order: "local" routes over the in-process road graph
+(services.road_graph), "ors" calls OpenRouteService. A backend that
+cannot answer raises RoutingError (or an httpx error) and the next one is
+tried; the last backend's error propagates.
+
+Cached routes past ROUTE_CACHE_SOFT_TTL are served as they are while a
+background worker refetches them, so expiries never stall a request. ORS
+calls go through a circuit breaker: while ORS keeps failing, calls fail
+fast with CircuitOpen and the next backend, or a stale cached route, is
+used instead.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+
 import httpx
-import hashlib
 from django.conf import settings
-from django.core.cache import cache
 
-ORS_URL = "https://api.openrouteservice.org/v2/directions/driving-car"
+from services.circuit_breaker import CircuitBreaker, CircuitOpen
+from services.metrics import ROUTE_REFRESHES, ROUTING_REQUESTS, STALE_ROUTES, stage
+from services.route_cache import route_cache
+from services.route_snapping import correct_endpoints, snapped_route_key, with_endpoints
+
+ORS_TIMEOUT = 10
+
+logger = logging.getLogger(__name__)
+
+ors_breaker = CircuitBreaker(
+    "ors",
+    failure_threshold=settings.ORS_BREAKER_FAILURES,
+    reset_timeout=settings.ORS_BREAKER_RESET_SECONDS,
+)
+
+_client = None
+_client_lock = threading.Lock()
+# Event loop -> (AsyncClient, the async generator that closes it).
+_async_clients = weakref.WeakKeyDictionary()
+
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+# Event loop -> {cache_key: Task}; a task can only be awaited on its own loop.
+_async_inflight = weakref.WeakKeyDictionary()
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+_refresh_executor = None
+_refreshing: set[str] = set()
+_refreshing_lock = threading.Lock()
+
+
+class RoutingError(Exception):
+    """
+    A routing backend could not route the requested coordinates.
+    """
+
+
+class ORSBackend:
+    """
+    OpenRouteService directions over the shared keep-alive clients.
+    """
+    name = "ors"
+
+    def route(self, coordinates) -> dict:
+        with ors_breaker.guard(is_failure=_upstream_failure):
+            with stage("ors"):
+                response = get_http_client().post(
+                    settings.ORS_URL,
+                    json={"coordinates": coordinates},
+                    headers=_headers(),
+                )
+            return _parse(response)
+
+    async def aroute(self, coordinates) -> dict:
+        with ors_breaker.guard(is_failure=_upstream_failure):
+            with stage("ors"):
+                response = await get_async_http_client().post(
+                    settings.ORS_URL,
+                    json={"coordinates": coordinates},
+                    headers=_headers(),
+                )
+            return _parse(response)
+
+
+def get_backends() -> list:
+    """
+    The configured backends, in the order they are tried.
+    """
+    backends = []
+    for name in settings.ROUTING_BACKENDS:
+        backend = _backends.get(name)
+        if backend is None:
+            with _backends_lock:
+                backend = _backends.get(name) or _backends.setdefault(name, _make_backend(name))
+        backends.append(backend)
+    return backends
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Shared keep-alive client for ORS calls from sync code.
+    """
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(timeout=ORS_TIMEOUT, limits=_pool_limits())
+    return _client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Keep-alive client for ORS calls from the running event loop, one per
+    loop. Each is closed on its own loop when that loop shuts down.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+
+    if entry is None:
+        with _client_lock:
+            entry = _async_clients.get(loop)
+            if entry is None:
+                client = httpx.AsyncClient(timeout=ORS_TIMEOUT, limits=_pool_limits())
+                closer = _close_with_loop(loop, client)
+                # Started once, the generator is finalized by the loop's
+                # shutdown_asyncgens(), which asyncio.run and asgiref's
+                # async_to_sync call before closing it. A client cannot be
+                # closed once its loop is.
+                loop.create_task(anext(closer))
+                entry = _async_clients[loop] = (client, closer)
+
+    return entry[0]
+
+
+async def _close_with_loop(loop, client: httpx.AsyncClient):
+    try:
+        yield
+    finally:
+        _async_clients.pop(loop, None)
+        await client.aclose()
+
+
+def route_cache_key(start_coords, finish_coords, waypoints=(), precision=None) -> str:
+    """
+    Route cache key with coordinates snapped to `precision` decimal places
+    (settings.ROUTE_KEY_PRECISION by default).
+    """
+    return snapped_route_key(_coordinates(start_coords, finish_coords, waypoints), precision)
+
+
+def get_route(start_coords, finish_coords, waypoints=()):
+    """
+    Fetch a route from the routing backends with two-tier (local + Redis) caching.
+    Waypoints ([lon, lat] each) are visited in order within the same route.
+    Nearby coordinates share a cache entry and concurrent misses for it
+    share one upstream call; every caller's route is then corrected to
+    start and finish at its own coordinates. Stale routes are returned
+    at once and refreshed in the background.
+    """
+
+    coordinates = _coordinates(start_coords, finish_coords, waypoints)
+    cache_key = route_cache_key(start_coords, finish_coords, waypoints)
 
+    with stage("route_cache"):
+        route = route_cache.get(cache_key)
 
-def get_route(start_coords, finish_coords):
+    if not route:
+        route = _single_flight(cache_key, lambda: _fetch_and_cache(cache_key, coordinates))
+    elif _is_stale(route):
+        _refresh_in_background(cache_key, coordinates)
+
+    with stage("correct"):
+        return correct_endpoints(route, start_coords, finish_coords)
+
+
+async def aget_route(start_coords, finish_coords, waypoints=()):
+    """
+    Async get_route for ASGI views.
+    """
+
+    coordinates = _coordinates(start_coords, finish_coords, waypoints)
+    cache_key = route_cache_key(start_coords, finish_coords, waypoints)
+
+    with stage("route_cache"):
+        route = await route_cache.aget(cache_key)
+
+    if not route:
+        async def fetch():
+            result = _cacheable(await _aroute(coordinates))
+            await route_cache.aset(cache_key, result)
+            return result
+
+        inflight = _async_inflight.setdefault(asyncio.get_running_loop(), {})
+        task = inflight.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            inflight[cache_key] = task
+            task.add_done_callback(lambda _: inflight.pop(cache_key, None))
+
+        route = await asyncio.shield(task)
+    elif _is_stale(route):
+        _refresh_in_background(cache_key, coordinates)
+
+    with stage("correct"):
+        return correct_endpoints(route, start_coords, finish_coords)
+
+
+def _cacheable(route: dict) -> dict:
+    return {**with_endpoints(route), "fetched_at": time.time()}
+
+
+def _fetch_and_cache(cache_key: str, coordinates) -> dict:
+    result = _cacheable(_route(coordinates))
+    route_cache.set(cache_key, result)
+    return result
+
+
+def _is_stale(route: dict) -> bool:
+    # Entries cached before fetched_at was recorded count as stale.
+    return time.time() - route.get("fetched_at", 0) > settings.ROUTE_CACHE_SOFT_TTL
+
+
+def _refresh_in_background(cache_key: str, coordinates):
     """
-    Fetch route from OpenRouteService with Redis caching.
+    Refetch a stale route on the refresh pool, at most once per key at a
+    time. Failures keep the stale entry until its hard TTL.
     """
+    global _refresh_executor
+
+    STALE_ROUTES.inc()
+    with _refreshing_lock:
+        if cache_key in _refreshing:
+            return
+        _refreshing.add(cache_key)
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(
+                max_workers=settings.ROUTE_REFRESH_WORKERS, thread_name_prefix="route-refresh"
+            )
+
+    def refresh():
+        try:
+            _single_flight(cache_key, lambda: _fetch_and_cache(cache_key, coordinates))
+        except Exception as e:
+            ROUTE_REFRESHES.inc(result="error")
+            logger.warning("Refreshing stale route %s failed: %s", cache_key, e)
+        else:
+            ROUTE_REFRESHES.inc(result="ok")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(cache_key)
+
+    _refresh_executor.submit(refresh)
+
+
+def _route(coordinates) -> dict:
+    backends = get_backends()
+    for i, backend in enumerate(backends):
+        try:
+            result = backend.route(coordinates)
+        except (RoutingError, CircuitOpen, httpx.HTTPError):
+            ROUTING_REQUESTS.inc(backend=backend.name, result="error")
+            if i == len(backends) - 1:
+                raise
+        else:
+            ROUTING_REQUESTS.inc(backend=backend.name, result="ok")
+            return result
 
-    raw_key = f"{start_coords[0]}:{start_coords[1]}:{finish_coords[0]}:{finish_coords[1]}"
-    cache_key = f"route:{hashlib.md5(raw_key.encode()).hexdigest()}"
 
-    cached = cache.get(cache_key)
-    if cached:
-        return cached
+async def _aroute(coordinates) -> dict:
+    backends = get_backends()
+    for i, backend in enumerate(backends):
+        try:
+            result = await backend.aroute(coordinates)
+        except (RoutingError, CircuitOpen, httpx.HTTPError):
+            ROUTING_REQUESTS.inc(backend=backend.name, result="error")
+            if i == len(backends) - 1:
+                raise
+        else:
+            ROUTING_REQUESTS.inc(backend=backend.name, result="ok")
+            return result
 
-    headers = {
+
+def _make_backend(name: str):
+    if name == "ors":
+        return ORSBackend()
+    if name == "local":
+        from services.road_graph import LocalGraphBackend
+        return LocalGraphBackend()
+    raise ValueError(f"Unknown routing backend {name!r}.")
+
+
+def _single_flight(key, fetch):
+    """
+    Run fetch() once per key at a time; concurrent callers wait for and
+    share the leader's result (or exception).
+    """
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+
+    if not leader:
+        return future.result()
+
+    try:
+        result = fetch()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _upstream_failure(error: Exception) -> bool:
+    """
+    Whether an ORS error says ORS is unhealthy, rather than that the
+    request could not be routed (other 4xx).
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return True
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.ORS_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.ORS_MAX_CONNECTIONS,
+    )
+
+
+def _headers():
+    return {
         "Authorization": settings.ORS_API_KEY,
         "Content-Type": "application/json"
     }
 
-    body = {
-        "coordinates": [
-            start_coords,
-            finish_coords
-        ]
-    }
 
-    response = httpx.post(
-        ORS_URL,
-        json=body,
-        headers=headers,
-        timeout=10
-    )
+def _coordinates(start_coords, finish_coords, waypoints=()):
+    return [start_coords, *waypoints, finish_coords]
 
-    response.raise_for_status()
-    data = response.json()
 
-    route = data["routes"][0]
 
-    result = {
-        "distance_miles": route["summary"]["distance"] * 0.000621371,
-        "geometry": route["geometry"]
-    }
+def _parse(response):
+    response.raise_for_status()
+
+    try:
+        route = response.json()["routes"][0]
 
-    cache.set(cache_key, result, timeout=86400)
+        return {
+            "distance_miles": route["summary"]["distance"] * 0.000621371,
+            "leg_miles": [
+                segment.get("distance", 0) * 0.000621371
+                for segment in route.get("segments", [])
+            ],
+            "geometry": route["geometry"]
+        }
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        raise RoutingError(f"Unexpected ORS response: {e!r}") from e
 
-    return result
\ No newline at end of file
@@ -1,14 +1,96 @@
 """
 Spatial operations for route processing.
 All spatial math is performed in projected CRS (EPSG:3857).
+
+The corridor is 20 ground miles wide. EPSG:3857 stretches distances by
+1/cos(latitude), so planar buffers are widened for the route's highest
+latitude (planar_corridor_meters) and stations are then cut at their
+ground distance from the route.
+
+The corridor test has two modes (settings.CORRIDOR_MODE):
+
+- "buffer": intersect stations with the full-resolution route buffered by
+  the widened planar width in EPSG:3857, against the projected location
+  index.
+- "dwithin": simplify the projected route, cut it into pieces and OR one
+  ST_DWithin per piece on the geography column. Each piece has a small
+  bounding box, so the GiST index does the pruning and no corridor
+  polygon is ever built.
 """
 
-from django.contrib.gis.geos import LineString
-from django.db.models import QuerySet
+import operator
+from functools import reduce
+from math import atan, ceil, cos, degrees, hypot, radians, sinh
+
+from django.conf import settings
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.db.models.functions import GeoFunc, Transform
+from django.contrib.gis.db.models.lookups import IntersectsLookup
+from django.contrib.gis.geos import GeometryCollection, LineString, Polygon
+from django.contrib.gis.measure import D
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import FloatField, Func, Q, QuerySet
+from django.db.models.functions import Cast, Cos, Radians
 from optimizer.models import FuelStation
 
 ROUTE_CRS = 4326
 PROJECTED_CRS = 3857  # meters
+CORRIDOR_MILES = 20
+CORRIDOR_METERS = CORRIDOR_MILES * 1609.34
+CORRIDOR_MODES = ("buffer", "dwithin")
+
+# EPSG:3857 sphere radius, and ground meters per degree of latitude.
+MERCATOR_RADIUS_M = 6378137.0
+METERS_PER_DEGREE = 111_320.0
+# Planar corridors stop widening beyond this latitude.
+MAX_CORRIDOR_LATITUDE = 80.0
+
+# Douglas-Peucker tolerance for the dwithin mode; far below the corridor
+# width, so the corridor edge moves by at most this much.
+CORRIDOR_SIMPLIFY_METERS = 500
+# Projected length of each simplified route piece given its own ST_DWithin.
+CORRIDOR_PIECE_METERS = 200_000
+
+
+class LineLocatePoint(GeoFunc):
+    """
+    ST_LineLocatePoint: fractional position (0..1) of a point along a line.
+    """
+    output_field = FloatField()
+    arity = 2
+    geom_param_pos = (0, 1)
+
+
+class PlanarDistance(GeoFunc):
+    """
+    ST_Distance between two geometries, in the units of their SRID.
+    """
+    function = "ST_Distance"
+    output_field = FloatField()
+    arity = 2
+    geom_param_pos = (0, 1)
+
+
+class PointX(Func):
+    function = "ST_X"
+    output_field = FloatField()
+
+
+class PointY(Func):
+    function = "ST_Y"
+    output_field = FloatField()
+
+
+def projected_location():
+    """
+    FuelStation.location as an EPSG:3857 geometry expression.
+    Backed by the fuelstation_location_3857_gist expression index, so it
+    must stay identical to the expression declared there.
+    """
+    return Transform(
+        Cast("location", GeometryField(srid=ROUTE_CRS)),
+        PROJECTED_CRS,
+    )
 
 
 def build_route_line(coords: list[tuple[float, float]]) -> LineString:
@@ -22,19 +104,245 @@ def build_route_line(coords: list[tuple[float, float]]) -> LineString:
     )
 
 
-def get_stations_along_route(route_line: LineString) -> QuerySet:
+def build_corridor(route_line: LineString) -> Polygon:
     """
-    Returns fuel stations within 20 mile corridor around route.
+    The 20 mile corridor polygon around a route, in WGS84.
     Uses projected CRS for accurate buffering.
     """
+    return _corridor(route_line.transform(PROJECTED_CRS, clone=True))
 
-    projected_route = route_line.transform(PROJECTED_CRS, clone=True)
 
-    corridor = projected_route.buffer(20 * 1609.34)  # 20 miles in meters
-    corridor.transform(ROUTE_CRS)
+def corridor_filter(
+    route_line: LineString,
+    corridor: Polygon | None = None,
+    mode: str | None = None,
+) -> Q:
+    """
+    FuelStation filter for the 20 mile corridor around a route, using
+    mode or else the configured corridor mode. A prebuilt corridor polygon
+    is only used by the "buffer" mode.
+    """
+    return _corridor_filter(route_line.transform(PROJECTED_CRS, clone=True), corridor, mode)
+
+
+def get_stations_along_route(
+    route_line: LineString,
+    corridor: Polygon | None = None,
+    mode: str | None = None,
+) -> QuerySet:
+    """
+    Returns fuel stations within the corridor around route. In the
+    "buffer" mode these include stations up to the widened planar width
+    away; callers cut them at CORRIDOR_METERS of ground distance.
+    """
 
     return (
         FuelStation.objects
-        .filter(location__intersects=corridor)
+        .filter(corridor_filter(route_line, corridor, mode))
         .only("id", "price", "location")
     )
+
+
+def get_station_positions_along_route(
+    route_line: LineString,
+    corridor: Polygon | None = None,
+) -> list[tuple[int, float, float, float]]:
+    """
+    Returns (id, price, fraction, offset) for stations in the 20 mile
+    corridor, ordered by their fractional position along the route.
+    offset is the station's approximate ground distance from the route in
+    meters. Both are computed by PostGIS in the same query, so no station
+    geometry is sent back to Python.
+    """
+    return list(station_positions_queryset(route_line, corridor))
+
+
+def station_positions_queryset(
+    route_line: LineString,
+    corridor: Polygon | None = None,
+    mode: str | None = None,
+) -> QuerySet:
+    """
+    The query behind get_station_positions_along_route.
+    """
+
+    projected_route = route_line.transform(PROJECTED_CRS, clone=True)
+    latitude = PointY(Cast("location", GeometryField(srid=ROUTE_CRS)))
+
+    return (
+        FuelStation.objects
+        .filter(_corridor_filter(projected_route, corridor, mode))
+        .annotate(
+            fraction=LineLocatePoint(projected_route, projected_location()),
+            # Web Mercator distances are stretched by 1/cos(latitude).
+            offset=PlanarDistance(projected_route, projected_location()) * Cos(Radians(latitude)),
+        )
+        .filter(offset__lte=CORRIDOR_METERS)
+        .order_by("fraction")
+        .values_list("id", "price", "fraction", "offset")
+    )
+
+
+def get_station_coordinates(queryset: QuerySet | None = None) -> list[tuple[int, float, float, float]]:
+    """
+    Returns (id, price, lon, lat) rows without building GEOS points.
+    """
+
+    if queryset is None:
+        queryset = FuelStation.objects.all()
+
+    location = Cast("location", GeometryField(srid=ROUTE_CRS))
+
+    return list(
+        queryset
+        .annotate(lon=PointX(location), lat=PointY(location))
+        .values_list("id", "price", "lon", "lat")
+    )
+
+
+def get_station_details(ids) -> dict[int, dict]:
+    """
+    {id: {name, city, state, lat, lon}} for the given stations, in one query.
+    """
+
+    location = Cast("location", GeometryField(srid=ROUTE_CRS))
+
+    return {
+        row["id"]: row
+        for row in (
+            FuelStation.objects
+            .filter(id__in=list(ids))
+            .annotate(lon=PointX(location), lat=PointY(location))
+            .values("id", "name", "city", "state", "lat", "lon")
+        )
+    }
+
+
+def get_station_coordinates_along_routes(
+    route_lines: list[LineString],
+) -> list[tuple[int, float, float, float]]:
+    """
+    Returns (id, price, lon, lat) for stations inside the union of the
+    corridors around several routes, in a single query. Like
+    get_stations_along_route, they still need the ground distance cut.
+    """
+
+    if not route_lines:
+        return []
+
+    if _corridor_mode() == "dwithin":
+        condition = reduce(operator.or_, (corridor_filter(route_line) for route_line in route_lines))
+    else:
+        projected_routes = [route_line.transform(PROJECTED_CRS, clone=True) for route_line in route_lines]
+        corridors = [
+            projected_route.buffer(_planar_corridor(projected_route))
+            for projected_route in projected_routes
+        ]
+        condition = _intersects_projected(GeometryCollection(*corridors, srid=PROJECTED_CRS).unary_union)
+
+    return get_station_coordinates(FuelStation.objects.filter(condition))
+
+
+def planar_corridor_meters(max_abs_latitude: float, ground_meters: float = CORRIDOR_METERS) -> float:
+    """
+    EPSG:3857 buffer width that reaches at least `ground_meters` on the
+    ground everywhere along a route up to max_abs_latitude, including
+    stations that far poleward of it.
+    """
+    latitude = min(max_abs_latitude + ground_meters / METERS_PER_DEGREE, MAX_CORRIDOR_LATITUDE)
+    return ground_meters / cos(radians(latitude))
+
+
+def _planar_corridor(projected_route: LineString) -> float:
+    _, ymin, _, ymax = projected_route.extent
+    max_abs_latitude = max(degrees(atan(sinh(y / MERCATOR_RADIUS_M))) for y in (abs(ymin), abs(ymax)))
+    return planar_corridor_meters(max_abs_latitude)
+
+
+def _corridor(projected_route: LineString) -> Polygon:
+    """
+    Buffer a projected route into the WGS84 corridor polygon.
+    """
+    corridor = projected_route.buffer(_planar_corridor(projected_route))
+    corridor.transform(ROUTE_CRS)
+    return corridor
+
+
+def simplified_route_pieces(projected_route: LineString) -> list[LineString]:
+    """
+    Douglas-Peucker simplified route, cut into WGS84 pieces of at most
+    about CORRIDOR_PIECE_METERS projected length. Long straight segments
+    are split too, so every piece has a tight bounding box.
+    """
+    coords = projected_route.simplify(CORRIDOR_SIMPLIFY_METERS).coords
+
+    pieces = []
+    current = [coords[0]]
+    length = 0.0
+
+    for (x0, y0), (x1, y1) in zip(coords, coords[1:]):
+        segment = hypot(x1 - x0, y1 - y0)
+        steps = max(1, ceil(segment / CORRIDOR_PIECE_METERS))
+
+        for k in range(1, steps + 1):
+            current.append((x0 + (x1 - x0) * k / steps, y0 + (y1 - y0) * k / steps))
+            length += segment / steps
+
+            if length >= CORRIDOR_PIECE_METERS:
+                pieces.append(current)
+                current = [current[-1]]
+                length = 0.0
+
+    if len(current) > 1:
+        pieces.append(current)
+
+    return [
+        LineString(piece, srid=PROJECTED_CRS).transform(ROUTE_CRS, clone=True)
+        for piece in pieces
+    ]
+
+
+def simplify_route(coords: list[tuple[float, float]], tolerance_meters: float) -> list[tuple[float, float]]:
+    """
+    Douglas-Peucker simplified route, in projected meters.
+    coords format: [(lat, lon), ...], returned in the same format.
+    """
+    projected = build_route_line(coords).transform(PROJECTED_CRS, clone=True)
+    simplified = projected.simplify(tolerance_meters).transform(ROUTE_CRS, clone=True)
+    return [(lat, lon) for lon, lat in simplified.coords]
+
+
+def _corridor_mode(mode: str | None = None) -> str:
+    mode = mode or settings.CORRIDOR_MODE
+    if mode not in CORRIDOR_MODES:
+        raise ImproperlyConfigured(f"Unsupported corridor mode: {mode!r}")
+    return mode
+
+
+def _corridor_filter(
+    projected_route: LineString,
+    corridor: Polygon | None = None,
+    mode: str | None = None,
+) -> Q:
+    if _corridor_mode(mode) == "dwithin":
+        distance = D(m=CORRIDOR_METERS)
+        return reduce(operator.or_, (
+            Q(location__dwithin=(piece, distance))
+            for piece in simplified_route_pieces(projected_route)
+        ))
+
+    if corridor is None:
+        return _intersects_projected(projected_route.buffer(_planar_corridor(projected_route)))
+
+    return _intersects_projected(corridor)
+
+
+def _intersects_projected(corridor) -> Q:
+    """
+    Planar intersects test of the projected station location against a
+    corridor, so the EPSG:3857 expression index can answer it.
+    """
+    if corridor.srid != PROJECTED_CRS:
+        corridor = corridor.transform(PROJECTED_CRS, clone=True)
+
+    return Q(IntersectsLookup(projected_location(), corridor))
@@ -0,0 +1,262 @@
+"""
+In-process spatial index over fuel stations.
+
+Stations are held as compact NumPy arrays bucketed into a uniform grid in
+EPSG:3857, so corridor lookups need no database round trip. The index
+follows the station data version in Redis and swaps in a fresh snapshot
+after `load_fuel_data` runs. When only the price version moves
+(`refresh_prices`), it re-reads prices and keeps the spatial arrays.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, replace
+
+import numpy as np
+from django.conf import settings
+
+from optimizer.models import FuelStation
+from services.data_version import get_station_data_version, get_station_price_version
+from services.projection_service import ground_scale, project_onto_route, to_projected
+from services.spatial_service import CORRIDOR_METERS, get_station_coordinates, planar_corridor_meters
+
+# Grid cells are twice the corridor width, so a 3x3 neighbourhood around
+# route samples covers the whole corridor up to about 55 degrees of
+# latitude, where the planar corridor widens; further north it grows.
+CELL_METERS = 2 * CORRIDOR_METERS
+
+_CELL_OFFSET = 1 << 20
+
+
+def _neighbours(rings: int) -> np.ndarray:
+    return np.array([
+        dx * (2 * _CELL_OFFSET) + dy
+        for dx in range(-rings, rings + 1)
+        for dy in range(-rings, rings + 1)
+    ])
+
+
+def _cell_keys(cells: np.ndarray) -> np.ndarray:
+    return (cells[:, 0] + _CELL_OFFSET) * (2 * _CELL_OFFSET) + (cells[:, 1] + _CELL_OFFSET)
+
+
+@dataclass(frozen=True, slots=True)
+class StationSnapshot:
+    version: int
+    ids: np.ndarray
+    prices: np.ndarray
+    xy: np.ndarray
+    cell_keys: np.ndarray
+    cell_starts: np.ndarray
+    order: np.ndarray
+    id_order: np.ndarray
+    price_version: int = 0
+
+    @classmethod
+    def build(cls, ids, prices, lonlat, version=0) -> "StationSnapshot":
+        ids = np.asarray(ids, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        xy = to_projected(lonlat)
+
+        keys = _cell_keys(np.floor(xy / CELL_METERS).astype(np.int64))
+        order = np.argsort(keys, kind="stable")
+        cell_keys, cell_starts = np.unique(keys[order], return_index=True)
+
+        return cls(
+            version=version,
+            ids=ids,
+            prices=prices,
+            xy=xy,
+            cell_keys=cell_keys,
+            cell_starts=np.append(cell_starts, len(order)),
+            order=order,
+            id_order=np.argsort(ids, kind="stable"),
+        )
+
+    @classmethod
+    def from_rows(cls, rows, version=0) -> "StationSnapshot":
+        """
+        Build from (id, price, lon, lat) rows.
+        """
+        if not rows:
+            return cls.build([], [], np.empty((0, 2)), version)
+
+        ids, prices, lons, lats = zip(*rows)
+        return cls.build(ids, prices, np.column_stack((lons, lats)), version)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def prices_for(self, ids) -> np.ndarray:
+        """
+        Current prices for station ids, NaN for ids not in the snapshot.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        sorted_ids = self.ids[self.id_order]
+
+        slots = np.searchsorted(sorted_ids, ids).clip(max=max(len(sorted_ids) - 1, 0))
+        prices = np.full(len(ids), np.nan)
+        if len(sorted_ids):
+            found = sorted_ids[slots] == ids
+            prices[found] = self.prices[self.id_order[slots[found]]]
+        return prices
+
+    def with_prices(self, ids, prices, price_version: int) -> "StationSnapshot":
+        """
+        Copy of the snapshot with prices updated for the given station ids.
+        Ids that are not in the snapshot are ignored.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        new_prices = self.prices.copy()
+
+        if len(self.ids) and len(ids):
+            sorted_ids = self.ids[self.id_order]
+            slots = np.searchsorted(sorted_ids, ids).clip(max=len(sorted_ids) - 1)
+            found = sorted_ids[slots] == ids
+            new_prices[self.id_order[slots[found]]] = np.asarray(prices, dtype=np.float64)[found]
+
+        return replace(self, prices=new_prices, price_version=price_version)
+
+    def corridor(
+        self,
+        route_coords,
+        total_miles: float,
+        corridor_meters: float = CORRIDOR_METERS,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Stations within corridor_meters (ground distance) of a route.
+        route_coords format: [(lat, lon), ...] as decoded from the route polyline.
+        Returns (ids, prices, mile_markers, offsets) ordered by mile marker,
+        offsets being each station's ground distance from the route in meters.
+        """
+
+        route_coords = np.asarray(route_coords, dtype=np.float64).reshape(-1, 2)
+        route_xy = to_projected(route_coords[:, ::-1])
+        max_abs_latitude = float(np.abs(route_coords[:, 0]).max()) if len(route_coords) else 0.0
+        candidates = self._candidates(route_xy, planar_corridor_meters(max_abs_latitude, corridor_meters))
+
+        along, offset = project_onto_route(route_xy, self.xy[candidates])
+        offset = offset * ground_scale(self.xy[candidates, 1])
+        inside = offset <= corridor_meters
+
+        total_length = np.hypot(*np.diff(route_xy, axis=0).T).sum()
+        mile_markers = (
+            along[inside] / total_length * total_miles
+            if total_length else np.zeros(inside.sum())
+        )
+        candidates = candidates[inside]
+        offsets = offset[inside]
+
+        by_mile = np.argsort(mile_markers, kind="stable")
+        return (
+            self.ids[candidates][by_mile],
+            self.prices[candidates][by_mile],
+            mile_markers[by_mile],
+            offsets[by_mile],
+        )
+
+    def _candidates(self, route_xy: np.ndarray, planar_meters: float) -> np.ndarray:
+        """
+        Indices of stations in grid cells within planar_meters (EPSG:3857)
+        of the route.
+        """
+
+        if len(self) == 0 or len(route_xy) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        # Sample the route densely enough that every corridor point lies
+        # within `rings` cells of a sample: one ring unless the corridor is
+        # widened to most of a cell (beyond about 55 degrees of latitude).
+        rings = max(1, int(np.ceil((planar_meters + CELL_METERS / 8) / CELL_METERS)))
+        step = rings * CELL_METERS - planar_meters
+        deltas = np.diff(route_xy, axis=0)
+        counts = np.maximum(1, np.ceil(np.hypot(*deltas.T) / step)).astype(np.int64)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        t = (np.arange(counts.sum()) - first) / np.repeat(counts, counts)
+        samples = np.vstack((
+            np.repeat(route_xy[:-1], counts, axis=0) + t[:, None] * np.repeat(deltas, counts, axis=0),
+            route_xy[-1:],
+        ))
+
+        keys = np.unique(_cell_keys(np.floor(samples / CELL_METERS).astype(np.int64)))
+        keys = np.unique((keys[:, None] + _neighbours(rings)[None]).ravel())
+
+        slots = np.searchsorted(self.cell_keys, keys)
+        found = slots < len(self.cell_keys)
+        found[found] = self.cell_keys[slots[found]] == keys[found]
+        slots = slots[found]
+
+        if len(slots) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        return np.concatenate([
+            self.order[self.cell_starts[slot]:self.cell_starts[slot + 1]]
+            for slot in slots
+        ])
+
+
+def load_snapshot(version: int) -> StationSnapshot:
+    """
+    Build a snapshot of every station from the database.
+    """
+
+    return StationSnapshot.from_rows(get_station_coordinates(), version)
+
+
+def load_prices() -> tuple[list, list]:
+    """
+    (ids, prices) of every station from the database.
+    """
+
+    rows = list(FuelStation.objects.values_list("id", "price"))
+    if not rows:
+        return [], []
+
+    ids, prices = zip(*rows)
+    return list(ids), list(prices)
+
+
+class StationIndex:
+    """
+    Holds the current StationSnapshot and swaps it when the station data
+    or price version changes. The versions are checked at most every
+    `check_interval` seconds, and the new snapshot is fully built before
+    it replaces the old one.
+    """
+
+    def __init__(self, loader=load_snapshot, check_interval: float = 5.0, price_loader=load_prices):
+        self._loader = loader
+        self._price_loader = price_loader
+        self._check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> StationSnapshot:
+        snapshot = self._snapshot
+        now = time.monotonic()
+
+        if snapshot is not None and now - self._checked_at < self._check_interval:
+            return snapshot
+
+        # Read the versions before loading, so the loaded data is at
+        # least as new as the versions it is tagged with.
+        version = get_station_data_version()
+        price_version = get_station_price_version()
+        self._checked_at = now
+
+        if snapshot is not None and (snapshot.version, snapshot.price_version) == (version, price_version):
+            return snapshot
+
+        with self._lock:
+            current = self._snapshot
+
+            if current is None or current.version != version:
+                self._snapshot = replace(self._loader(version), price_version=price_version)
+            elif current.price_version != price_version:
+                self._snapshot = current.with_prices(*self._price_loader(), price_version)
+
+        return self._snapshot
+
+
+station_index = StationIndex(check_interval=settings.STATION_INDEX_CHECK_SECONDS)